@@ -0,0 +1,120 @@
+"""CSV export of a fully archived reading history.
+
+Seeds a temporary database with --days days of readings for one user at
+--interval seconds, archives all of them to Parquet with ReadingArchive and
+then encodes the whole range as CSV in --page-size row pages, the way
+/exports/readings does. The archived rows are read two ways: with
+ReadingArchive.iter_range, which walks the day partitions once, and with a
+replay of the original per-page read_range loop, which reopened and sorted
+every partition for each page. The peak of pyarrow's memory pool is
+reported after each run; it only grows, so the legacy figure is an upper
+bound. Requires pyarrow (balconygreen[archive]).
+
+    python benchmarks/bench_archive_export.py --days 60 --page-size 5000
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.db_implementation.archive import ReadingArchive  # noqa: E402
+from balconygreen.db_implementation.db_general import Database  # noqa: E402
+from balconygreen.db_implementation.exports import iter_csv  # noqa: E402
+from balconygreen.db_implementation.ingest_queue import INSERT_READING_SQL  # noqa: E402
+from balconygreen.db_implementation.timestamps import to_epoch_ms  # noqa: E402
+
+USER_ID = "bench-user"
+SENSORS = ["soil_moisture", "temperature"]
+
+
+def _seed(database: Database, days: int, interval: int) -> int:
+    end = datetime.now(tz=timezone.utc) - timedelta(days=2)
+    start = end - timedelta(days=days)
+    rows = []
+    stamp = start
+    while stamp < end:
+        for index, sensor_name in enumerate(SENSORS):
+            rows.append((USER_ID, "bench-device", sensor_name, 20.0 + index, stamp, to_epoch_ms(stamp), "bench"))
+        stamp += timedelta(seconds=interval)
+    with database.get_conn() as conn:
+        conn.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, 'x')", (USER_ID, f"{USER_ID}@bench"))
+        conn.executemany(INSERT_READING_SQL, rows)
+    return len(rows)
+
+
+def _legacy_rows(archive: ReadingArchive, page_size: int):
+    """The per-page loop this benchmark replaced: every page read and sorted all partitions, then sliced."""
+    paths = [path for _, day_paths in archive._partitions(None, archive.archived_before_ms()) for path in day_paths]
+    cursor = None
+    while True:
+        expression, _ = archive._plan(USER_ID, None, None, None, None, False, cursor)
+        rows = archive._read(paths, expression, False).slice(0, page_size).to_pylist()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1]["timestamp_ms"], rows[-1]["id"])
+
+
+def _pages(rows, page_size: int):
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _export(rows, page_size: int) -> tuple[float, int, str]:
+    digest = hashlib.blake2b()
+    size = 0
+    started = time.perf_counter()
+    for chunk in iter_csv(_pages(rows, page_size)):
+        digest.update(chunk)
+        size += len(chunk)
+    return time.perf_counter() - started, size, digest.hexdigest()
+
+
+def _arrow_peak_mib() -> float:
+    import pyarrow as pa  # type: ignore
+
+    return pa.default_memory_pool().max_memory() / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between readings of each sensor.")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time iter_range.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(str(Path(tmp) / "bench.db"))
+        archive = ReadingArchive(database, Path(tmp) / "archive", default_hot_days=1, incremental_vacuum=False)
+        if not archive.available:
+            raise SystemExit("pyarrow is not installed; install balconygreen[archive]")
+        seeded = _seed(database, args.days, args.interval)
+        archived = archive.run_once()
+        print(f"{seeded} readings seeded, {archived} archived over {args.days} day partitions")
+
+        elapsed, size, digest = _export(archive.iter_range(USER_ID, None), args.page_size)
+        print(f"  iter_range:        {elapsed:8.2f} s  {size / 1e6:7.1f} MB CSV  arrow peak {_arrow_peak_mib():7.1f} MiB")
+        if not args.skip_legacy:
+            legacy_elapsed, legacy_size, legacy_digest = _export(_legacy_rows(archive, args.page_size), args.page_size)
+            print(f"  per-page read:     {legacy_elapsed:8.2f} s  {legacy_size / 1e6:7.1f} MB CSV  arrow peak {_arrow_peak_mib():7.1f} MiB")
+            if legacy_digest != digest:
+                print("  WARNING: the exports differ")
+        database.connections.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Tail latency of /health and /user_sensors while heavy analytics run.
+
+Seeds a temporary database with a long telemetry history and executed
+watering commands, then keeps /analytics/pump_failures and
+/analytics/water_usage busy in the background while probing /health and
+/user_sensors in-process through httpx's ASGI transport.
+
+Pass --inline-db to run database work directly on the event loop, which
+reproduces the behaviour before the thread-pool offload.
+
+    python benchmarks/bench_async_endpoints.py --probes 200 --heavy 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import httpx  # noqa: E402  # type: ignore
+
+from balconygreen.db_implementation.ingest_queue import INSERT_READING_SQL  # noqa: E402
+from balconygreen.db_implementation.timestamps import to_epoch_ms  # noqa: E402
+
+
+def _seed(auth_api, user_id: str, readings: int, commands: int) -> None:
+    now = datetime.now(tz=timezone.utc)
+    with auth_api.database.get_conn() as conn:
+        conn.execute(
+            "INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)",
+            (user_id, f"{user_id}@bench", auth_api.user_service.hash_password("bench")),
+        )
+        conn.executemany(
+            INSERT_READING_SQL,
+            [
+                (user_id, "bench-device", name, 40.0 + (index % 30), stamp, to_epoch_ms(stamp), "bench")
+                for index in range(readings // 2)
+                for stamp in (now - timedelta(seconds=30 * index),)
+                for name in ("soil_moisture", "soil_raw")
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO device_commands "
+            "(id, user_id, device_id, command_type, payload_json, status, created_at, created_at_ms, acknowledged_at, acknowledged_at_ms) "
+            "VALUES (?, ?, ?, 'water_now', ?, 'executed', ?, ?, ?, ?)",
+            [
+                (
+                    str(uuid.uuid4()),
+                    user_id,
+                    "bench-device",
+                    json.dumps({"pump_ms": 1500, "plant_type": "tomato_indoor"}),
+                    stamp,
+                    to_epoch_ms(stamp),
+                    stamp,
+                    to_epoch_ms(stamp),
+                )
+                for index in range(commands)
+                for stamp in (now - timedelta(hours=index),)
+            ],
+        )
+
+
+def _percentiles(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p50 = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {p50 * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms   max {ordered[-1] * 1000:7.2f} ms"
+
+
+async def _bench(auth_api, token: str, probes: int, heavy: int) -> None:
+    transport = httpx.ASGITransport(app=auth_api.app)
+    headers = {"Authorization": f"Bearer {token}"}
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def analytics_load() -> None:
+            while not stop.is_set():
+                await client.get("/analytics/pump_failures", params={"limit": 20}, headers=headers)
+                await client.get("/analytics/water_usage", headers=headers)
+
+        background = [asyncio.create_task(analytics_load()) for _ in range(heavy)]
+        await asyncio.sleep(0.2)
+        health: list[float] = []
+        ingest: list[float] = []
+        for index in range(probes):
+            started = time.perf_counter()
+            await client.get("/health")
+            health.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await client.post(
+                "/user_sensors",
+                json={"sensor_name": "temperature", "value": 20.0 + index % 5, "device_id": "bench-device"},
+                headers=headers,
+            )
+            ingest.append(time.perf_counter() - started)
+        stop.set()
+        await asyncio.gather(*background)
+
+    print(f"/health        {_percentiles(health)}")
+    print(f"/user_sensors  {_percentiles(ingest)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--heavy", type=int, default=4, help="Concurrent analytics callers.")
+    parser.add_argument("--readings", type=int, default=200000)
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--inline-db", action="store_true", help="Run database calls on the event loop (old behaviour).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["BALCONYGREEN_DB_PATH"] = str(Path(tmp) / "bench.db")
+        from balconygreen import auth_api
+
+        if args.inline_db:
+
+            async def inline(func, *func_args, **func_kwargs):
+                return func(*func_args, **func_kwargs)
+
+            auth_api.async_database.run = inline
+            auth_api.analytics_database.run = inline
+
+        user_id = str(uuid.uuid4())
+        _seed(auth_api, user_id, args.readings, args.commands)
+        token = auth_api.JWTService.create_token(user_id)
+        mode = "inline (blocking)" if args.inline_db else "thread-pool offload"
+        print(f"mode: {mode}, {args.heavy} concurrent analytics callers")
+        asyncio.run(_bench(auth_api, token, args.probes, args.heavy))
+        auth_api.ingest_queue.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Readings/s through the device backend: one JSON POST per reading versus packed binary batches.
+
+Runs backend/api.py in-process through httpx's ASGI transport against a
+temporary SQLite database. The JSON path posts each reading to
+/sensor_readings, the way the firmware does today; the binary path posts
+--batch readings at a time to /sensor_readings/batch.
+
+Pass --decode-only to compare just the body encode/decode cost, which needs
+no web stack or database.
+
+    python benchmarks/bench_binary_ingest.py --readings 5000 --batch 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.backend.batch_protocol import CONTENT_TYPE, decode_batch, encode_batch  # noqa: E402
+
+SENSORS = ["temperature", "humidity", "light_sensor", "soil_moisture", "soil_temp"]
+
+
+def _readings(count: int) -> list[tuple[int, int, float]]:
+    now_ms = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    return [(index % len(SENSORS), now_ms - index * 1000, 20.0 + index % 17) for index in range(count)]
+
+
+def _decode_only(count: int, batch: int) -> None:
+    sensors = [(str(uuid.uuid4()), name) for name in SENSORS]
+    readings = _readings(count)
+
+    json_bodies = [
+        json.dumps({"sensor_id": sensors[index][0], "value": value, "unit": "", "sensor_name": sensors[index][1]})
+        for index, _, value in readings
+    ]
+    started = time.perf_counter()
+    for body in json_bodies:
+        json.loads(body)
+    json_elapsed = time.perf_counter() - started
+
+    binary_bodies = [encode_batch(sensors, readings[offset:offset + batch]) for offset in range(0, count, batch)]
+    started = time.perf_counter()
+    for body in binary_bodies:
+        decode_batch(body)
+    binary_elapsed = time.perf_counter() - started
+
+    json_bytes = sum(len(body) for body in json_bodies)
+    binary_bytes = sum(len(body) for body in binary_bodies)
+    print(f"json decode    {count / json_elapsed:12.0f} readings/s   {json_bytes / count:6.1f} bytes/reading")
+    print(f"binary decode  {count / binary_elapsed:12.0f} readings/s   {binary_bytes / count:6.1f} bytes/reading")
+
+
+def _setup_backend(db_path: Path):
+    import httpx  # type: ignore
+    from sqlalchemy import create_engine  # type: ignore
+    from sqlalchemy.orm import sessionmaker  # type: ignore
+
+    from balconygreen.backend import api
+    from balconygreen.db_implementation.schema.devices import Device
+    from balconygreen.db_implementation.schema.init import Base
+    from balconygreen.db_implementation.schema.sensor import Sensor
+    from balconygreen.db_implementation.schema.users import User
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api.app.dependency_overrides[api.get_db] = get_db
+
+    device_key = str(uuid.uuid4())
+    with session_factory() as db:
+        user = User(id=str(uuid.uuid4()), email="bench@example.com", password_hash="x")
+        device = Device(
+            id=str(uuid.uuid4()),
+            user_id=user.id,
+            device_type="physical",
+            device_name="bench",
+            device_key=device_key,
+            is_active=True,
+        )
+        sensors = [Sensor(id=str(uuid.uuid4()), device_id=device.id, sensor_name=name) for name in SENSORS]
+        db.add_all([user, device, *sensors])
+        db.commit()
+        sensor_table = [(sensor.id, sensor.sensor_name) for sensor in sensors]
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench")
+    return client, {"Authorization": f"Bearer {device_key}"}, sensor_table
+
+
+async def _bench_http(db_dir: Path, count: int, batch: int) -> None:
+    client, headers, sensors = _setup_backend(db_dir / "bench.db")
+    readings = _readings(count)
+    async with client:
+        started = time.perf_counter()
+        for index, _, value in readings:
+            response = await client.post(
+                "/sensor_readings",
+                json={"sensor_id": sensors[index][0], "value": value, "unit": "", "sensor_name": sensors[index][1]},
+                headers=headers,
+            )
+            response.raise_for_status()
+        json_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for offset in range(0, count, batch):
+            response = await client.post(
+                "/sensor_readings/batch",
+                content=encode_batch(sensors, readings[offset:offset + batch]),
+                headers={**headers, "Content-Type": CONTENT_TYPE},
+            )
+            response.raise_for_status()
+        binary_elapsed = time.perf_counter() - started
+
+    print(f"json   /sensor_readings        {count / json_elapsed:10.0f} readings/s")
+    print(f"binary /sensor_readings/batch  {count / binary_elapsed:10.0f} readings/s   (batch={batch})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--decode-only", action="store_true", help="Only measure body encode/decode.")
+    args = parser.parse_args()
+
+    if args.decode_only:
+        _decode_only(args.readings, args.batch)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_bench_http(Path(tmp), args.readings, args.batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Concurrent pollers draining one device's command queue: atomic batch claim versus SELECT-then-UPDATE.
+
+Seeds --commands queued commands for a single device in a temporary
+database, then lets --pollers threads drain it. The claim path uses
+claim_commands (one UPDATE ... RETURNING per poll, up to --batch commands);
+the legacy path replays the old /next_command logic, a SELECT of the oldest
+command followed by a separate UPDATE. Every delivery is recorded, so
+double deliveries are counted rather than assumed away.
+
+    python benchmarks/bench_command_claim.py --commands 5000 --pollers 8 --batch 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.db_implementation.commands import claim_commands  # noqa: E402
+from balconygreen.db_implementation.db_general import Database  # noqa: E402
+from balconygreen.db_implementation.timestamps import to_epoch_ms  # noqa: E402
+
+USER_ID = "bench-user"
+DEVICE_ID = "bench-device"
+
+
+def _seed(database: Database, count: int) -> None:
+    start = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+    with database.get_conn() as conn:
+        conn.execute("DELETE FROM device_commands")
+        conn.execute("INSERT OR IGNORE INTO users (id, email, password_hash) VALUES (?, ?, 'x')", (USER_ID, f"{USER_ID}@bench"))
+        conn.executemany(
+            "INSERT INTO device_commands "
+            "(id, user_id, device_id, command_type, payload_json, status, created_at, created_at_ms) "
+            "VALUES (?, ?, ?, 'water_now', ?, 'queued', ?, ?)",
+            [
+                (str(uuid.uuid4()), USER_ID, DEVICE_ID, json.dumps({"pump_ms": 500}), stamp, to_epoch_ms(stamp))
+                for index in range(count)
+                for stamp in (start + timedelta(milliseconds=index),)
+            ],
+        )
+
+
+def _legacy_poll(database: Database) -> list[str]:
+    row = database.fetch_one(
+        """
+        SELECT id, status
+        FROM device_commands
+        WHERE user_id = ? AND device_id = ? AND status = 'queued'
+        ORDER BY created_at_ms ASC
+        LIMIT 1
+        """,
+        (USER_ID, DEVICE_ID),
+    )
+    if not row:
+        return []
+    delivered_at = datetime.now(tz=timezone.utc)
+    database.execute(
+        "UPDATE device_commands SET status = ?, delivered_at = ?, delivered_at_ms = ? WHERE id = ?",
+        ("delivered", delivered_at, to_epoch_ms(delivered_at), row["id"]),
+    )
+    return [row["id"]]
+
+
+def _claim_poll(database: Database, batch: int) -> list[str]:
+    now_ms = to_epoch_ms(datetime.now(tz=timezone.utc))
+    with database.get_conn() as conn:
+        return [row["id"] for row in claim_commands(conn, USER_ID, DEVICE_ID, batch, now_ms)]
+
+
+def _drain(database: Database, pollers: int, poll) -> tuple[float, Counter, int]:
+    deliveries: Counter = Counter()
+    busy_errors = 0
+    lock = threading.Lock()
+
+    def worker() -> None:
+        nonlocal busy_errors
+        while True:
+            try:
+                claimed = poll(database)
+            except sqlite3.OperationalError:
+                with lock:
+                    busy_errors += 1
+                continue
+            if not claimed:
+                return
+            with lock:
+                deliveries.update(claimed)
+
+    threads = [threading.Thread(target=worker) for _ in range(pollers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, deliveries, busy_errors
+
+
+def _report(label: str, count: int, elapsed: float, deliveries: Counter, busy_errors: int) -> None:
+    duplicates = sum(times - 1 for times in deliveries.values() if times > 1)
+    print(
+        f"{label:<28} {len(deliveries) / elapsed:10.0f} commands/s   "
+        f"claimed {len(deliveries)}/{count}   double deliveries {duplicates}   busy errors {busy_errors}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=10, help="Commands claimed per poll on the atomic path.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(str(Path(tmp) / "bench.db"))
+
+        _seed(database, args.commands)
+        _report("select-then-update", args.commands, *_drain(database, args.pollers, _legacy_poll))
+
+        _seed(database, args.commands)
+        _report("atomic claim (batch=1)", args.commands, *_drain(database, args.pollers, lambda db: _claim_poll(db, 1)))
+
+        _seed(database, args.commands)
+        label = f"atomic claim (batch={args.batch})"
+        _report(label, args.commands, *_drain(database, args.pollers, lambda db: _claim_poll(db, args.batch)))
+
+        database.connections.close_all()
+
+
+if __name__ == "__main__":
+    main()
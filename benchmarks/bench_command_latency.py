@@ -0,0 +1,140 @@
+"""Queue-to-device latency of water_now commands: WebSocket push versus /next_command polling.
+
+Starts the auth API under uvicorn on a local port against a temporary
+database. The push path connects a SimulatedDevice to the device channel and
+times each command from the /commands/water_now POST until it arrives on
+the socket; the poll path times the same thing for a device polling
+/devices/{id}/next_command every --poll-interval seconds, as the firmware
+does today.
+
+    python benchmarks/bench_command_latency.py --commands 30 --poll-interval 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import httpx  # noqa: E402  # type: ignore
+import uvicorn  # noqa: E402  # type: ignore
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _summary(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   max {ordered[-1] * 1000:8.1f} ms"
+
+
+async def _queue_commands(client: httpx.AsyncClient, headers: dict, device_id: str, count: int, sent: dict) -> None:
+    for _ in range(count):
+        # Spread commands out so poll-phase alignment is random.
+        await asyncio.sleep(random.uniform(0.05, 0.5))
+        started = time.perf_counter()
+        response = await client.post("/commands/water_now", json={"device_id": device_id, "pump_ms": 500}, headers=headers)
+        response.raise_for_status()
+        sent[response.json()["command_id"]] = started
+
+
+async def _bench_push(base_url: str, token: str, count: int) -> list[float]:
+    from balconygreen.sensors.simulated_device import SimulatedDevice
+
+    sent: dict[str, float] = {}
+    received: dict[str, float] = {}
+
+    def on_command(command: dict) -> None:
+        received[command["id"]] = time.perf_counter()
+
+    device = SimulatedDevice(token, "push-device", base_url, reading_interval=1.0, on_command=on_command)
+    runner = asyncio.create_task(device.run_once())
+    await asyncio.sleep(0.5)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        await _queue_commands(client, {"Authorization": f"Bearer {token}"}, "push-device", count, sent)
+        while len(received) < count:
+            await asyncio.sleep(0.05)
+    runner.cancel()
+    return [received[command_id] - started for command_id, started in sent.items()]
+
+
+async def _bench_poll(base_url: str, token: str, count: int, poll_interval: float) -> list[float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    sent: dict[str, float] = {}
+    received: dict[str, float] = {}
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+
+        async def poll() -> None:
+            while len(received) < count:
+                response = await client.get("/devices/poll-device/next_command", headers=headers)
+                body = response.json()
+                if body["status"] == "ok":
+                    command = body["command"]
+                    received.setdefault(command["id"], time.perf_counter())
+                    await client.post(
+                        "/devices/poll-device/ack_command",
+                        json={"command_id": command["id"], "status": "executed"},
+                        headers=headers,
+                    )
+                    continue
+                await asyncio.sleep(poll_interval)
+
+        poller = asyncio.create_task(poll())
+        await _queue_commands(client, headers, "poll-device", count, sent)
+        await poller
+    return [received[command_id] - started for command_id, started in sent.items()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=30)
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between /next_command polls.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["BALCONYGREEN_DB_PATH"] = str(Path(tmp) / "bench.db")
+        from balconygreen import auth_api
+
+        user_id = str(uuid.uuid4())
+        auth_api.database.execute(
+            "INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)",
+            (user_id, f"{user_id}@bench", auth_api.user_service.hash_password("bench")),
+        )
+        token = auth_api.JWTService.create_token(user_id)
+        port = _free_port()
+        server = _start_server(auth_api.app, port)
+        base_url = f"http://127.0.0.1:{port}"
+
+        push = asyncio.run(_bench_push(base_url, token, args.commands))
+        poll = asyncio.run(_bench_poll(base_url, token, args.commands, args.poll_interval))
+        server.should_exit = True
+
+    print(f"websocket push              {_summary(push)}")
+    print(f"poll every {args.poll_interval:4.1f}s            {_summary(poll)}")
+
+
+if __name__ == "__main__":
+    main()
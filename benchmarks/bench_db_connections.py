@@ -0,0 +1,114 @@
+"""Compare per-call sqlite3.connect against the shared ConnectionManager.
+
+Simulates the auth API's request mix (a user lookup followed by a reading
+insert and a short range read) from several worker threads and reports
+requests per second for both strategies.
+
+    python benchmarks/bench_db_connections.py --requests 5000 --threads 4
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.db_implementation.connection import ConnectionManager  # noqa: E402
+from balconygreen.db_implementation.ingest_queue import INSERT_READING_SQL  # noqa: E402
+from balconygreen.db_implementation.schema import SCHEMA_SQL  # noqa: E402
+from balconygreen.db_implementation.timestamps import to_epoch_ms  # noqa: E402
+
+
+class PerCallConnections:
+    """The previous behaviour: connect, set pragmas, run, commit, close."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def run(self, statements):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            for query, params in statements:
+                conn.execute(query, params).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class ManagedConnections:
+    def __init__(self, db_path: str):
+        self.manager = ConnectionManager(db_path)
+
+    def run(self, statements):
+        with self.manager.transaction() as conn:
+            for query, params in statements:
+                conn.execute(query, params).fetchall()
+
+
+def _prepare(db_path: str) -> str:
+    conn = sqlite3.connect(db_path)
+    for stmt in SCHEMA_SQL:
+        conn.execute(stmt)
+    user_id = str(uuid.uuid4())
+    conn.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)", (user_id, f"{user_id}@bench", "x"))
+    conn.commit()
+    conn.close()
+    return user_id
+
+
+def _request(user_id: str) -> list[tuple[str, tuple]]:
+    now = datetime.now(tz=timezone.utc)
+    return [
+        ("SELECT id, email, name, password_hash FROM users WHERE id = ?", (user_id,)),
+        (INSERT_READING_SQL, (user_id, "bench-device", "soil_moisture", 42.0, now, to_epoch_ms(now), "bench")),
+        (
+            "SELECT sensor_name, value, timestamp_ms FROM readings WHERE user_id = ? ORDER BY timestamp_ms DESC LIMIT 10",
+            (user_id,),
+        ),
+    ]
+
+
+def _measure(strategy, user_id: str, total_requests: int, threads: int) -> float:
+    per_thread = max(1, total_requests // threads)
+
+    def worker():
+        for _ in range(per_thread):
+            strategy.run(_request(user_id))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return (per_thread * threads) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, factory in (("per-call connect", PerCallConnections), ("connection manager", ManagedConnections)):
+            db_path = str(Path(tmp) / f"{label.replace(' ', '_')}.db")
+            user_id = _prepare(db_path)
+            strategy = factory(db_path)
+            rps = _measure(strategy, user_id, args.requests, args.threads)
+            if isinstance(strategy, ManagedConnections):
+                strategy.manager.close_all()
+            print(f"{label:>20}: {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Sustained reading inserts/s: per-request commits versus the group-commit queue.
+
+Each simulated device thread posts small batches of readings, the way
+/user_sensors and /user_sensors/bulk are called. The baseline commits one
+transaction per request with one INSERT per reading; the queue runs are
+measured in both durability modes.
+
+    python benchmarks/bench_ingest_queue.py --devices 16 --requests 300 --readings 4
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.db_implementation.db_general import Database  # noqa: E402
+from balconygreen.db_implementation.ingest_queue import INSERT_READING_SQL, ReadingIngestQueue  # noqa: E402
+from balconygreen.db_implementation.rollups import update_rollups  # noqa: E402
+from balconygreen.db_implementation.timestamps import to_epoch_ms  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def _rows(device: int, count: int) -> list[tuple]:
+    now = datetime.now(tz=timezone.utc)
+    now_ms = to_epoch_ms(now)
+    return [(USER_ID, f"device-{device}", f"sensor_{index}", float(index), now, now_ms, "bench") for index in range(count)]
+
+
+def _per_request(database: Database, device: int, readings: int) -> None:
+    rows = _rows(device, readings)
+    with database.get_conn() as conn:
+        for row in rows:
+            conn.execute(INSERT_READING_SQL, row)
+        update_rollups(conn, ((row[0], row[1], row[2], row[3], row[5]) for row in rows))
+
+
+def _run(label: str, work, devices: int, requests: int, readings: int) -> None:
+    def device_loop(device: int) -> None:
+        for _ in range(requests):
+            work(device, readings)
+
+    threads = [threading.Thread(target=device_loop, args=(device,)) for device in range(devices)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = devices * requests * readings
+    print(f"{label:>28}: {total / elapsed:10.1f} inserts/s ({total} readings in {elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--readings", type=int, default=4)
+    parser.add_argument("--dir", default=None, help="Directory for the benchmark databases (use a real disk to include fsync cost).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for label in ("per-request commit", "queue, ack after commit", "queue, ack after enqueue"):
+            database = Database(str(Path(tmp) / f"{label.split(',')[0].replace(' ', '_')}_{len(label)}.db"))
+            database.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)", (USER_ID, USER_ID, "x"))
+            if label == "per-request commit":
+                _run(label, lambda device, count, db=database: _per_request(db, device, count), args.devices, args.requests, args.readings)
+            else:
+                durability = "commit" if "commit" in label else "enqueue"
+                queue = ReadingIngestQueue(database, durability=durability)
+
+                def work(device: int, count: int, queue=queue) -> None:
+                    future = queue.submit(_rows(device, count), timeout=None)
+                    if queue.durability == "commit":
+                        future.result()
+
+                _run(label, work, args.devices, args.requests, args.readings)
+                started = time.perf_counter()
+                queue.stop()
+                print(f"{'':>28}  drained backlog in {time.perf_counter() - started:.2f}s, {queue.committed_batches} commits")
+            database.connections.close_all()
+
+
+if __name__ == "__main__":
+    main()
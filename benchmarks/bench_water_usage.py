@@ -0,0 +1,155 @@
+"""/analytics/water_usage build time for a user with a long command history.
+
+Seeds a temporary database with --commands executed water_now commands
+spread over --days days across a few devices and plant calibrations and
+builds the daily water-usage ledger from them. It then times
+auth_api._build_water_usage_analytics (a read of at most seven ledger days)
+against a replay of the original implementation, which loaded every
+executed command and looked up a calibration per row, and compares both
+results. The write-side cost is reported as the time to acknowledge
+--acks queued commands, which updates the ledger incrementally.
+
+    python benchmarks/bench_water_usage.py --commands 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from balconygreen.db_implementation.timestamps import from_epoch_ms, to_epoch_ms  # noqa: E402
+from balconygreen.db_implementation.water_usage import rebuild_water_usage  # noqa: E402
+
+DEVICES = ["balcony-1", "balcony-2", "balcony-3"]
+PLANTS = ["tomato_indoor", "basil", "chili_pepper"]
+
+
+def _seed(auth_api, user_id: str, commands: int, days: int) -> None:
+    now = datetime.now(tz=timezone.utc)
+    rnd = random.Random(7)
+    with auth_api.database.get_conn() as conn:
+        conn.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, 'x')", (user_id, f"{user_id}@bench"))
+        conn.executemany(
+            "INSERT INTO soil_sensor_calibrations "
+            "(id, user_id, device_id, plant_type, soil_raw_dry, soil_raw_wet, moisture_target_pct, pump_flow_ml_per_sec) "
+            "VALUES (?, ?, ?, ?, 3000, 1200, 40, ?)",
+            [(str(uuid.uuid4()), user_id, device, plant, 2.0 + index) for index, device in enumerate(DEVICES) for plant in PLANTS],
+        )
+        rows = []
+        for _ in range(commands):
+            stamp = now - timedelta(seconds=rnd.randint(0, days * 86400))
+            payload = {"pump_ms": rnd.choice([500, 1500, 3000]), "plant_type": rnd.choice(PLANTS)}
+            rows.append(
+                (str(uuid.uuid4()), user_id, rnd.choice(DEVICES), json.dumps(payload), stamp, to_epoch_ms(stamp), stamp, to_epoch_ms(stamp))
+            )
+        conn.executemany(
+            "INSERT INTO device_commands "
+            "(id, user_id, device_id, command_type, payload_json, status, created_at, created_at_ms, acknowledged_at, acknowledged_at_ms) "
+            "VALUES (?, ?, ?, 'water_now', ?, 'executed', ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def _seed_queued(auth_api, user_id: str, count: int) -> list[tuple[str, str]]:
+    now = datetime.now(tz=timezone.utc)
+    commands = [(str(uuid.uuid4()), DEVICES[index % len(DEVICES)]) for index in range(count)]
+    with auth_api.database.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO device_commands "
+            "(id, user_id, device_id, command_type, payload_json, status, created_at, created_at_ms) "
+            "VALUES (?, ?, ?, 'water_now', ?, 'delivered', ?, ?)",
+            [
+                (command_id, user_id, device, json.dumps({"pump_ms": 1500, "plant_type": PLANTS[0]}), now, to_epoch_ms(now))
+                for command_id, device in commands
+            ],
+        )
+    return commands
+
+
+def _legacy_water_usage(auth_api, user_id: str) -> dict:
+    """The per-command loop this benchmark replaced, reduced to the totals it produced."""
+    rows = auth_api.database.fetch_all(
+        """
+        SELECT id, device_id, payload_json, created_at_ms, acknowledged_at_ms
+        FROM device_commands
+        WHERE user_id = ? AND status = 'executed'
+        ORDER BY COALESCE(acknowledged_at_ms, created_at_ms) DESC
+        """,
+        (user_id,),
+    )
+    today = datetime.now(tz=timezone.utc).date()
+    totals = {"today": [0, 0.0], "last_7_days": [0, 0.0]}
+    for row in rows:
+        event_date = from_epoch_ms(row["acknowledged_at_ms"] or row["created_at_ms"]).date()
+        payload = json.loads(row["payload_json"])
+        calibration = auth_api._get_latest_calibration(user_id, row["device_id"], payload.get("plant_type"))
+        pump_ms = int(payload.get("pump_ms", 0) or 0)
+        ml = pump_ms / 1000.0 * float(calibration["pump_flow_ml_per_sec"])
+        for key, include in (("today", event_date == today), ("last_7_days", event_date >= today - timedelta(days=6))):
+            if include:
+                totals[key][0] += pump_ms
+                totals[key][1] += ml
+    return {key: {"pump_ms": pump_ms, "estimated_ml": round(ml, 2)} for key, (pump_ms, ml) in totals.items()}
+
+
+def _time(func, repeats: int) -> tuple[float, object]:
+    samples = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="History length the commands are spread over.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--acks", type=int, default=500, help="Queued commands acknowledged to time ledger upkeep.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["BALCONYGREEN_DB_PATH"] = str(Path(tmp) / "bench.db")
+        from balconygreen import auth_api
+
+        user_id = str(uuid.uuid4())
+        _seed(auth_api, user_id, args.commands, args.days)
+        started = time.perf_counter()
+        with auth_api.database.get_conn() as conn:
+            rebuild_water_usage(conn)
+        rebuild_elapsed = time.perf_counter() - started
+
+        acked = _seed_queued(auth_api, user_id, args.acks)
+        started = time.perf_counter()
+        for command_id, device in acked:
+            auth_api._acknowledge_command(user_id, device, command_id, "executed", None)
+        ack_elapsed = (time.perf_counter() - started) / max(1, len(acked))
+
+        legacy_elapsed, legacy = _time(lambda: _legacy_water_usage(auth_api, user_id), max(1, args.repeats // 5))
+        ledger_elapsed, current = _time(lambda: auth_api._build_water_usage_analytics(user_id), args.repeats)
+        for key in ("today", "last_7_days"):
+            if legacy[key]["pump_ms"] != current[key]["pump_ms"] or abs(legacy[key]["estimated_ml"] - current[key]["estimated_ml"]) > 0.05:
+                raise SystemExit(f"Result mismatch for {key}: {legacy[key]} != {current[key]}")
+
+        print(f"{args.commands} executed commands over {args.days} days, {len(acked)} acknowledged live")
+        print(f"per-command loop      {legacy_elapsed * 1000:10.1f} ms")
+        print(f"ledger read           {ledger_elapsed * 1000:10.3f} ms")
+        print(f"ack incl. ledger      {ack_elapsed * 1000:10.3f} ms per command")
+        print(f"full ledger rebuild   {rebuild_elapsed * 1000:10.1f} ms")
+        auth_api.ingest_queue.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,74 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import heapq
+import itertools
 import json
+import logging
 import uuid
+from collections.abc import Awaitable, Callable, Iterator
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from fastapi import Depends, FastAPI, HTTPException  # type: ignore
+import numpy as np  # type: ignore
+from fastapi import Depends, FastAPI, Header, HTTPException, Response, WebSocket, WebSocketDisconnect  # type: ignore
+from fastapi.encoders import jsonable_encoder  # type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse  # type: ignore
 from fastapi.security import OAuth2PasswordBearer  # type: ignore
 from jose import JWTError, jwt  # type: ignore
-from pydantic import BaseModel  # type: ignore
+from pydantic import BaseModel, ValidationError  # type: ignore
 
+from balconygreen.auth_cache import TokenUserCache
+from balconygreen.db_implementation.archive import ReadingArchive
+from balconygreen.db_implementation.async_db import AsyncDatabase
+from balconygreen.db_implementation.commands import CommandDeadlineScheduler, claim_commands
 from balconygreen.db_implementation.db_general import Database
-from balconygreen.settings import DB_PATH, JWT_SECRET_KEY
+from balconygreen.db_implementation.exports import EXPORT_FORMATS, gzip_chunks, iter_csv, iter_parquet, parquet_available
+from balconygreen.db_implementation.ingest_queue import IngestQueueFull, ReadingIngestQueue
+from balconygreen.db_implementation.latest import serialize_latest
+from balconygreen.db_implementation.pagination import decode_cursor, encode_cursor, ndjson_line
+from balconygreen.db_implementation.pump_diagnostics import PumpDiagnosticsScheduler, serialize_diagnostic
+from balconygreen.db_implementation.rollups import ROLLUP_RESOLUTIONS, serialize_rollup
+from balconygreen.db_implementation.timestamps import from_epoch_ms, iso_from_epoch_ms, to_epoch_ms
+from balconygreen.db_implementation.water_usage import rebuild_after_calibration, rebuild_water_usage, record_command_usage, usage_day
+from balconygreen.device_channel import DeviceChannelHub
+from balconygreen.response_cache import ResponseCache
+from balconygreen.settings import (
+    ANALYTICS_THREADPOOL_SIZE,
+    ARCHIVE_DIR,
+    AUTH_CACHE_SIZE,
+    COMMAND_ACK_TIMEOUT_SECONDS,
+    COMMAND_MAX_ATTEMPTS,
+    DB_PATH,
+    DB_THREADPOOL_SIZE,
+    DEVICE_CHANNEL_POLL_SECONDS,
+    INGEST_BATCH_SIZE,
+    INGEST_DURABILITY,
+    INGEST_FLUSH_INTERVAL_MS,
+    INGEST_MAX_PENDING_ROWS,
+    JWT_SECRET_KEY,
+    PUMP_DIAGNOSTICS_BACKFILL_DAYS,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RETENTION_ENABLED,
+    RETENTION_HOT_DAYS,
+    RETENTION_HOT_DAYS_BY_SENSOR,
+    RETENTION_INCREMENTAL_VACUUM,
+    RETENTION_INTERVAL_SECONDS,
+)
+from balconygreen.timeseries import TimeSeries
 from balconygreen.user_service import UserService
 
 
+logger = logging.getLogger(__name__)
+
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30
+# Largest page returned as a JSON list; larger histories are paged with the
+# X-Next-Cursor header or streamed as NDJSON one page at a time.
+READINGS_PAGE_MAX = 5000
+READINGS_STREAM_PAGE_SIZE = 1000
 app = FastAPI(title="Balcony Green Auth API")
 
 
@@ -33,6 +85,16 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class AccountUpdateRequest(BaseModel):
+    current_password: str
+    name: str | None = None
+    password: str | None = None
+
+
+class AccountDeleteRequest(BaseModel):
+    password: str
+
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "Bearer"
@@ -99,7 +161,32 @@ class WateringFeedbackRequest(BaseModel):
 
 user_service = UserService(DB_PATH)
 database = Database(DB_PATH)
+# Request handlers never touch SQLite on the event loop. Analytics get their own
+# small pool so a slow report cannot starve auth lookups and plain reads.
+async_database = AsyncDatabase(database, max_workers=DB_THREADPOOL_SIZE, thread_name_prefix="db")
+analytics_database = AsyncDatabase(database, max_workers=ANALYTICS_THREADPOOL_SIZE, thread_name_prefix="analytics")
+ingest_queue = ReadingIngestQueue(
+    database,
+    batch_size=INGEST_BATCH_SIZE,
+    flush_interval_ms=INGEST_FLUSH_INTERVAL_MS,
+    max_pending_rows=INGEST_MAX_PENDING_ROWS,
+    durability=INGEST_DURABILITY,
+)
+reading_archive = ReadingArchive(
+    database,
+    ARCHIVE_DIR,
+    default_hot_days=RETENTION_HOT_DAYS,
+    hot_days_by_sensor=RETENTION_HOT_DAYS_BY_SENSOR,
+    incremental_vacuum=RETENTION_INCREMENTAL_VACUUM,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+token_cache = TokenUserCache(max_entries=AUTH_CACHE_SIZE)
+user_service.add_change_listener(token_cache.invalidate_user)
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+user_service.add_change_listener(response_cache.invalidate_user)
+device_channels = DeviceChannelHub()
+command_deadlines = CommandDeadlineScheduler(database, COMMAND_ACK_TIMEOUT_SECONDS, COMMAND_MAX_ATTEMPTS)
+pump_diagnostics = PumpDiagnosticsScheduler(database, backfill_days=PUMP_DIAGNOSTICS_BACKFILL_DAYS)
 
 
 class JWTService:
@@ -112,20 +199,34 @@ class JWTService:
         return jwt.encode(payload, JWT_SECRET_KEY, algorithm=ALGORITHM)
 
     @staticmethod
-    def verify_token(token: str):
+    def decode_token(token: str) -> dict:
         try:
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
-            return payload["sub"]
+            return jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         except JWTError as exc:
             raise HTTPException(401, "Invalid or expired token") from exc
 
+    @staticmethod
+    def verify_token(token: str):
+        return JWTService.decode_token(token)["sub"]
+
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    user_id = JWTService.verify_token(token)
-    user = user_service.get_user_by_id(user_id)
+async def _resolve_user(token: str) -> dict:
+    # A cached entry implies the token's signature was already verified and it has not expired.
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = JWTService.decode_token(token)
+    user_id = payload["sub"]
+    user = await async_database.run(user_service.get_user_by_id, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return {"id": user_id, "username": user[1], "email": user[1], "name": user[2]}
+    resolved = {"id": user_id, "username": user[1], "email": user[1], "name": user[2]}
+    token_cache.put(token, resolved, float(payload["exp"]))
+    return resolved
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await _resolve_user(token)
 
 
 def _auth_identifier(username: str | None = None, email: str | None = None) -> str:
@@ -135,21 +236,6 @@ def _auth_identifier(username: str | None = None, email: str | None = None) -> s
     return identifier
 
 
-def _parse_db_datetime(value: Any) -> datetime | None:
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value
-    text = str(value).replace("Z", "+00:00")
-    try:
-        parsed = datetime.fromisoformat(text)
-    except ValueError:
-        return None
-    if parsed.tzinfo is None:
-        return parsed.replace(tzinfo=timezone.utc)
-    return parsed
-
-
 def _serialize_command(row: dict) -> dict:
     payload = json.loads(row["payload_json"])
     return {
@@ -159,9 +245,10 @@ def _serialize_command(row: dict) -> dict:
         "payload": payload,
         "status": row["status"],
         "device_message": row.get("device_message"),
-        "created_at": row["created_at"],
-        "delivered_at": row.get("delivered_at"),
-        "acknowledged_at": row.get("acknowledged_at"),
+        "created_at": iso_from_epoch_ms(row.get("created_at_ms")),
+        "delivered_at": iso_from_epoch_ms(row.get("delivered_at_ms")),
+        "acknowledged_at": iso_from_epoch_ms(row.get("acknowledged_at_ms")),
+        "attempts": row.get("attempts", 0),
     }
 
 
@@ -218,7 +305,8 @@ def _get_latest_calibration(user_id: str, device_id: str, plant_type: str | None
     )
 
 
-def _raw_to_moisture_pct(raw_value: float, calibration: dict | None) -> float | None:
+def _raw_to_moisture_pct(raw_values: np.ndarray, calibration: dict | None) -> np.ndarray | None:
+    """Convert raw soil readings to moisture percent with a calibration, or ``None`` if it cannot."""
     if calibration is None:
         return None
     raw_dry = float(calibration["soil_raw_dry"])
@@ -226,281 +314,667 @@ def _raw_to_moisture_pct(raw_value: float, calibration: dict | None) -> float |
     span = raw_dry - raw_wet
     if abs(span) < 1e-6:
         return None
-    moisture = ((raw_dry - float(raw_value)) * 100.0) / span
-    return max(0.0, min(100.0, moisture))
+    return np.clip((raw_dry - raw_values) * 100.0 / span, 0.0, 100.0)
 
 
-def _query_sensor_series(
+def _iter_hot_readings(
     user_id: str,
-    sensor_name: str,
-    start_time: datetime | None = None,
-    end_time: datetime | None = None,
-    device_id: str | None = None,
-    limit: int = 200,
-) -> list[dict]:
-    clauses = ["user_id = ?", "sensor_name = ?"]
-    params: list[Any] = [user_id, sensor_name]
+    device_id: str | None,
+    sensor_name: str | None,
+    start_ms: int | None,
+    cursor: tuple[int, int] | None,
+    page_size: int,
+    end_ms: int | None = None,
+    descending: bool = True,
+) -> Iterator[dict]:
+    """Yield SQLite readings in ``(timestamp_ms, id)`` order, one keyset page at a time.
+
+    ``cursor`` is the sort key of the last row already seen; iteration resumes
+    strictly after it in the requested direction.
+    """
+    clauses = ["user_id = ?"]
+    params: list[Any] = [user_id]
     if device_id:
         clauses.append("device_id = ?")
         params.append(device_id)
-    if start_time:
-        clauses.append("timestamp >= ?")
-        params.append(start_time)
-    if end_time:
-        clauses.append("timestamp <= ?")
-        params.append(end_time)
-    params.append(max(1, min(limit, 5000)))
-    return database.fetch_all(
-        f"""
-        SELECT sensor_name, value, timestamp, source, device_id
-        FROM readings
-        WHERE {' AND '.join(clauses)}
-        ORDER BY timestamp ASC
-        LIMIT ?
-        """,
-        tuple(params),
+    if sensor_name:
+        clauses.append("sensor_name = ?")
+        params.append(sensor_name)
+    if start_ms is not None:
+        clauses.append("timestamp_ms >= ?")
+        params.append(start_ms)
+    if end_ms is not None:
+        clauses.append("timestamp_ms < ?")
+        params.append(end_ms)
+    # Written as a range plus a residual filter so SQLite can seek the index on timestamp_ms.
+    if descending:
+        keyset = "timestamp_ms <= ? AND (timestamp_ms < ? OR id < ?)"
+    else:
+        keyset = "timestamp_ms >= ? AND (timestamp_ms > ? OR id > ?)"
+    order = "DESC" if descending else "ASC"
+    while True:
+        page_clauses = list(clauses)
+        page_params = list(params)
+        if cursor is not None:
+            page_clauses.append(keyset)
+            page_params.extend([cursor[0], cursor[0], cursor[1]])
+        page_params.append(page_size)
+        rows = database.fetch_all(
+            f"""
+            SELECT id, sensor_name, value, timestamp_ms, source, device_id
+            FROM readings
+            WHERE {' AND '.join(page_clauses)}
+            ORDER BY timestamp_ms {order}, id {order}
+            LIMIT ?
+            """,
+            tuple(page_params),
+        )
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = _reading_sort_key(rows[-1])
+
+
+def _iter_readings(
+    user_id: str,
+    device_id: str | None = None,
+    sensor_name: str | None = None,
+    start_ms: int | None = None,
+    cursor: tuple[int, int] | None = None,
+    page_size: int = READINGS_STREAM_PAGE_SIZE,
+    end_ms: int | None = None,
+    descending: bool = True,
+) -> Iterator[dict]:
+    """Raw readings across SQLite and the cold archive, resumable from a keyset cursor."""
+    hot = _iter_hot_readings(user_id, device_id, sensor_name, start_ms, cursor, page_size, end_ms, descending)
+    if not reading_archive.needs_archive(start_ms, sensor_name):
+        yield from hot
+        return
+    # Lazy: one day partition is read at a time, as the merge reaches it.
+    archived = reading_archive.iter_range(user_id, start_ms, end_ms, device_id, sensor_name, descending=descending, cursor=cursor)
+    if descending:
+        # Archived rows all sort below the watermark, so the Parquet files are only
+        # opened once the hot rows have been walked down to it.
+        watermark = reading_archive.archived_before_ms(sensor_name)
+        for row in hot:
+            if row["timestamp_ms"] < watermark:
+                hot = itertools.chain([row], hot)
+                break
+            yield row
+    yield from heapq.merge(hot, archived, key=_reading_sort_key, reverse=descending)
+
+
+def _reading_sort_key(row: dict) -> tuple[int, int]:
+    return row["timestamp_ms"], row["id"]
+
+
+def _query_raw_readings(
+    user_id: str,
+    device_id: str | None,
+    sensor_name: str | None,
+    start_time: datetime | None,
+    limit: int,
+    cursor: tuple[int, int] | None = None,
+) -> tuple[list[dict], str | None]:
+    """One page of raw readings plus the cursor for the next page, or ``None`` on the last page."""
+    start_ms = to_epoch_ms(start_time) if start_time else None
+    rows = list(
+        itertools.islice(
+            _iter_readings(user_id, device_id, sensor_name, start_ms, cursor, page_size=limit + 1),
+            limit + 1,
+        )
     )
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*_reading_sort_key(rows[-1]))
 
 
-def _get_nearest_before(readings: list[dict], event_time: datetime) -> dict | None:
-    eligible = [row for row in readings if (_parse_db_datetime(row["timestamp"]) or event_time) <= event_time]
-    return eligible[-1] if eligible else None
+def _serialize_reading(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "sensor_name": row["sensor_name"],
+        "value": row["value"],
+        "timestamp": iso_from_epoch_ms(row["timestamp_ms"]),
+        "timestamp_ms": row["timestamp_ms"],
+        "source": row["source"],
+        "device_id": row.get("device_id"),
+    }
 
 
-def _get_max_after(readings: list[dict], event_time: datetime) -> dict | None:
-    eligible = [row for row in readings if (_parse_db_datetime(row["timestamp"]) or event_time) >= event_time]
-    if not eligible:
-        return None
-    return max(eligible, key=lambda row: float(row["value"]))
+def _take(rows: Iterator[dict], count: int) -> list[dict]:
+    return list(itertools.islice(rows, count))
 
 
-def _estimate_command_water_ml(command_row: dict, calibration: dict | None) -> float | None:
-    pump_ms = float(json.loads(command_row["payload_json"]).get("pump_ms", 0.0))
-    if pump_ms <= 0:
-        return 0.0
-    if calibration is None or calibration.get("pump_flow_ml_per_sec") is None:
-        return None
-    flow_rate = float(calibration["pump_flow_ml_per_sec"])
-    return round((pump_ms / 1000.0) * flow_rate, 2)
+def _iter_pages(rows: Iterator[dict], page_size: int) -> Iterator[list[dict]]:
+    while page := _take(rows, page_size):
+        yield page
+
+
+def _merge_windows(windows: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for start_ms, end_ms in sorted(windows):
+        if merged and start_ms <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_ms))
+        else:
+            merged.append((start_ms, end_ms))
+    return merged
+
+
+def _load_sensor_series(
+    user_id: str,
+    sensor_names: tuple[str, ...],
+    windows_by_device: dict[str, list[tuple[int, int]]],
+) -> dict[tuple[str, str], TimeSeries]:
+    """Readings inside the union of inclusive windows, as one ``TimeSeries`` per (device, sensor).
+
+    Overlapping windows are merged first and every range goes into a single
+    query, so each reading is fetched and parsed exactly once.
+    """
+    intervals = [
+        (device_id, start_ms, end_ms)
+        for device_id, windows in windows_by_device.items()
+        for start_ms, end_ms in _merge_windows(windows)
+    ]
+    if not intervals:
+        return {}
+    windows = ", ".join("(?, ?, ?)" for _ in intervals)
+    params: list[Any] = [*itertools.chain.from_iterable(intervals), user_id, *sensor_names]
+    with database.get_conn() as conn:
+        cursor = conn.cursor()
+        # Plain tuples; building sqlite3.Row objects dominates the cost of large windows.
+        cursor.row_factory = None
+        rows = cursor.execute(
+            f"""
+            WITH windows (device_id, start_ms, end_ms) AS (VALUES {windows})
+            SELECT r.device_id, r.sensor_name, r.timestamp_ms, r.value
+            FROM windows AS w
+            JOIN readings AS r
+              ON r.user_id = ?
+             AND r.device_id = w.device_id
+             AND r.sensor_name IN ({', '.join('?' for _ in sensor_names)})
+             AND r.timestamp_ms BETWEEN w.start_ms AND w.end_ms
+            """,
+            tuple(params),
+        ).fetchall()
+    for device_id, start_ms, end_ms in intervals:
+        for sensor_name in sensor_names:
+            if reading_archive.needs_archive(start_ms, sensor_name):
+                archived = reading_archive.read_range(user_id, start_ms, end_ms + 1, device_id, sensor_name)
+                rows.extend((row["device_id"], row["sensor_name"], row["timestamp_ms"], row["value"]) for row in archived)
+
+    grouped: dict[tuple[str, str], list[tuple[int, float]]] = {}
+    for device_id, sensor_name, timestamp_ms, value in rows:
+        grouped.setdefault((device_id, sensor_name), []).append((timestamp_ms, value))
+    return {key: TimeSeries.from_points(points) for key, points in grouped.items()}
+
+
+def _before_and_after(
+    series: TimeSeries | None,
+    start_ms: int,
+    event_ms: int,
+    end_ms: int,
+    calibration: dict | None = None,
+    convert: bool = False,
+) -> tuple[float | None, float | None]:
+    """Last value at or before ``event_ms`` and the largest value from ``event_ms`` on, within ``[start_ms, end_ms]``.
+
+    With ``convert`` the raw values are mapped through ``calibration`` first;
+    both results are ``None`` when that conversion is not possible.
+    """
+    if series is None:
+        return None, None
+    before_values = series.between(start_ms, event_ms).values[-1:]
+    after_values = series.between(event_ms, end_ms).values
+    if convert:
+        before_values = _raw_to_moisture_pct(before_values, calibration)
+        after_values = _raw_to_moisture_pct(after_values, calibration)
+        if before_values is None or after_values is None:
+            return None, None
+    before = float(before_values[0]) if before_values.size else None
+    after = float(after_values.max()) if after_values.size else None
+    return before, after
 
 
 def _build_water_usage_analytics(user_id: str, device_id: str | None = None) -> dict:
-    clauses = ["user_id = ?", "status = 'executed'"]
-    params: list[Any] = [user_id]
+    today = datetime.now(tz=timezone.utc).date()
+    week_start = today - timedelta(days=6)
+    clauses = ["user_id = ?", "day >= ?"]
+    params: list[Any] = [user_id, week_start.isoformat()]
     if device_id:
         clauses.append("device_id = ?")
         params.append(device_id)
 
+    # water_usage_daily is maintained on ack, so this reads at most seven days.
     rows = database.fetch_all(
         f"""
-        SELECT id, device_id, payload_json, created_at, acknowledged_at
-        FROM device_commands
+        SELECT day, SUM(commands) AS commands, SUM(pump_ms) AS pump_ms,
+               SUM(estimated_ml) AS estimated_ml, SUM(estimated_commands) AS estimated_commands
+        FROM water_usage_daily
         WHERE {' AND '.join(clauses)}
-        ORDER BY COALESCE(acknowledged_at, created_at) DESC
+        GROUP BY day
         """,
         tuple(params),
     )
+    daily_totals = {row["day"]: row for row in rows}
 
-    today = datetime.now(tz=timezone.utc).date()
-    daily_totals: dict[str, dict[str, float | int | None]] = {}
-    today_pump_ms = 0
-    week_pump_ms = 0
-    today_ml = 0.0
-    week_ml = 0.0
-    has_today_ml = False
-    has_week_ml = False
-
-    for row in rows:
-        event_time = _parse_db_datetime(row.get("acknowledged_at") or row.get("created_at"))
-        if event_time is None:
-            continue
-        payload = json.loads(row["payload_json"])
-        pump_ms = int(payload.get("pump_ms", 0) or 0)
-        calibration = _get_latest_calibration(user_id, row["device_id"], payload.get("plant_type"))
-        estimated_ml = _estimate_command_water_ml(row, calibration)
-
-        day_key = event_time.date().isoformat()
-        if day_key not in daily_totals:
-            daily_totals[day_key] = {"pump_ms": 0, "estimated_ml": 0.0, "commands": 0, "has_ml": False}
-        daily_totals[day_key]["pump_ms"] = int(daily_totals[day_key]["pump_ms"]) + pump_ms
-        daily_totals[day_key]["commands"] = int(daily_totals[day_key]["commands"]) + 1
-        if estimated_ml is not None:
-            daily_totals[day_key]["estimated_ml"] = float(daily_totals[day_key]["estimated_ml"]) + estimated_ml
-            daily_totals[day_key]["has_ml"] = True
-
-        if event_time.date() == today:
-            today_pump_ms += pump_ms
-            if estimated_ml is not None:
-                today_ml += estimated_ml
-                has_today_ml = True
-        if event_time.date() >= today - timedelta(days=6):
-            week_pump_ms += pump_ms
-            if estimated_ml is not None:
-                week_ml += estimated_ml
-                has_week_ml = True
+    def estimated_ml(days: list[dict]) -> float | None:
+        if not any(day["estimated_commands"] for day in days):
+            return None
+        return round(sum(float(day["estimated_ml"]) for day in days), 2)
 
     last_seven = []
     for offset in range(6, -1, -1):
-        day = today - timedelta(days=offset)
-        key = day.isoformat()
-        bucket = daily_totals.get(key, {"pump_ms": 0, "estimated_ml": 0.0, "commands": 0, "has_ml": False})
+        key = (today - timedelta(days=offset)).isoformat()
+        bucket = daily_totals.get(key)
         last_seven.append(
             {
                 "date": key,
-                "pump_ms": int(bucket["pump_ms"]),
-                "estimated_ml": round(float(bucket["estimated_ml"]), 2) if bucket["has_ml"] else None,
-                "commands": int(bucket["commands"]),
+                "pump_ms": int(bucket["pump_ms"]) if bucket else 0,
+                "estimated_ml": estimated_ml([bucket]) if bucket else None,
+                "commands": int(bucket["commands"]) if bucket else 0,
             }
         )
 
+    today_bucket = daily_totals.get(today.isoformat())
     return {
         "today": {
-            "pump_ms": today_pump_ms,
-            "estimated_ml": round(today_ml, 2) if has_today_ml else None,
+            "pump_ms": int(today_bucket["pump_ms"]) if today_bucket else 0,
+            "estimated_ml": estimated_ml([today_bucket]) if today_bucket else None,
         },
         "last_7_days": {
-            "pump_ms": week_pump_ms,
-            "estimated_ml": round(week_ml, 2) if has_week_ml else None,
+            "pump_ms": sum(int(row["pump_ms"]) for row in rows),
+            "estimated_ml": estimated_ml(rows),
         },
         "daily_series": last_seven,
     }
 
 
-def _build_pump_failure_analytics(user_id: str, device_id: str | None = None, limit: int = 5) -> list[dict]:
-    clauses = ["user_id = ?", "status = 'executed'"]
-    params: list[Any] = [user_id]
-    if device_id:
-        clauses.append("device_id = ?")
-        params.append(device_id)
-    params.append(max(1, min(limit, 20)))
+def _diagnose_pump_commands(user_id: str, command_ids: list[str]) -> list[dict]:
+    """Pump-response verdicts for the given commands that are still executed, for ``pump_diagnostics``.
 
+    Each verdict compares soil moisture at the ack with the highest value in
+    the calibration's failure window after it; ``window_end_ms`` tells the
+    scheduler whether that window has closed yet.
+    """
+    if not command_ids:
+        return []
     commands = database.fetch_all(
         f"""
-        SELECT id, device_id, payload_json, created_at, acknowledged_at, status
+        SELECT id, device_id, payload_json, created_at_ms, acknowledged_at_ms, status
         FROM device_commands
-        WHERE {' AND '.join(clauses)}
-        ORDER BY COALESCE(acknowledged_at, created_at) DESC
-        LIMIT ?
+        WHERE user_id = ? AND status = 'executed' AND id IN ({', '.join('?' for _ in command_ids)})
         """,
-        tuple(params),
+        (user_id, *command_ids),
     )
 
-    diagnostics: list[dict] = []
+    calibrations: dict[tuple[str, str | None], dict | None] = {}
+    evaluations = []
+    windows_by_device: dict[str, list[tuple[int, int]]] = {}
     for command in commands:
-        payload = json.loads(command["payload_json"])
-        event_time = _parse_db_datetime(command.get("acknowledged_at") or command.get("created_at"))
-        if event_time is None:
+        event_ms = command.get("acknowledged_at_ms") or command.get("created_at_ms")
+        if event_ms is None:
             continue
-        calibration = _get_latest_calibration(user_id, command["device_id"], payload.get("plant_type"))
+        plant_type = json.loads(command["payload_json"]).get("plant_type")
+        key = (command["device_id"], plant_type)
+        if key not in calibrations:
+            calibrations[key] = _get_latest_calibration(user_id, command["device_id"], plant_type)
+        calibration = calibrations[key]
         failure_window = int((calibration or {}).get("failure_window_minutes", 45))
-        min_rise_pct = float((calibration or {}).get("failure_min_rise_pct", 2.0))
-        window_start = event_time - timedelta(hours=2)
-        window_end = event_time + timedelta(minutes=failure_window)
-
-        moisture_rows = _query_sensor_series(
-            user_id=user_id,
-            sensor_name="soil_moisture",
-            start_time=window_start,
-            end_time=window_end,
-            device_id=command["device_id"],
-        )
-        raw_rows = _query_sensor_series(
-            user_id=user_id,
-            sensor_name="soil_raw",
-            start_time=window_start,
-            end_time=window_end,
-            device_id=command["device_id"],
-        )
+        window = (event_ms - 2 * 60 * 60 * 1000, event_ms + failure_window * 60 * 1000)
+        windows_by_device.setdefault(command["device_id"], []).append(window)
+        evaluations.append((command, calibration, event_ms, window, failure_window))
 
-        before = _get_nearest_before(moisture_rows, event_time)
-        after = _get_max_after(moisture_rows, event_time)
-        moisture_before = float(before["value"]) if before else None
-        moisture_after = float(after["value"]) if after else None
+    series = _load_sensor_series(user_id, ("soil_moisture", "soil_raw"), windows_by_device)
 
+    diagnostics: list[dict] = []
+    for command, calibration, event_ms, (window_start, window_end), failure_window in evaluations:
+        verdict = {
+            "command_id": command["id"],
+            "user_id": user_id,
+            "device_id": command["device_id"],
+            "event_ms": event_ms,
+            "created_at_ms": command["created_at_ms"],
+            "window_minutes": failure_window,
+            "window_end_ms": window_end,
+        }
+        min_rise_pct = float((calibration or {}).get("failure_min_rise_pct", 2.0))
+        moisture_before, moisture_after = _before_and_after(
+            series.get((command["device_id"], "soil_moisture")), window_start, event_ms, window_end
+        )
         if moisture_before is None or moisture_after is None:
-            raw_before = _get_nearest_before(raw_rows, event_time)
-            raw_after = _get_max_after(
-                [
-                    {
-                        **row,
-                        "value": _raw_to_moisture_pct(float(row["value"]), calibration)
-                        if _raw_to_moisture_pct(float(row["value"]), calibration) is not None
-                        else row["value"],
-                    }
-                    for row in raw_rows
-                    if _raw_to_moisture_pct(float(row["value"]), calibration) is not None
-                ],
-                event_time,
+            raw_before, raw_after = _before_and_after(
+                series.get((command["device_id"], "soil_raw")), window_start, event_ms, window_end, calibration, convert=True
             )
-            if moisture_before is None and raw_before is not None:
-                moisture_before = _raw_to_moisture_pct(float(raw_before["value"]), calibration)
-            if moisture_after is None and raw_after is not None:
-                moisture_after = float(raw_after["value"])
+            if moisture_before is None:
+                moisture_before = raw_before
+            if moisture_after is None:
+                moisture_after = raw_after
 
         if moisture_before is None or moisture_after is None:
-            diagnostics.append(
+            verdict.update(
                 {
-                    "command_id": command["id"],
-                    "device_id": command["device_id"],
                     "status": "insufficient_data",
                     "message": "Not enough soil-moisture telemetry after watering to verify pump response.",
-                    "created_at": command["created_at"],
                     "moisture_before": moisture_before,
                     "moisture_after": moisture_after,
                     "moisture_delta": None,
                     "min_expected_rise_pct": min_rise_pct,
-                    "window_minutes": failure_window,
                 }
             )
+            diagnostics.append(verdict)
             continue
 
         delta = round(float(moisture_after) - float(moisture_before), 2)
-        diagnostics.append(
+        verdict.update(
             {
-                "command_id": command["id"],
-                "device_id": command["device_id"],
                 "status": "warning" if delta < min_rise_pct else "ok",
                 "message": (
                     "Soil moisture did not rise enough after watering."
                     if delta < min_rise_pct
                     else "Pump response looks normal."
                 ),
-                "created_at": command["created_at"],
                 "moisture_before": round(float(moisture_before), 2),
                 "moisture_after": round(float(moisture_after), 2),
                 "moisture_delta": delta,
                 "min_expected_rise_pct": min_rise_pct,
-                "window_minutes": failure_window,
             }
         )
+        diagnostics.append(verdict)
 
     return diagnostics
 
 
-def _store_sensor_readings(user_id: str, readings: list[SensorReading]) -> list[datetime]:
-    timestamps: list[datetime] = []
-    with database.get_conn() as conn:
-        for reading in readings:
-            timestamp = reading.timestamp or datetime.now(tz=timezone.utc)
-            conn.execute(
-                """
-                INSERT INTO readings (user_id, device_id, sensor_name, value, timestamp, source)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (user_id, reading.device_id, reading.sensor_name, reading.value, timestamp, reading.source),
+def _query_pump_diagnostics(user_id: str, device_id: str | None = None, limit: int = 5) -> list[dict]:
+    clauses = ["user_id = ?"]
+    params: list[Any] = [user_id]
+    if device_id:
+        clauses.append("device_id = ?")
+        params.append(device_id)
+    params.append(max(1, min(limit, 100)))
+    rows = database.fetch_all(
+        f"""
+        SELECT *
+        FROM pump_diagnostics
+        WHERE {' AND '.join(clauses)}
+        ORDER BY event_ms DESC
+        LIMIT ?
+        """,
+        tuple(params),
+    )
+    return [serialize_diagnostic(row) for row in rows]
+
+
+FLEET_COLUMNS = (
+    "device_id",
+    "last_seen",
+    "last_seen_age_s",
+    "sensors_reporting",
+    "channel_connected",
+    "queued_commands",
+    "delivered_commands",
+    "today_pump_ms",
+    "today_ml",
+    "week_pump_ms",
+    "week_ml",
+    "week_commands",
+    "week_verdicts",
+    "week_warnings",
+    "week_insufficient_data",
+    "last_verdict",
+    "last_verdict_at",
+)
+
+
+def _build_fleet_analytics(user_id: str) -> dict:
+    """Usage, pump verdicts and freshness for every device of a user, as one column per field.
+
+    All four reads run inside ``database.read_snapshot()``, so they see one
+    WAL snapshot and the columns agree with each other. Each is a GROUP BY
+    device_id over the materialised tables (readings_latest,
+    water_usage_daily, pump_diagnostics) or an index seek on device_commands,
+    so the cost grows with the number of devices rather than with history.
+    """
+    now_ms = to_epoch_ms(datetime.now(tz=timezone.utc))
+    today = from_epoch_ms(now_ms).date()
+    week_start = today - timedelta(days=6)
+    week_start_ms = to_epoch_ms(datetime.combine(week_start, datetime.min.time(), tzinfo=timezone.utc))
+    devices: dict[str, dict[str, Any]] = {}
+
+    def device(device_id: str) -> dict[str, Any]:
+        return devices.setdefault(device_id, {"device_id": device_id})
+
+    with database.read_snapshot() as conn:
+        for row in conn.execute(
+            """
+            SELECT device_id, MAX(timestamp_ms) AS last_seen_ms, COUNT(*) AS sensors
+            FROM readings_latest
+            WHERE user_id = ? AND device_id != ''
+            GROUP BY device_id
+            """,
+            (user_id,),
+        ):
+            device(row["device_id"]).update(last_seen_ms=row["last_seen_ms"], sensors_reporting=row["sensors"])
+
+        for row in conn.execute(
+            """
+            SELECT
+                device_id,
+                SUM(CASE WHEN day = ? THEN pump_ms ELSE 0 END) AS today_pump_ms,
+                SUM(CASE WHEN day = ? THEN estimated_ml ELSE 0 END) AS today_ml,
+                SUM(CASE WHEN day = ? THEN estimated_commands ELSE 0 END) AS today_estimated,
+                SUM(pump_ms) AS week_pump_ms,
+                SUM(estimated_ml) AS week_ml,
+                SUM(estimated_commands) AS week_estimated,
+                SUM(commands) AS week_commands
+            FROM water_usage_daily
+            WHERE user_id = ? AND day >= ?
+            GROUP BY device_id
+            """,
+            (today.isoformat(), today.isoformat(), today.isoformat(), user_id, week_start.isoformat()),
+        ):
+            device(row["device_id"]).update(
+                today_pump_ms=int(row["today_pump_ms"]),
+                today_ml=round(float(row["today_ml"]), 2) if row["today_estimated"] else None,
+                week_pump_ms=int(row["week_pump_ms"]),
+                week_ml=round(float(row["week_ml"]), 2) if row["week_estimated"] else None,
+                week_commands=int(row["week_commands"]),
             )
-            timestamps.append(timestamp)
+
+        # Bare status/event_ms come from the row holding MAX(event_ms).
+        for row in conn.execute(
+            """
+            SELECT
+                device_id,
+                status AS last_verdict,
+                MAX(event_ms) AS last_verdict_ms,
+                SUM(event_ms >= ?) AS week_verdicts,
+                SUM(event_ms >= ? AND status = 'warning') AS week_warnings,
+                SUM(event_ms >= ? AND status = 'insufficient_data') AS week_insufficient_data
+            FROM pump_diagnostics
+            WHERE user_id = ?
+            GROUP BY device_id
+            """,
+            (week_start_ms, week_start_ms, week_start_ms, user_id),
+        ):
+            device(row["device_id"]).update(
+                last_verdict=row["last_verdict"],
+                last_verdict_ms=row["last_verdict_ms"],
+                week_verdicts=int(row["week_verdicts"]),
+                week_warnings=int(row["week_warnings"]),
+                week_insufficient_data=int(row["week_insufficient_data"]),
+            )
+
+        # Commands still in flight; device_id IN (...) turns into seeks on idx_device_commands_device_status_created.
+        if devices:
+            device_ids = list(devices)
+            for row in conn.execute(
+                f"""
+                SELECT device_id, SUM(status = 'queued') AS queued, SUM(status = 'delivered') AS delivered
+                FROM device_commands
+                WHERE device_id IN ({', '.join('?' for _ in device_ids)}) AND status IN ('queued', 'delivered') AND user_id = ?
+                GROUP BY device_id
+                """,
+                (*device_ids, user_id),
+            ):
+                device(row["device_id"]).update(queued_commands=int(row["queued"]), delivered_commands=int(row["delivered"]))
+
+    ordered = [devices[device_id] for device_id in sorted(devices)]
+    for entry in ordered:
+        last_seen_ms = entry.pop("last_seen_ms", None)
+        last_verdict_ms = entry.pop("last_verdict_ms", None)
+        entry["last_seen"] = iso_from_epoch_ms(last_seen_ms)
+        entry["last_seen_age_s"] = None if last_seen_ms is None else max(0, (now_ms - last_seen_ms) // 1000)
+        entry["last_verdict_at"] = iso_from_epoch_ms(last_verdict_ms)
+        entry["channel_connected"] = device_channels.is_connected(user_id, entry["device_id"])
+
+    defaults = {
+        "sensors_reporting": 0,
+        "queued_commands": 0,
+        "delivered_commands": 0,
+        "today_pump_ms": 0,
+        "week_pump_ms": 0,
+        "week_commands": 0,
+        "week_verdicts": 0,
+        "week_warnings": 0,
+        "week_insufficient_data": 0,
+    }
+    return {
+        "generated_at": iso_from_epoch_ms(now_ms),
+        "device_count": len(ordered),
+        "columns": {column: [entry.get(column, defaults.get(column)) for entry in ordered] for column in FLEET_COLUMNS},
+    }
+
+
+async def _store_sensor_readings(user_id: str, readings: list[SensorReading]) -> list[datetime]:
+    timestamps: list[datetime] = []
+    rows = []
+    for reading in readings:
+        timestamp = reading.timestamp or datetime.now(tz=timezone.utc)
+        rows.append(
+            (user_id, reading.device_id, reading.sensor_name, reading.value, timestamp, to_epoch_ms(timestamp), reading.source)
+        )
+        timestamps.append(timestamp)
+    try:
+        committed = ingest_queue.submit(rows)
+    except IngestQueueFull as exc:
+        raise HTTPException(status_code=503, detail="Reading ingestion is saturated, retry shortly", headers={"Retry-After": "1"}) from exc
+    if ingest_queue.durability == "commit":
+        await asyncio.wrap_future(committed)
     return timestamps
 
 
+def _query_reading_rollups(
+    user_id: str,
+    resolution: str,
+    device_id: str | None = None,
+    sensor_name: str | None = None,
+    start_time: datetime | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    clauses = ["user_id = ?", "resolution = ?"]
+    params: list[Any] = [user_id, resolution]
+    if device_id:
+        clauses.append("device_id = ?")
+        params.append(device_id)
+    if sensor_name:
+        clauses.append("sensor_name = ?")
+        params.append(sensor_name)
+    if start_time:
+        clauses.append("bucket_start_ms >= ?")
+        params.append(to_epoch_ms(start_time))
+    params.append(max(1, min(limit, 20000)))
+    rows = database.fetch_all(
+        f"""
+        SELECT *
+        FROM reading_rollups
+        WHERE {' AND '.join(clauses)}
+        ORDER BY bucket_start_ms DESC
+        LIMIT ?
+        """,
+        tuple(params),
+    )
+    return [serialize_rollup(row) for row in rows]
+
+
+def _query_latest_readings(user_id: str, device_id: str | None = None, sensor_name: str | None = None) -> list[dict]:
+    clauses = ["user_id = ?"]
+    params: list[Any] = [user_id]
+    if device_id:
+        clauses.append("device_id = ?")
+        params.append(device_id)
+    if sensor_name:
+        clauses.append("sensor_name = ?")
+        params.append(sensor_name)
+    rows = database.fetch_all(
+        f"""
+        SELECT *
+        FROM readings_latest
+        WHERE {' AND '.join(clauses)}
+        ORDER BY timestamp_ms DESC
+        """,
+        tuple(params),
+    )
+    return [serialize_latest(row) for row in rows]
+
+
+@app.on_event("startup")
+def start_ingest_queue():
+    ingest_queue.start()
+
+
+@app.on_event("startup")
+def start_reading_retention():
+    if RETENTION_ENABLED and reading_archive.available:
+        reading_archive.start(RETENTION_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_command_deadlines():
+    loop = asyncio.get_running_loop()
+
+    def on_requeue(user_id: str, device_id: str) -> None:
+        response_cache.bump(user_id, "device_commands")
+        # The scheduler runs on its own thread; channel wake-ups must happen on the loop.
+        loop.call_soon_threadsafe(device_channels.notify, user_id, device_id)
+
+    command_deadlines.on_requeue = on_requeue
+    command_deadlines.on_expire = lambda user_id, device_id: response_cache.bump(user_id, "device_commands")
+    command_deadlines.start()
+
+
+@app.on_event("startup")
+def start_pump_diagnostics():
+    pump_diagnostics.evaluate = _diagnose_pump_commands
+    pump_diagnostics.start()
+
+
+@app.on_event("shutdown")
+def close_database_connections():
+    pump_diagnostics.stop()
+    command_deadlines.stop()
+    reading_archive.stop()
+    ingest_queue.stop()
+    async_database.shutdown()
+    analytics_database.shutdown()
+    database.connections.close_all()
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "service": "balconygreen-auth-api"}
+    return {
+        "status": "ok",
+        "service": "balconygreen-auth-api",
+        "auth_cache": token_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "command_deadlines": command_deadlines.stats(),
+        "pump_diagnostics": pump_diagnostics.stats(),
+    }
 
 
 @app.post("/user_sensors")
 async def add_reading(reading: SensorReading, user=Depends(get_current_user)):
-    timestamp = _store_sensor_readings(user["id"], [reading])[0]
+    timestamp = (await _store_sensor_readings(user["id"], [reading]))[0]
     return {"status": "success", "timestamp": timestamp, "user_id": user["id"], "device_id": reading.device_id}
 
 
@@ -508,7 +982,7 @@ async def add_reading(reading: SensorReading, user=Depends(get_current_user)):
 async def add_readings_batch(batch: SensorReadingBatch, user=Depends(get_current_user)):
     if not batch.readings:
         raise HTTPException(400, "At least one reading is required")
-    timestamps = _store_sensor_readings(user["id"], batch.readings)
+    timestamps = await _store_sensor_readings(user["id"], batch.readings)
     return {
         "status": "success",
         "count": len(batch.readings),
@@ -519,19 +993,45 @@ async def add_readings_batch(batch: SensorReadingBatch, user=Depends(get_current
     }
 
 
+async def _cached_json(
+    user_id: str,
+    endpoint: str,
+    params: dict[str, Any],
+    tables: tuple[str, ...],
+    if_none_match: str | None,
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    """Serve ``build()`` through ``response_cache``, answering a matching ``If-None-Match`` with 304.
+
+    A hit costs neither a query nor serialisation. Versions are captured
+    before ``build`` runs, so a write that lands meanwhile invalidates the
+    stored body instead of being hidden by it.
+    """
+    entry = response_cache.get(user_id, endpoint, params, tables)
+    if entry is None:
+        versions = response_cache.versions(user_id, tables)
+        body = JSONResponse(jsonable_encoder(await build())).body
+        entry = response_cache.put(user_id, endpoint, params, versions, body)
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and entry.etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 @app.post("/register_sensors")
 async def add_sensor(reading: Sensor, user=Depends(get_current_user)):
     sensor_id = str(uuid.uuid4())
-    database.execute(
+    await async_database.execute(
         "INSERT INTO sensors (id, user_id, sensor_name, sensor_type, device_info) VALUES (?, ?, ?, ?, ?)",
         (sensor_id, user["id"], reading.sensor_name, reading.sensor_source, reading.device_info),
     )
+    response_cache.bump(user["id"], "sensors")
     return {"status": "success", "user_id": user["id"], "sensor_id": sensor_id}
 
 
 @app.post("/image_uploads")
 async def add_image_upload(upload: ImageUploadEvent, user=Depends(get_current_user)):
-    database.execute(
+    await async_database.execute(
         "INSERT INTO uploads (user_id, file_path, file_type) VALUES (?, ?, ?)",
         (user["id"], upload.file_path, upload.file_type),
     )
@@ -539,105 +1039,219 @@ async def add_image_upload(upload: ImageUploadEvent, user=Depends(get_current_us
 
 
 @app.get("/sensors")
-async def get_sensors(user=Depends(get_current_user)):
-    return database.fetch_all(
-        """
-        SELECT sensor_name, sensor_type, device_info, created_at
-        FROM sensors
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-        """,
-        (user["id"],),
+async def get_sensors(user=Depends(get_current_user), if_none_match: str | None = Header(default=None)):
+    return await _cached_json(
+        user["id"],
+        "sensors",
+        {},
+        ("sensors",),
+        if_none_match,
+        lambda: async_database.fetch_all(
+            """
+            SELECT sensor_name, sensor_type, device_info, created_at
+            FROM sensors
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+            """,
+            (user["id"],),
+        ),
     )
 
 
+async def _stream_readings_ndjson(rows: Iterator[dict], limit: int | None):
+    remaining = limit
+    while remaining is None or remaining > 0:
+        count = READINGS_STREAM_PAGE_SIZE if remaining is None else min(remaining, READINGS_STREAM_PAGE_SIZE)
+        page = await async_database.run(_take, rows, count)
+        if not page:
+            return
+        if remaining is not None:
+            remaining -= len(page)
+        yield b"".join(ndjson_line(_serialize_reading(row)) for row in page)
+
+
 @app.get("/readings")
 async def get_readings(
+    response: Response,
     device_id: str | None = None,
     sensor_name: str | None = None,
     hours: int | None = None,
-    limit: int = 100,
+    limit: int | None = None,
+    resolution: str | None = None,
+    cursor: str | None = None,
+    format: str = "json",
     user=Depends(get_current_user),
 ):
-    clauses = ["user_id = ?"]
-    params: list[Any] = [user["id"]]
-    if device_id:
-        clauses.append("device_id = ?")
-        params.append(device_id)
-    if sensor_name:
-        clauses.append("sensor_name = ?")
-        params.append(sensor_name)
+    start_time = None
     if hours is not None:
-        safe_hours = max(1, min(hours, 24 * 14))
-        clauses.append("timestamp >= ?")
-        params.append(datetime.now(tz=timezone.utc) - timedelta(hours=safe_hours))
-    params.append(max(1, min(limit, 20000)))
-    rows = database.fetch_all(
-        f"""
-        SELECT sensor_name, value, timestamp, source, device_id
-        FROM readings
-        WHERE {' AND '.join(clauses)}
-        ORDER BY timestamp DESC
-        LIMIT ?
-        """,
-        tuple(params),
+        start_time = datetime.now(tz=timezone.utc) - timedelta(hours=max(1, min(hours, 24 * 14)))
+    if resolution and resolution != "raw":
+        if resolution not in ROLLUP_RESOLUTIONS:
+            raise HTTPException(400, f"resolution must be one of: raw, {', '.join(ROLLUP_RESOLUTIONS)}")
+        if cursor or format != "json":
+            raise HTTPException(400, "cursor and format are only supported for raw readings")
+        return await async_database.run(
+            _query_reading_rollups, user["id"], resolution, device_id, sensor_name, start_time, limit or 100
+        )
+
+    before = None
+    if cursor:
+        try:
+            before = tuple(int(part) for part in decode_cursor(cursor, 2))
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(400, "Invalid cursor") from exc
+
+    if format == "ndjson":
+        rows = _iter_readings(
+            user["id"], device_id, sensor_name, to_epoch_ms(start_time) if start_time else None, before
+        )
+        return StreamingResponse(
+            _stream_readings_ndjson(rows, max(1, limit) if limit is not None else None),
+            media_type="application/x-ndjson",
+        )
+    if format != "json":
+        raise HTTPException(400, "format must be one of: json, ndjson")
+
+    safe_limit = max(1, min(limit or 100, READINGS_PAGE_MAX))
+    rows, next_cursor = await async_database.run(
+        _query_raw_readings, user["id"], device_id, sensor_name, start_time, safe_limit, before
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_serialize_reading(row) for row in rows]
+
+
+async def _drain_in_pool(chunks: Iterator[bytes]):
+    # Every step of the export pipeline (cursor page, encoding, compression)
+    # runs on the analytics pool so a large export never blocks the event loop.
+    while (chunk := await analytics_database.run(next, chunks, None)) is not None:
+        if chunk:
+            yield chunk
+
+
+@app.get("/exports/readings")
+async def export_readings(
+    device_id: str | None = None,
+    sensor_name: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    format: str = "csv",
+    gzip: bool = False,
+    after_timestamp_ms: int | None = None,
+    after_id: int | None = None,
+    user=Depends(get_current_user),
+):
+    """Stream raw readings oldest first as CSV or Parquet.
+
+    An interrupted download resumes by passing the ``timestamp_ms`` and ``id``
+    of the last row received as ``after_timestamp_ms`` and ``after_id``.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(501, "Parquet export requires pyarrow (install balconygreen[archive])")
+    if (after_timestamp_ms is None) != (after_id is None):
+        raise HTTPException(400, "after_timestamp_ms and after_id must be passed together")
+    start_ms = to_epoch_ms(start) if start else None
+    end_ms = to_epoch_ms(end) if end else None
+    if start_ms is not None and end_ms is not None and end_ms <= start_ms:
+        raise HTTPException(400, "end must be after start")
+    cursor = (after_timestamp_ms, after_id) if after_id is not None else None
+
+    rows = _iter_readings(
+        user["id"], device_id, sensor_name, start_ms, cursor, READINGS_STREAM_PAGE_SIZE, end_ms, descending=False
+    )
+    pages = _iter_pages(rows, READINGS_STREAM_PAGE_SIZE)
+    if format == "csv":
+        chunks = iter_csv(pages, include_header=cursor is None)
+    else:
+        chunks = iter_parquet(pages)
+    media_type = EXPORT_FORMATS[format]
+    filename = f"balcony_green_readings.{format}"
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        _drain_in_pool(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    return [
-        {
-            "sensor_name": row["sensor_name"],
-            "value": row["value"],
-            "timestamp": row["timestamp"],
-            "source": row["source"],
-            "device_id": row.get("device_id"),
-        }
-        for row in rows
-    ]
+
+
+@app.get("/readings/latest")
+async def get_latest_readings(
+    device_id: str | None = None,
+    sensor_name: str | None = None,
+    user=Depends(get_current_user),
+):
+    return await async_database.run(_query_latest_readings, user["id"], device_id, sensor_name)
+
+
+def _insert_calibration(user_id: str, calibration: CalibrationRequest) -> None:
+    with database.get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO soil_sensor_calibrations
+            (
+                id, user_id, device_id, plant_type, soil_raw_dry, soil_raw_wet,
+                moisture_target_pct, pump_flow_ml_per_sec, failure_min_rise_pct,
+                failure_window_minutes, notes
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                str(uuid.uuid4()),
+                user_id,
+                calibration.device_id,
+                _normalize_plant_type(calibration.plant_type),
+                calibration.soil_raw_dry,
+                calibration.soil_raw_wet,
+                calibration.moisture_target_pct,
+                calibration.pump_flow_ml_per_sec,
+                calibration.failure_min_rise_pct,
+                calibration.failure_window_minutes,
+                calibration.notes,
+            ),
+        )
+        rebuild_after_calibration(conn, user_id, calibration.device_id, to_epoch_ms(datetime.now(tz=timezone.utc)))
+    response_cache.bump(user_id, "soil_sensor_calibrations")
 
 
 @app.post("/calibrations")
 async def save_calibration(calibration: CalibrationRequest, user=Depends(get_current_user)):
-    calibration_id = str(uuid.uuid4())
-    database.execute(
-        """
-        INSERT INTO soil_sensor_calibrations
-        (
-            id, user_id, device_id, plant_type, soil_raw_dry, soil_raw_wet,
-            moisture_target_pct, pump_flow_ml_per_sec, failure_min_rise_pct,
-            failure_window_minutes, notes
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            calibration_id,
-            user["id"],
-            calibration.device_id,
-            _normalize_plant_type(calibration.plant_type),
-            calibration.soil_raw_dry,
-            calibration.soil_raw_wet,
-            calibration.moisture_target_pct,
-            calibration.pump_flow_ml_per_sec,
-            calibration.failure_min_rise_pct,
-            calibration.failure_window_minutes,
-            calibration.notes,
-        ),
-    )
-    row = _get_latest_calibration(user["id"], calibration.device_id, calibration.plant_type)
+    await async_database.run(_insert_calibration, user["id"], calibration)
+    row = await async_database.run(_get_latest_calibration, user["id"], calibration.device_id, calibration.plant_type)
     return {"status": "saved", "calibration": _serialize_calibration(row) if row else None}
 
 
-@app.get("/calibrations/latest")
-async def get_latest_calibration(device_id: str, plant_type: str | None = None, user=Depends(get_current_user)):
-    row = _get_latest_calibration(user["id"], device_id, plant_type)
+async def _latest_calibration_payload(user_id: str, device_id: str, plant_type: str | None) -> dict:
+    row = await async_database.run(_get_latest_calibration, user_id, device_id, plant_type)
     if not row:
         return {"status": "empty", "device_id": device_id}
     return {"status": "ok", "calibration": _serialize_calibration(row)}
 
 
-@app.get("/calibrations/recent")
-async def get_recent_calibrations(device_id: str | None = None, limit: int = 10, user=Depends(get_current_user)):
-    safe_limit = max(1, min(limit, 20))
+@app.get("/calibrations/latest")
+async def get_latest_calibration(
+    device_id: str,
+    plant_type: str | None = None,
+    user=Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+):
+    return await _cached_json(
+        user["id"],
+        "calibrations/latest",
+        {"device_id": device_id, "plant_type": plant_type},
+        ("soil_sensor_calibrations",),
+        if_none_match,
+        lambda: _latest_calibration_payload(user["id"], device_id, plant_type),
+    )
+
+
+async def _recent_calibrations_payload(user_id: str, device_id: str | None, limit: int) -> list[dict]:
     if device_id:
-        rows = database.fetch_all(
+        rows = await async_database.fetch_all(
             """
             SELECT *
             FROM soil_sensor_calibrations
@@ -645,10 +1259,10 @@ async def get_recent_calibrations(device_id: str | None = None, limit: int = 10,
             ORDER BY created_at DESC
             LIMIT ?
             """,
-            (user["id"], device_id, safe_limit),
+            (user_id, device_id, limit),
         )
     else:
-        rows = database.fetch_all(
+        rows = await async_database.fetch_all(
             """
             SELECT *
             FROM soil_sensor_calibrations
@@ -656,15 +1270,33 @@ async def get_recent_calibrations(device_id: str | None = None, limit: int = 10,
             ORDER BY created_at DESC
             LIMIT ?
             """,
-            (user["id"], safe_limit),
+            (user_id, limit),
         )
     return [_serialize_calibration(row) for row in rows]
 
 
+@app.get("/calibrations/recent")
+async def get_recent_calibrations(
+    device_id: str | None = None,
+    limit: int = 10,
+    user=Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+):
+    safe_limit = max(1, min(limit, 20))
+    return await _cached_json(
+        user["id"],
+        "calibrations/recent",
+        {"device_id": device_id, "limit": safe_limit},
+        ("soil_sensor_calibrations",),
+        if_none_match,
+        lambda: _recent_calibrations_payload(user["id"], device_id, safe_limit),
+    )
+
+
 @app.post("/watering_feedback")
 async def save_watering_feedback(feedback: WateringFeedbackRequest, user=Depends(get_current_user)):
     feedback_id = str(uuid.uuid4())
-    database.execute(
+    await async_database.execute(
         """
         INSERT INTO watering_feedback
         (id, user_id, device_id, plant_type, command_id, feedback_label, notes)
@@ -680,14 +1312,13 @@ async def save_watering_feedback(feedback: WateringFeedbackRequest, user=Depends
             feedback.notes,
         ),
     )
+    response_cache.bump(user["id"], "watering_feedback")
     return {"status": "saved", "feedback_id": feedback_id}
 
 
-@app.get("/watering_feedback/recent")
-async def get_recent_feedback(device_id: str | None = None, limit: int = 10, user=Depends(get_current_user)):
-    safe_limit = max(1, min(limit, 20))
+async def _recent_feedback_payload(user_id: str, device_id: str | None, limit: int) -> list[dict]:
     if device_id:
-        rows = database.fetch_all(
+        return await async_database.fetch_all(
             """
             SELECT *
             FROM watering_feedback
@@ -695,20 +1326,113 @@ async def get_recent_feedback(device_id: str | None = None, limit: int = 10, use
             ORDER BY created_at DESC
             LIMIT ?
             """,
-            (user["id"], device_id, safe_limit),
+            (user_id, device_id, limit),
         )
-    else:
-        rows = database.fetch_all(
+    return await async_database.fetch_all(
+        """
+        SELECT *
+        FROM watering_feedback
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT ?
+        """,
+        (user_id, limit),
+    )
+
+
+@app.get("/watering_feedback/recent")
+async def get_recent_feedback(
+    device_id: str | None = None,
+    limit: int = 10,
+    user=Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+):
+    safe_limit = max(1, min(limit, 20))
+    return await _cached_json(
+        user["id"],
+        "watering_feedback/recent",
+        {"device_id": device_id, "limit": safe_limit},
+        ("watering_feedback",),
+        if_none_match,
+        lambda: _recent_feedback_payload(user["id"], device_id, safe_limit),
+    )
+
+
+def _deliver_queued_commands(user_id: str, device_id: str, limit: int = 20) -> list[dict]:
+    """Claim the device's oldest queued commands (marking them ``delivered``) and return them serialized."""
+    now_ms = to_epoch_ms(datetime.now(tz=timezone.utc))
+    with database.get_conn() as conn:
+        rows = claim_commands(conn, user_id, device_id, limit, now_ms, command_deadlines.ack_timeout_ms)
+    command_deadlines.track(user_id, rows)
+    if rows:
+        response_cache.bump(user_id, "device_commands")
+    return [_serialize_command(row) for row in rows]
+
+
+# An expired command was given up on and a queued one that was never delivered
+# cannot have run, so acks for either are refused. A queued command with
+# attempts was requeued after its deadline; a late ack for it still counts and
+# takes it out of the queue, so it is not sent and run a second time.
+ACKNOWLEDGEABLE_STATUSES = ("delivered", "executed", "failed")
+
+
+def _acknowledge_command(user_id: str, device_id: str, command_id: str, status: str, message: str | None) -> dict | None:
+    next_status = status if status in {"executed", "failed"} else "executed"
+    acknowledged_at = datetime.now(tz=timezone.utc)
+    acknowledged_at_ms = to_epoch_ms(acknowledged_at)
+    with database.write_transaction() as conn:
+        previous = conn.execute(
             """
-            SELECT *
-            FROM watering_feedback
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
+            SELECT status, attempts, payload_json, COALESCE(acknowledged_at_ms, created_at_ms) AS event_ms
+            FROM device_commands
+            WHERE id = ? AND user_id = ? AND device_id = ?
             """,
-            (user["id"], safe_limit),
-        )
-    return rows
+            (command_id, user_id, device_id),
+        ).fetchone()
+        if previous is None:
+            return None
+        updated = conn.execute(
+            f"""
+            UPDATE device_commands
+            SET status = ?, acknowledged_at = ?, acknowledged_at_ms = ?, device_message = ?, deadline_ms = NULL
+            WHERE id = ? AND user_id = ? AND device_id = ? AND status = ?
+              AND (status IN ({', '.join('?' for _ in ACKNOWLEDGEABLE_STATUSES)}) OR (status = 'queued' AND attempts > 0))
+            """,
+            (
+                next_status, acknowledged_at, acknowledged_at_ms, message,
+                command_id, user_id, device_id, previous["status"], *ACKNOWLEDGEABLE_STATUSES,
+            ),
+        ).rowcount
+        # The write lock is held from the SELECT on, so a concurrent ack waits
+        # and then sees this one's status; the status guard keeps the ledger
+        # updates below tied to the row this ack actually changed.
+        if updated != 1:
+            if previous["status"] == "queued":
+                raise HTTPException(409, "Command has not been delivered yet")
+            raise HTTPException(409, f"Command is {previous['status']} and can no longer be acknowledged")
+        # Keep the water-usage ledger in step: a first execution is added to
+        # its day, a repeated ack moves the command, so both days are rebuilt.
+        if previous["status"] == "executed":
+            days = {usage_day(previous["event_ms"])} if previous["event_ms"] is not None else set()
+            if next_status == "executed":
+                days.add(usage_day(acknowledged_at_ms))
+            rebuild_water_usage(conn, user_id, device_id, days)
+            # A re-ack moves or cancels the verdict; it is recomputed below if still executed.
+            conn.execute("DELETE FROM pump_diagnostics WHERE command_id = ?", (command_id,))
+        elif next_status == "executed":
+            record_command_usage(conn, user_id, device_id, previous["payload_json"], acknowledged_at_ms)
+    response_cache.bump(user_id, "device_commands")
+    if next_status == "executed":
+        plant_type = json.loads(previous["payload_json"] or "{}").get("plant_type")
+        calibration = _get_latest_calibration(user_id, device_id, plant_type)
+        failure_window = int((calibration or {}).get("failure_window_minutes", 45))
+        pump_diagnostics.schedule(user_id, command_id, acknowledged_at_ms + failure_window * 60 * 1000)
+    return {
+        "status": next_status,
+        "command_id": command_id,
+        "device_id": device_id,
+        "acknowledged_at": acknowledged_at,
+    }
 
 
 @app.post("/commands/water_now")
@@ -720,11 +1444,11 @@ async def queue_water_now(command: WaterNowCommandRequest, user=Depends(get_curr
         "plant_type": _normalize_plant_type(command.plant_type),
         "reason": command.reason,
     }
-    database.execute(
+    await async_database.execute(
         """
         INSERT INTO device_commands
-        (id, user_id, device_id, command_type, payload_json, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        (id, user_id, device_id, command_type, payload_json, status, created_at, created_at_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             command_id,
@@ -734,8 +1458,11 @@ async def queue_water_now(command: WaterNowCommandRequest, user=Depends(get_curr
             json.dumps(payload),
             "queued",
             created_at,
+            to_epoch_ms(created_at),
         ),
     )
+    response_cache.bump(user["id"], "device_commands")
+    device_channels.notify(user["id"], command.device_id)
     return {
         "status": "queued",
         "command_id": command_id,
@@ -745,100 +1472,169 @@ async def queue_water_now(command: WaterNowCommandRequest, user=Depends(get_curr
     }
 
 
-@app.get("/commands/recent")
-async def get_recent_commands(device_id: str | None = None, limit: int = 10, user=Depends(get_current_user)):
-    safe_limit = max(1, min(int(limit), 20))
+async def _recent_commands_payload(user_id: str, device_id: str | None, limit: int) -> list[dict]:
     if device_id:
-        rows = database.fetch_all(
+        rows = await async_database.fetch_all(
             """
-            SELECT id, device_id, command_type, payload_json, status, device_message, created_at, delivered_at, acknowledged_at
+            SELECT id, device_id, command_type, payload_json, status, device_message, created_at_ms, delivered_at_ms, acknowledged_at_ms, attempts
             FROM device_commands
             WHERE user_id = ? AND device_id = ?
-            ORDER BY created_at DESC
+            ORDER BY created_at_ms DESC
             LIMIT ?
             """,
-            (user["id"], device_id, safe_limit),
+            (user_id, device_id, limit),
         )
     else:
-        rows = database.fetch_all(
+        rows = await async_database.fetch_all(
             """
-            SELECT id, device_id, command_type, payload_json, status, device_message, created_at, delivered_at, acknowledged_at
+            SELECT id, device_id, command_type, payload_json, status, device_message, created_at_ms, delivered_at_ms, acknowledged_at_ms, attempts
             FROM device_commands
             WHERE user_id = ?
-            ORDER BY created_at DESC
+            ORDER BY created_at_ms DESC
             LIMIT ?
             """,
-            (user["id"], safe_limit),
+            (user_id, limit),
         )
     return [_serialize_command(row) for row in rows]
 
 
-@app.get("/devices/{device_id}/next_command")
-async def get_next_command(device_id: str, user=Depends(get_current_user)):
-    row = database.fetch_one(
-        """
-        SELECT id, device_id, command_type, payload_json, status, device_message, created_at, delivered_at, acknowledged_at
-        FROM device_commands
-        WHERE user_id = ? AND device_id = ? AND status IN ('queued', 'delivered')
-        ORDER BY created_at ASC
-        LIMIT 1
-        """,
-        (user["id"], device_id),
+@app.get("/commands/recent")
+async def get_recent_commands(
+    device_id: str | None = None,
+    limit: int = 10,
+    user=Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+):
+    safe_limit = max(1, min(int(limit), 20))
+    return await _cached_json(
+        user["id"],
+        "commands/recent",
+        {"device_id": device_id, "limit": safe_limit},
+        ("device_commands",),
+        if_none_match,
+        lambda: _recent_commands_payload(user["id"], device_id, safe_limit),
     )
-    if not row:
-        return {"status": "empty", "device_id": device_id}
 
-    if row["status"] == "queued":
-        delivered_at = datetime.now(tz=timezone.utc)
-        database.execute(
-            "UPDATE device_commands SET status = ?, delivered_at = ? WHERE id = ?",
-            ("delivered", delivered_at, row["id"]),
-        )
-        row["status"] = "delivered"
-        row["delivered_at"] = delivered_at
 
-    return {"status": "ok", "command": _serialize_command(row)}
+@app.get("/devices/{device_id}/next_command")
+async def get_next_command(device_id: str, limit: int = 1, user=Depends(get_current_user)):
+    commands = await async_database.run(_deliver_queued_commands, user["id"], device_id, max(1, min(int(limit), 50)))
+    if not commands:
+        return {"status": "empty", "device_id": device_id}
+    # "command" keeps single-command firmware working; batch-aware clients read "commands".
+    return {"status": "ok", "command": commands[0], "commands": commands}
 
 
 @app.post("/devices/{device_id}/ack_command")
 async def acknowledge_command(device_id: str, ack: CommandAcknowledgeRequest, user=Depends(get_current_user)):
-    command = database.fetch_one(
-        """
-        SELECT id, status
-        FROM device_commands
-        WHERE id = ? AND user_id = ? AND device_id = ?
-        """,
-        (ack.command_id, user["id"], device_id),
-    )
-    if not command:
+    result = await async_database.run(_acknowledge_command, user["id"], device_id, ack.command_id, ack.status, ack.message)
+    if result is None:
         raise HTTPException(status_code=404, detail="Command not found for device")
+    return result
 
-    next_status = ack.status if ack.status in {"executed", "failed"} else "executed"
-    acknowledged_at = datetime.now(tz=timezone.utc)
-    database.execute(
-        """
-        UPDATE device_commands
-        SET status = ?, acknowledged_at = ?, device_message = ?
-        WHERE id = ? AND user_id = ? AND device_id = ?
-        """,
-        (next_status, acknowledged_at, ack.message, ack.command_id, user["id"], device_id),
-    )
-    return {
-        "status": next_status,
-        "command_id": ack.command_id,
-        "device_id": device_id,
-        "acknowledged_at": acknowledged_at,
-    }
+
+async def _push_device_commands(websocket: WebSocket, user_id: str, device_id: str, wake: asyncio.Event) -> None:
+    while True:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(wake.wait(), timeout=DEVICE_CHANNEL_POLL_SECONDS)
+        # Clear before querying so a command queued mid-query sets the event again.
+        wake.clear()
+        for command in await async_database.run(_deliver_queued_commands, user_id, device_id):
+            await websocket.send_json(jsonable_encoder({"type": "command", "command": command}))
+
+
+async def _handle_channel_message(user_id: str, device_id: str, message: dict) -> dict:
+    kind = message.get("type")
+    if kind == "readings":
+        try:
+            readings = [SensorReading(**{**item, "device_id": device_id}) for item in message.get("readings") or []]
+        except (TypeError, ValidationError) as exc:
+            return {"type": "error", "seq": message.get("seq"), "detail": str(exc)}
+        if readings:
+            try:
+                await _store_sensor_readings(user_id, readings)
+            except HTTPException as exc:
+                return {"type": "error", "seq": message.get("seq"), "detail": exc.detail}
+        return {"type": "readings_ack", "seq": message.get("seq"), "count": len(readings)}
+    if kind == "ack":
+        try:
+            result = await async_database.run(
+                _acknowledge_command,
+                user_id,
+                device_id,
+                str(message.get("command_id", "")),
+                str(message.get("status", "executed")),
+                message.get("message"),
+            )
+        except HTTPException as exc:
+            return {"type": "error", "command_id": message.get("command_id"), "detail": exc.detail}
+        if result is None:
+            return {"type": "error", "command_id": message.get("command_id"), "detail": "Command not found for device"}
+        return {"type": "ack_result", **result}
+    if kind == "ping":
+        return {"type": "pong"}
+    return {"type": "error", "detail": f"Unknown message type: {kind}"}
+
+
+async def _receive_device_messages(websocket: WebSocket, user_id: str, device_id: str) -> None:
+    while True:
+        text = await websocket.receive_text()
+        try:
+            message = json.loads(text)
+        except ValueError as exc:
+            reply = {"type": "error", "detail": f"Malformed JSON message: {exc}"}
+        else:
+            reply = await _handle_channel_message(user_id, device_id, message if isinstance(message, dict) else {})
+        await websocket.send_json(jsonable_encoder(reply))
+
+
+@app.websocket("/devices/{device_id}/channel")
+async def device_channel(websocket: WebSocket, device_id: str):
+    token = websocket.query_params.get("token") or ""
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    try:
+        user = await _resolve_user(token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    wake = device_channels.register(user["id"], device_id)
+    # Push anything queued while the device was offline.
+    wake.set()
+    pusher = asyncio.create_task(_push_device_commands(websocket, user["id"], device_id, wake))
+    receiver = asyncio.create_task(_receive_device_messages(websocket, user["id"], device_id))
+    try:
+        # Either side failing ends the channel; the device reconnects, and commands
+        # claimed by a failed push are requeued at their ack deadline.
+        done, _ = await asyncio.wait({pusher, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        failure = next((task.exception() for task in done if task.exception() is not None), None)
+        if failure is not None and not isinstance(failure, WebSocketDisconnect):
+            logger.error("Channel of device %s failed", device_id, exc_info=failure)
+            with contextlib.suppress(RuntimeError, OSError, WebSocketDisconnect):
+                await websocket.close(code=1011)
+    finally:
+        pusher.cancel()
+        receiver.cancel()
+        await asyncio.gather(pusher, receiver, return_exceptions=True)
+        device_channels.unregister(user["id"], device_id, wake)
 
 
 @app.get("/analytics/water_usage")
 async def get_water_usage_analytics(device_id: str | None = None, user=Depends(get_current_user)):
-    return _build_water_usage_analytics(user["id"], device_id)
+    return await analytics_database.run(_build_water_usage_analytics, user["id"], device_id)
+
+
+@app.get("/analytics/fleet")
+async def get_fleet_analytics(user=Depends(get_current_user)):
+    return await analytics_database.run(_build_fleet_analytics, user["id"])
 
 
 @app.get("/analytics/pump_failures")
 async def get_pump_failure_analytics(device_id: str | None = None, limit: int = 5, user=Depends(get_current_user)):
-    return _build_pump_failure_analytics(user["id"], device_id, limit)
+    return await async_database.run(_query_pump_diagnostics, user["id"], device_id, limit)
 
 
 @app.post("/auth/signup")
@@ -859,3 +1655,27 @@ def login(data: LoginRequest):
 
     token = JWTService.create_token(user_id)
     return {"access_token": token}
+
+
+def _verify_account_password(user_id: str, password: str) -> None:
+    user = user_service.get_user_by_id(user_id)
+    if not user or not user_service.verify_password(password, user["password_hash"]):
+        raise HTTPException(401, "Invalid credentials")
+
+
+@app.patch("/auth/me")
+def update_account(data: AccountUpdateRequest, user=Depends(get_current_user)):
+    _verify_account_password(user["id"], data.current_password)
+    if not user_service.update_user(user["id"], name=data.name, password=data.password):
+        raise HTTPException(400, "Nothing to update")
+    return {"message": "Account updated"}
+
+
+@app.delete("/auth/me")
+def delete_account(data: AccountDeleteRequest, user=Depends(get_current_user)):
+    """Delete the account with every row it owns, including its archived readings."""
+    _verify_account_password(user["id"], data.password)
+    if not user_service.delete_user(user["id"]):
+        raise HTTPException(404, "User not found")
+    reading_archive.purge_user(user["id"])
+    return {"message": "Account deleted"}
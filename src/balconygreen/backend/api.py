@@ -5,6 +5,8 @@ import subprocess
 import shutil
 import socket
 import json
+import heapq
+import itertools
 
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
@@ -13,27 +15,41 @@ from pathlib import Path
 from fastapi import ( # type: ignore
     FastAPI,
     Depends,
+    Header,
     HTTPException,
     File,
     UploadFile,
-    BackgroundTasks
+    BackgroundTasks,
+    Request,
+    Response
 )
 
-from fastapi.responses import FileResponse # type: ignore
+from fastapi.responses import FileResponse, StreamingResponse # type: ignore
 from fastapi.security import OAuth2PasswordBearer, HTTPAuthorizationCredentials, HTTPBearer # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
+from starlette.concurrency import run_in_threadpool # type: ignore
 
 from jose import JWTError, jwt # type: ignore
 from pydantic import BaseModel # type: ignore
-from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy import or_ # type: ignore
+from sqlalchemy.orm import Session, selectinload # type: ignore
 
 from balconygreen.db_implementation.db_general import SessionLocal
+from balconygreen.db_implementation.pagination import decode_cursor, encode_cursor, ndjson_line
 from balconygreen.db_implementation.schema.users import User
 from balconygreen.db_implementation.schema.devices import Device
 from balconygreen.db_implementation.schema.sensor import Sensor
 from balconygreen.db_implementation.schema.reading import Reading
 from balconygreen.db_implementation.schema.image import Image
 
+from balconygreen.backend.batch_protocol import BatchDecodeError, decode_batch
+from balconygreen.backend.device_cache import (
+    DeviceIdentity,
+    DeviceKeyCache,
+    DeviceListVersions,
+    LastSeenBuffer,
+    SensorSyncMemo
+)
 from balconygreen.utils import hash_password, verify_password
 
 
@@ -53,6 +69,12 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+READINGS_PAGE_MAX = 1000
+
+DEVICE_CACHE_TTL_SECONDS = float(os.getenv("DEVICE_CACHE_TTL_SECONDS", "60"))
+LAST_SEEN_FLUSH_SECONDS = float(os.getenv("LAST_SEEN_FLUSH_SECONDS", "30"))
+READINGS_STREAM_PAGE_SIZE = 1000
+
 
 # Use the LAN IP for your backend URL
 BASE_URL = "http://10.66.165.182:8000"
@@ -109,6 +131,22 @@ def get_db():
         db.close()
 
 
+device_cache = DeviceKeyCache(ttl_seconds=DEVICE_CACHE_TTL_SECONDS)
+last_seen_buffer = LastSeenBuffer(SessionLocal, Device.__table__, flush_interval_seconds=LAST_SEEN_FLUSH_SECONDS)
+sensor_sync_memo = SensorSyncMemo()
+device_list_versions = DeviceListVersions()
+
+
+@app.on_event("startup")
+def start_last_seen_flush():
+    last_seen_buffer.start()
+
+
+@app.on_event("shutdown")
+def stop_last_seen_flush():
+    last_seen_buffer.stop()
+
+
 
 # ======================
 # Models
@@ -196,6 +234,11 @@ def get_current_user(
     return user
 
 
+def get_current_user_id(token: str = Depends(oauth2_scheme)):
+    # Token-only auth for endpoints that can answer without loading the user row
+    return JWTService.verify_token(token)
+
+
 def get_current_device(
     db: Session = Depends(get_db),
     creds: HTTPAuthorizationCredentials = Depends(device_scheme)
@@ -206,15 +249,26 @@ def get_current_device(
 
     device_key = creds.credentials
 
-    device = db.query(Device).filter(Device.device_key == device_key).first()
+    identity = device_cache.get(device_key)
 
-    if not device or not device.is_active:
-        raise HTTPException(status_code=401, detail="Invalid device")
+    if identity is None:
+        device = db.query(Device).filter(Device.device_key == device_key).first()
 
-    device.last_seen = datetime.now(timezone.utc)
-    db.commit()
+        if not device or not device.is_active:
+            raise HTTPException(status_code=401, detail="Invalid device")
 
-    return device
+        identity = DeviceIdentity(
+            id=device.id,
+            user_id=device.user_id,
+            device_key=device.device_key,
+            device_type=device.device_type
+        )
+        device_cache.put(identity)
+
+    # Written by the periodic flush, so authenticating a device is read-only.
+    last_seen_buffer.touch(identity.id, datetime.now(timezone.utc))
+
+    return identity
 
 
 # ======================
@@ -283,6 +337,7 @@ def register_device(
     )
     db.add(db_device)
     db.commit()
+    device_list_versions.bump(user.id)
 
     if device.device_type != "upload":
         return {
@@ -454,15 +509,31 @@ def get_generic_manifest():
 # ======================
 
 @app.get("/devices")
-def get_devices(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_devices(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
 
-    devices = db.query(Device).filter(Device.user_id == user.id).all()
+    # Read the version before querying: a change landing mid-query bumps it,
+    # so the next request misses instead of revalidating what we return now.
+    etag = device_list_versions.etag(user_id)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    devices = (
+        db.query(Device)
+        .options(selectinload(Device.sensors))
+        .filter(Device.user_id == user_id)
+        .all()
+    )
 
     results = []
 
     for d in devices:
 
-        sensors = db.query(Sensor).filter(Sensor.device_id == d.id).all()
+        sensors = d.sensors
 
         results.append({
             "id": d.id,
@@ -481,6 +552,8 @@ def get_devices(user: User = Depends(get_current_user), db: Session = Depends(ge
             ]
         })
 
+    response.headers["ETag"] = etag
+
     return results
 
 
@@ -495,6 +568,10 @@ def remove_device(device_id: str, user: User = Depends(get_current_user), db: Se
     if device:
         db.delete(device)
         db.commit()
+        device_cache.invalidate_device(device_id)
+        last_seen_buffer.discard(device_id)
+        sensor_sync_memo.invalidate_device(device_id)
+        device_list_versions.bump(user.id)
 
     return {"status": "success"}
 
@@ -507,52 +584,57 @@ def remove_device(device_id: str, user: User = Depends(get_current_user), db: Se
 @app.post("/device/sync_sensors")
 def sync_sensors(
     payload: dict,
-    device: Device = Depends(get_current_device),  # 🔐 secure auth
+    device: DeviceIdentity = Depends(get_current_device),  # 🔐 secure auth
     db: Session = Depends(get_db)
 ):
-    try:
-        sensors = payload.get("sensors", [])
-
-        if not sensors:
-            raise HTTPException(status_code=400, detail="No sensors provided")
-
-        result = {}
-
-        for sensor_name in sensors:
-            timestamp = datetime.now(timezone.utc)
-            # Normalize sensor type
-            sensor_name = sensor_name.strip().lower()
+    sensors = payload.get("sensors", [])
 
-            dev = db.query(Device).filter(
-                Device.device_key == device.device_key
-            ).first()
+    if not sensors:
+        raise HTTPException(status_code=400, detail="No sensors provided")
 
-            # Check if sensor already exists for this device
-            existing = db.query(Sensor).filter(
-                Sensor.device_id == dev.id,
-                Sensor.sensor_name == sensor_name
-            ).first()
+    try:
+        # Normalize sensor type; duplicates in the payload collapse to one sensor
+        sensor_names = frozenset(
+            name.strip().lower() for name in sensors if isinstance(name, str) and name.strip()
+        )
+        if not sensor_names:
+            raise HTTPException(status_code=400, detail="No sensors provided")
 
-            if existing:
-                sensor_id = existing.id
-            else:
-                sensor_id = str(uuid.uuid4())
+        cached = sensor_sync_memo.get(device.id, sensor_names)
+        if cached is not None:
+            return cached
 
-                new_sensor = Sensor(
-                    id=sensor_id,
-                    device_id=device.id,
-                    sensor_name=sensor_name,
-                    created_at = timestamp
-                )
+        result = {
+            sensor_name: sensor_id
+            for sensor_id, sensor_name in db.query(Sensor.id, Sensor.sensor_name).filter(
+                Sensor.device_id == device.id,
+                Sensor.sensor_name.in_(sensor_names)
+            )
+        }
 
-                db.add(new_sensor)
-                db.commit()
+        missing = sorted(sensor_names - result.keys())
+        if missing:
+            timestamp = datetime.now(timezone.utc)
+            new_rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "device_id": device.id,
+                    "sensor_name": sensor_name,
+                    "created_at": timestamp
+                }
+                for sensor_name in missing
+            ]
+            db.execute(Sensor.__table__.insert(), new_rows)
+            db.commit()
+            device_list_versions.bump(device.user_id)
+            result.update({row["sensor_name"]: row["id"] for row in new_rows})
 
-            result[sensor_name] = sensor_id
-            
+        sensor_sync_memo.put(device.id, sensor_names, result)
 
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("SYNC ERROR:", str(e))
         raise HTTPException(status_code=500, detail="Sensor sync failed")
@@ -562,7 +644,7 @@ def sync_sensors(
 @app.post("/sensor_readings")
 def save_sensor_reading(
     reading: SensorReading,
-    device: Device = Depends(get_current_device),
+    device: DeviceIdentity = Depends(get_current_device),
     db: Session = Depends(get_db)
 ):
 
@@ -582,28 +664,168 @@ def save_sensor_reading(
     return {"status": "success"}
 
 
-@app.get("/readings")
-def get_readings(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-
-    readings = (
-        db.query(Reading, Sensor)
-        .join(Sensor, Reading.sensor_id == Sensor.id)
-        .join(Device, Reading.device_id == Device.id)
-        .filter(Device.user_id == user.id)
-        .order_by(Reading.timestamp.desc())
-        .all()
-    )
+def _store_reading_batch(db: Session, device: DeviceIdentity, sensors, readings) -> int:
+
+    sensor_ids = {sensor_id for sensor_id, _ in sensors}
+    owned = {
+        sensor_id
+        for (sensor_id,) in db.query(Sensor.id).filter(
+            Sensor.device_id == device.id,
+            Sensor.id.in_(sensor_ids)
+        )
+    }
+    unknown = sensor_ids - owned
+    if unknown:
+        raise HTTPException(404, f"Unknown sensor ids for this device: {sorted(unknown)}")
 
-    return [
+    received_at = datetime.now(timezone.utc)
+    rows = [
         {
-            "sensor_name": sensor.sensor_name,
-            "value": reading.value,
-            "timestamp": reading.timestamp,
-            "sensor_name": reading.sensor_name
+            "device_id": device.id,
+            "sensor_id": sensors[index][0],
+            "sensor_name": sensors[index][1] or None,
+            "value": value,
+            "timestamp": (
+                datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc)
+                if timestamp_ms
+                else received_at
+            )
         }
-        for reading, sensor in readings
+        for index, timestamp_ms, value in readings
     ]
 
+    # Core executemany: one INSERT statement and one commit for the whole batch.
+    db.execute(Reading.__table__.insert(), rows)
+    db.commit()
+
+    return len(rows)
+
+
+@app.post("/sensor_readings/batch")
+async def save_sensor_readings_batch(
+    request: Request,
+    device: DeviceIdentity = Depends(get_current_device),
+    db: Session = Depends(get_db)
+):
+    """Store a packed binary batch (see ``batch_protocol``) in one transaction."""
+
+    body = await request.body()
+
+    try:
+        sensors, readings = decode_batch(body)
+    except BatchDecodeError as e:
+        raise HTTPException(400, str(e)) from e
+
+    if not readings:
+        return {"status": "success", "count": 0}
+
+    count = await run_in_threadpool(_store_reading_batch, db, device, sensors, readings)
+
+    return {"status": "success", "count": count}
+
+
+def _readings_page_query(db: Session, device_id: str, before=None):
+
+    query = (
+        db.query(Reading.id, Reading.sensor_name, Reading.value, Reading.timestamp)
+        .filter(Reading.device_id == device_id)
+    )
+
+    if before is not None:
+        before_timestamp, before_id = before
+        # A range plus a residual filter, so the seek starts at the cursor.
+        query = query.filter(
+            Reading.timestamp <= before_timestamp,
+            or_(Reading.timestamp < before_timestamp, Reading.id < before_id)
+        )
+
+    return query.order_by(Reading.timestamp.desc(), Reading.id.desc())
+
+
+def _readings_page(db: Session, user_id: str, before, page_size: int):
+    # Readings only reach their user through the device, so no index orders a
+    # user's readings by (timestamp, id). Each device's page is a seek on
+    # idx_readings_device_timestamp_id; the newest page_size of them are merged.
+    device_ids = [device_id for (device_id,) in db.query(Device.id).filter(Device.user_id == user_id)]
+    pages = [_readings_page_query(db, device_id, before).limit(page_size).all() for device_id in device_ids]
+    merged = heapq.merge(*pages, key=lambda reading: (reading.timestamp, reading.id), reverse=True)
+    return list(itertools.islice(merged, page_size))
+
+
+def _serialize_reading(reading):
+    return {
+        "id": reading.id,
+        "sensor_name": reading.sensor_name,
+        "value": reading.value,
+        "timestamp": reading.timestamp.isoformat() if reading.timestamp else None
+    }
+
+
+def _reading_cursor(reading):
+    return encode_cursor(reading.timestamp.isoformat() if reading.timestamp else None, reading.id)
+
+
+def _stream_readings(user_id: str, before, limit: Optional[int]):
+    # The request-scoped session is closed once the endpoint returns, so the
+    # stream owns its own session and walks the history one keyset page at a time.
+    db = SessionLocal()
+    remaining = limit
+
+    try:
+        while remaining is None or remaining > 0:
+            page_size = READINGS_STREAM_PAGE_SIZE if remaining is None else min(remaining, READINGS_STREAM_PAGE_SIZE)
+            page = _readings_page(db, user_id, before, page_size)
+
+            if not page:
+                return
+
+            yield b"".join(ndjson_line(_serialize_reading(reading)) for reading in page)
+
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < page_size:
+                return
+
+            before = (page[-1].timestamp, page[-1].id)
+    finally:
+        db.close()
+
+
+@app.get("/readings")
+def get_readings(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "json",
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+
+    before = None
+    if cursor:
+        try:
+            timestamp, reading_id = decode_cursor(cursor, 2)
+            before = (datetime.fromisoformat(timestamp), int(reading_id))
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(400, "Invalid cursor") from exc
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_readings(user.id, before, max(1, limit) if limit is not None else None),
+            media_type="application/x-ndjson"
+        )
+    if format != "json":
+        raise HTTPException(400, "format must be one of: json, ndjson")
+
+    page_size = max(1, min(limit or 100, READINGS_PAGE_MAX))
+    readings = _readings_page(db, user.id, before, page_size + 1)
+
+    if len(readings) > page_size:
+        readings = readings[:page_size]
+        response.headers["X-Next-Cursor"] = _reading_cursor(readings[-1])
+
+    return [_serialize_reading(reading) for reading in readings]
+
 
 # ======================
 # Camera Upload
@@ -620,7 +842,7 @@ async def upload_camera_image(
     file: UploadFile = File(...),
     plant: str = Form(...),                  # ✅ REQUIRED
     mode: str = Form("binary"),              # ✅ binary or disease
-    device: Device = Depends(get_current_device),
+    device: DeviceIdentity = Depends(get_current_device),
     db: Session = Depends(get_db)
 ):
     try:
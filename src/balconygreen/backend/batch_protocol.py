@@ -0,0 +1,125 @@
+"""Packed binary batch format for device readings.
+
+Layout (all integers little-endian)::
+
+    header   4s  magic b"BGRB"
+             B   version (1)
+             B   flags (reserved, 0)
+             H   sensor count
+    sensors  per sensor: B id length, id bytes (UTF-8),
+                         B name length, name bytes (UTF-8)
+             I   reading count
+    readings per reading: H sensor index, q timestamp ms (0 = received time), f value
+
+Timestamps must be 0 or a UTC epoch millisecond up to the end of year 9999,
+and values must be finite; batches breaking either rule are rejected.
+
+A reading is 14 bytes, so an ESP32 can buffer a few hundred readings in a
+single small POST instead of sending one JSON document per reading.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+from typing import Iterable, List, Sequence, Tuple
+
+
+MAGIC = b"BGRB"
+VERSION = 1
+CONTENT_TYPE = "application/x-balconygreen-batch"
+
+HEADER = struct.Struct("<4sBBH")
+COUNT = struct.Struct("<I")
+READING = struct.Struct("<Hqf")
+
+MAX_READINGS = 65535
+# 9999-12-31T23:59:59.999Z, the last instant datetime can represent.
+MAX_TIMESTAMP_MS = 253_402_300_799_999
+
+
+class BatchDecodeError(ValueError):
+    pass
+
+
+# (sensor_id, sensor_name)
+SensorEntry = Tuple[str, str]
+# (sensor index, timestamp ms or 0, value)
+ReadingEntry = Tuple[int, int, float]
+
+
+def _encode_text(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) > 255:
+        raise ValueError(f"Field too long for batch encoding: {value[:32]}...")
+    return bytes([len(data)]) + data
+
+
+def encode_batch(sensors: Sequence[SensorEntry], readings: Iterable[ReadingEntry]) -> bytes:
+    """Reference encoder; firmware implementations must produce the same bytes."""
+    readings = list(readings)
+    if len(readings) > MAX_READINGS:
+        raise ValueError(f"At most {MAX_READINGS} readings per batch")
+
+    parts = [HEADER.pack(MAGIC, VERSION, 0, len(sensors))]
+    for sensor_id, sensor_name in sensors:
+        parts.append(_encode_text(sensor_id))
+        parts.append(_encode_text(sensor_name))
+    parts.append(COUNT.pack(len(readings)))
+    parts.extend(READING.pack(index, int(timestamp_ms), float(value)) for index, timestamp_ms, value in readings)
+    return b"".join(parts)
+
+
+def _decode_text(body: bytes, offset: int) -> Tuple[str, int]:
+    if offset >= len(body):
+        raise BatchDecodeError("Truncated sensor table")
+    length = body[offset]
+    end = offset + 1 + length
+    if end > len(body):
+        raise BatchDecodeError("Truncated sensor table")
+    try:
+        return body[offset + 1:end].decode("utf-8"), end
+    except UnicodeDecodeError as exc:
+        raise BatchDecodeError("Sensor table is not valid UTF-8") from exc
+
+
+def decode_batch(body: bytes) -> Tuple[List[SensorEntry], List[ReadingEntry]]:
+    """Decode a batch into its sensor table and raw ``(index, timestamp_ms, value)`` tuples.
+
+    The readings section is unpacked in one ``struct.iter_unpack`` pass; no
+    per-reading objects are built beyond the tuples themselves.
+    """
+    if len(body) < HEADER.size:
+        raise BatchDecodeError("Body too short for batch header")
+
+    magic, version, _flags, sensor_count = HEADER.unpack_from(body, 0)
+    if magic != MAGIC:
+        raise BatchDecodeError("Not a BalconyGreen reading batch")
+    if version != VERSION:
+        raise BatchDecodeError(f"Unsupported batch version {version}")
+
+    offset = HEADER.size
+    sensors: List[SensorEntry] = []
+    for _ in range(sensor_count):
+        sensor_id, offset = _decode_text(body, offset)
+        sensor_name, offset = _decode_text(body, offset)
+        sensors.append((sensor_id, sensor_name))
+
+    if offset + COUNT.size > len(body):
+        raise BatchDecodeError("Missing reading count")
+    (reading_count,) = COUNT.unpack_from(body, offset)
+    offset += COUNT.size
+
+    if len(body) - offset != reading_count * READING.size:
+        raise BatchDecodeError("Reading section length does not match reading count")
+
+    readings = list(READING.iter_unpack(memoryview(body)[offset:]))
+    if readings and max(reading[0] for reading in readings) >= sensor_count:
+        raise BatchDecodeError("Reading references an unknown sensor index")
+    if any(not 0 <= timestamp_ms <= MAX_TIMESTAMP_MS for _, timestamp_ms, _ in readings):
+        raise BatchDecodeError("Reading timestamp out of range")
+    if not all(math.isfinite(value) for _, _, value in readings):
+        raise BatchDecodeError("Reading value is not a finite number")
+
+    return sensors, readings
+
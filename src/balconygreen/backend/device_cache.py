@@ -0,0 +1,195 @@
+"""In-process device state that keeps per-request device calls off the database.
+
+``DeviceKeyCache`` remembers which device keys resolve to an active device
+for a short TTL, ``LastSeenBuffer`` collects ``last_seen`` timestamps in
+memory and writes them in one batched UPDATE per flush interval, and
+``SensorSyncMemo`` short-circuits repeated sensor syncs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import bindparam, update # type: ignore
+
+
+logger = logging.getLogger("balconygreen")
+
+
+@dataclass(frozen=True)
+class DeviceIdentity:
+    """The device fields request handlers need, detached from any ORM session."""
+
+    id: str
+    user_id: str
+    device_key: str
+    device_type: Optional[str] = None
+
+
+class DeviceKeyCache:
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[DeviceIdentity, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, device_key: str) -> Optional[DeviceIdentity]:
+        with self._lock:
+            entry = self._entries.get(device_key)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[device_key]
+                return None
+            self._entries.move_to_end(device_key)
+            return identity
+
+    def put(self, identity: DeviceIdentity) -> None:
+        with self._lock:
+            self._entries[identity.device_key] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(identity.device_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_device(self, device_id: str) -> None:
+        with self._lock:
+            for device_key in [key for key, (identity, _) in self._entries.items() if identity.id == device_id]:
+                del self._entries[device_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class LastSeenBuffer:
+    """Coalesces ``last_seen`` updates; only the newest timestamp per device is written."""
+
+    def __init__(self, session_factory: Callable, device_table, flush_interval_seconds: float = 30.0):
+        self.session_factory = session_factory
+        self.device_table = device_table
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, device_id: str, seen_at: datetime) -> None:
+        with self._lock:
+            self._pending[device_id] = seen_at
+
+    def discard(self, device_id: str) -> None:
+        with self._lock:
+            self._pending.pop(device_id, None)
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        statement = (
+            update(self.device_table)
+            .where(self.device_table.c.id == bindparam("device_id"))
+            .values(last_seen=bindparam("seen_at"))
+        )
+        db = self.session_factory()
+        try:
+            db.execute(statement, [{"device_id": key, "seen_at": value} for key, value in pending.items()])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the timestamps back unless a newer one arrived meanwhile.
+            with self._lock:
+                for device_id, seen_at in pending.items():
+                    self._pending.setdefault(device_id, seen_at)
+            raise
+        finally:
+            db.close()
+        return len(pending)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.flush_interval_seconds):
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("last_seen flush failed")
+
+        self._thread = threading.Thread(target=loop, name="last-seen-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final last_seen flush failed")
+
+
+class SensorSyncMemo:
+    """Remembers the last ``/device/sync_sensors`` result per device.
+
+    A device re-syncing the same sensor list, as it does on every boot and
+    retry, gets the stored name-to-id mapping without touching the database.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, "tuple[frozenset, Dict[str, str]]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_id: str, sensor_names: frozenset) -> Optional[Dict[str, str]]:
+        with self._lock:
+            entry = self._results.get(device_id)
+        if entry is None or entry[0] != sensor_names:
+            return None
+        return dict(entry[1])
+
+    def put(self, device_id: str, sensor_names: frozenset, result: Dict[str, str]) -> None:
+        with self._lock:
+            self._results[device_id] = (sensor_names, dict(result))
+
+    def invalidate_device(self, device_id: str) -> None:
+        with self._lock:
+            self._results.pop(device_id, None)
+
+
+class DeviceListVersions:
+    """Per-user counter bumped whenever a user's devices or their sensors change.
+
+    ``/devices`` derives its ETag from the counter, so a matching
+    ``If-None-Match`` is answered without querying the database. Counters
+    are per process and carry a boot nonce, so a restart never revalidates
+    an ETag issued before it. The tag also carries a digest of the user id,
+    so one user's cached list never revalidates for another user.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._nonce = format(time.time_ns(), "x")
+
+    def bump(self, user_id: str) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def etag(self, user_id: str) -> str:
+        with self._lock:
+            version = self._versions.get(user_id, 0)
+        user_tag = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).hexdigest()
+        return f'W/"devices-{self._nonce}-{user_tag}-{version}"'
@@ -15,11 +15,13 @@ try:
     from balconygreen.camera_sensor import ExternalCameraSensor, ImageInput
     from balconygreen.sensor_reading import SensorReader
     from balconygreen.settings import API_BASE_URL, DEFAULT_CAMERA_URL, OPEN_METEO_URL
+    from balconygreen.timeseries import TimeSeriesWindow
     from balconygreen.watering_ai import WateringAIService
 except ModuleNotFoundError:
     from camera_sensor import ExternalCameraSensor, ImageInput  # type: ignore
     from sensor_reading import SensorReader  # type: ignore
     from settings import API_BASE_URL, DEFAULT_CAMERA_URL, OPEN_METEO_URL  # type: ignore
+    from timeseries import TimeSeriesWindow  # type: ignore
     from watering_ai import WateringAIService  # type: ignore
 
 try:
@@ -66,6 +68,8 @@ class BalconyGreenApp:
             "latest_snapshot_device_id": "",
             "latest_backend_snapshot_meta": None,
             "sensor_history": [],
+            "sensor_history_window": None,
+            "api_etag_cache": {},
             "uploaded_image": None,
             "latest_disease_prediction": {"label": "healthy", "confidence": 0.0, "top_results": []},
             "force_single_read": False,
@@ -212,13 +216,23 @@ class BalconyGreenApp:
     def _api_get(self, path: str, params: dict[str, Any] | None = None) -> Any | None:
         if not self.headers:
             return None
+        # Revalidate with the last ETag; a 304 means the cached body is still current.
+        cache_key = (path, tuple(sorted((params or {}).items())))
+        cached = st.session_state["api_etag_cache"].get(cache_key)
+        headers = {**self.headers, "If-None-Match": cached[0]} if cached else self.headers
         try:
-            response = requests.get(f"{API_BASE_URL}{path}", params=params, headers=self.headers, timeout=5)
+            response = requests.get(f"{API_BASE_URL}{path}", params=params, headers=headers, timeout=5)
             if response.status_code == 401:
                 st.session_state["session_expired"] = True
+            if response.status_code == 304 and cached:
+                st.session_state["session_expired"] = False
+                return cached[1]
             response.raise_for_status()
             st.session_state["session_expired"] = False
-            return response.json()
+            data = response.json()
+            if response.headers.get("ETag"):
+                st.session_state["api_etag_cache"][cache_key] = (response.headers["ETag"], data)
+            return data
         except requests.exceptions.RequestException as exc:
             LOGGER.warning("GET %s failed: %s", path, exc)
             return None
@@ -264,6 +278,12 @@ class BalconyGreenApp:
             return parsed.replace(tzinfo=datetime.timezone.utc)
         return parsed.astimezone(datetime.timezone.utc)
 
+    @staticmethod
+    def _frame_timestamps(frame: pd.DataFrame) -> pd.Series:
+        if "timestamp_ms" in frame.columns:
+            return pd.to_datetime(frame["timestamp_ms"], unit="ms", utc=True, errors="coerce")
+        return pd.to_datetime(frame["timestamp"], errors="coerce")
+
     def _snapshot_age_seconds(self, snapshot: dict[str, Any] | None) -> float | None:
         if not isinstance(snapshot, dict):
             return None
@@ -348,14 +368,11 @@ class BalconyGreenApp:
         return ", ".join(formatted)
 
     def _history_delta(self, *keys: str) -> float | None:
-        history = st.session_state.get("sensor_history", [])
-        if len(history) < 2:
-            return None
-        current = self._reading_value(history[-1], *keys)
-        previous = self._reading_value(history[-2], *keys)
-        if current is None or previous is None:
+        window = st.session_state.get("sensor_history_window")
+        series = window.get(*keys) if window is not None else None
+        if series is None or len(series) < 2:
             return None
-        return round(current - previous, 2)
+        return round(series.change(), 2)
 
     def _backend_online(self) -> bool:
         try:
@@ -616,6 +633,10 @@ class BalconyGreenApp:
         analytics = self._api_get("/analytics/water_usage", params=params)
         return analytics if isinstance(analytics, dict) else {}
 
+    def _fetch_fleet_analytics(self) -> dict[str, Any]:
+        fleet = self._api_get("/analytics/fleet")
+        return fleet if isinstance(fleet, dict) else {}
+
     def _fetch_pump_failures(self, device_id: str | None = None) -> list[dict]:
         params = {"limit": 6}
         if device_id:
@@ -623,15 +644,51 @@ class BalconyGreenApp:
         rows = self._api_get("/analytics/pump_failures", params=params)
         return rows if isinstance(rows, list) else []
 
-    def _fetch_recent_readings(self, device_id: str | None = None, limit: int = 100, hours: int | None = None) -> list[dict]:
+    def _fetch_recent_readings(
+        self,
+        device_id: str | None = None,
+        limit: int = 100,
+        hours: int | None = None,
+        resolution: str | None = None,
+    ) -> list[dict]:
         params: dict[str, Any] = {"limit": limit}
         if device_id:
             params["device_id"] = device_id
         if hours is not None:
             params["hours"] = hours
+        if resolution:
+            params["resolution"] = resolution
         rows = self._api_get("/readings", params=params)
         return rows if isinstance(rows, list) else []
 
+    def _download_readings_export(self, device_id: str | None = None, hours: int | None = None) -> bytes | None:
+        if not self.headers:
+            return None
+        params: dict[str, Any] = {"format": "csv"}
+        if device_id:
+            params["device_id"] = device_id
+        if hours is not None:
+            start = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(hours=hours)
+            params["start"] = start.isoformat(timespec="seconds")
+        try:
+            with requests.get(
+                f"{API_BASE_URL}/exports/readings",
+                params=params,
+                headers=self.headers,
+                timeout=30,
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                return b"".join(response.iter_content(chunk_size=64 * 1024))
+        except requests.exceptions.RequestException as exc:
+            LOGGER.warning("GET /exports/readings failed: %s", exc)
+            return None
+
+    def _fetch_latest_readings(self, device_id: str | None = None) -> list[dict]:
+        params = {"device_id": device_id} if device_id else None
+        rows = self._api_get("/readings/latest", params=params)
+        return rows if isinstance(rows, list) else []
+
     def _save_feedback(self, payload: dict[str, Any]) -> dict[str, Any] | None:
         return self._api_post("/watering_feedback", payload)
 
@@ -681,6 +738,7 @@ class BalconyGreenApp:
         history = st.session_state["sensor_history"]
         history.append(stamped)
         st.session_state["sensor_history"] = history[-36:]
+        st.session_state["sensor_history_window"] = TimeSeriesWindow.from_snapshots(st.session_state["sensor_history"])
 
     def _build_backend_snapshot(self, rows: list[dict]) -> dict[str, Any] | None:
         if not rows:
@@ -717,38 +775,14 @@ class BalconyGreenApp:
         snapshot["device_id"] = latest_device_id or ""
         return snapshot
 
-    def _build_prediction_history(self, active_device: str) -> list[dict[str, Any]]:
-        session_history = list(st.session_state.get("sensor_history", []))
+    def _build_prediction_history(self, active_device: str) -> TimeSeriesWindow:
+        session_history = TimeSeriesWindow.from_snapshots(st.session_state.get("sensor_history", []))
         if not self.access_token or not active_device:
             return session_history
 
-        rows = self._fetch_recent_readings(active_device, limit=5000, hours=24)
-        if not rows:
-            return session_history
-
-        backend = pd.DataFrame(rows)
-        backend["timestamp"] = pd.to_datetime(backend["timestamp"], errors="coerce")
-        backend = backend.dropna(subset=["timestamp"])
-        if backend.empty:
-            return session_history
-
-        backend["time_bucket"] = backend["timestamp"].dt.floor("30s")
-        pivot = (
-            backend.pivot_table(index="time_bucket", columns="sensor_name", values="value", aggfunc="last")
-            .sort_index()
-            .ffill()
-        )
-        snapshots: list[dict[str, Any]] = []
-        for timestamp, values in pivot.tail(24 * 60 * 2).iterrows():
-            snapshot = {str(key): float(value) for key, value in values.items() if pd.notna(value)}
-            if not snapshot:
-                continue
-            snapshot["timestamp"] = timestamp.isoformat()
-            snapshot["source"] = "Backend Telemetry"
-            snapshot["device_id"] = active_device
-            snapshots.append(snapshot)
-
-        return snapshots or session_history
+        rows = self._fetch_recent_readings(active_device, limit=5000, hours=24, resolution="1m")
+        backend = TimeSeriesWindow.from_rows(rows or [], value_key="last")
+        return backend if len(backend) else session_history
 
     def _hydrate_latest_snapshot(self, active_device: str) -> None:
         if not self.access_token or not active_device:
@@ -760,7 +794,7 @@ class BalconyGreenApp:
         if current_snapshot is not None and current_device == active_device and not self._snapshot_is_stale(current_snapshot):
             return
 
-        rows = self._fetch_recent_readings(active_device, limit=20)
+        rows = self._fetch_latest_readings(active_device)
         snapshot = self._build_backend_snapshot(rows)
         st.session_state["latest_snapshot_device_id"] = active_device
         if snapshot is None:
@@ -949,6 +983,7 @@ class BalconyGreenApp:
             previous_device = str(st.session_state.get("active_device_id", "") or "")
             if active_device != previous_device:
                 st.session_state["sensor_history"] = []
+                st.session_state["sensor_history_window"] = None
                 st.session_state["latest_readings"] = None
                 st.session_state["latest_snapshot_device_id"] = ""
                 st.session_state["latest_backend_snapshot_meta"] = None
@@ -1344,20 +1379,19 @@ class BalconyGreenApp:
     def _render_sensor_trends(self, active_device: str) -> None:
         self._render_panel_header("Sensor Trends", "Recent backend telemetry for the selected device.")
         history = st.session_state.get("sensor_history", [])
-        rows = self._fetch_recent_readings(active_device or None, limit=20000, hours=24)
+        rows = self._fetch_recent_readings(active_device or None, limit=2000, hours=24, resolution="15m")
         if rows:
             backend = pd.DataFrame(rows)
-            backend["timestamp"] = pd.to_datetime(backend["timestamp"], errors="coerce")
+            backend["timestamp"] = self._frame_timestamps(backend)
             backend = backend.dropna(subset=["timestamp"])
             if not backend.empty:
-                backend["time_bucket"] = backend["timestamp"].dt.floor("30s")
                 pivot = (
-                    backend.pivot_table(index="time_bucket", columns="sensor_name", values="value", aggfunc="last")
+                    backend.pivot_table(index="timestamp", columns="sensor_name", values="value", aggfunc="mean")
                     .sort_index()
                     .ffill()
                 )
-                trend_window = pivot.tail(24 * 60 * 2)
-                st.caption("These charts show up to the last 24 hours of saved ESP32 readings from the backend.")
+                trend_window = pivot.tail(24 * 4)
+                st.caption("These charts show 15-minute averages of the last 24 hours of saved ESP32 readings from the backend.")
                 moisture_cols = [c for c in ["soil_moisture", "soil_moisture_pct"] if c in pivot.columns]
                 raw_cols = [c for c in ["soil_raw"] if c in pivot.columns]
                 env_cols = [c for c in ["temperature", "humidity"] if c in pivot.columns]
@@ -1509,7 +1543,44 @@ class BalconyGreenApp:
                     created_at = str(command.get("created_at", "unknown time"))
                     st.write(f"- {status} | {pump_ms} ms | {created_at}")
 
+    def _render_fleet_table(self) -> None:
+        fleet = self._fetch_fleet_analytics()
+        if int(fleet.get("device_count", 0) or 0) < 2:
+            return
+        self._render_panel_header("Fleet Overview", "Freshness, watering and pump diagnostics for all of your devices in one table.")
+        frame = pd.DataFrame(fleet.get("columns", {})).set_index("device_id")
+        frame["online"] = frame["last_seen_age_s"].le(LIVE_SENSOR_MAX_AGE_MINUTES * 60) | frame["channel_connected"]
+        st.dataframe(
+            frame[
+                [
+                    "online",
+                    "last_seen_age_s",
+                    "queued_commands",
+                    "today_pump_ms",
+                    "today_ml",
+                    "week_pump_ms",
+                    "week_ml",
+                    "week_warnings",
+                    "last_verdict",
+                ]
+            ].rename(
+                columns={
+                    "last_seen_age_s": "last seen (s)",
+                    "queued_commands": "queued",
+                    "today_pump_ms": "today pump ms",
+                    "today_ml": "today ml",
+                    "week_pump_ms": "7-day pump ms",
+                    "week_ml": "7-day ml",
+                    "week_warnings": "7-day warnings",
+                    "last_verdict": "last pump check",
+                }
+            ),
+            use_container_width=True,
+        )
+
     def _render_analytics_tab(self, active_device: str) -> None:
+        if self.access_token:
+            self._render_fleet_table()
         left, right = st.columns([1.1, 0.9])
         with left:
             self._render_panel_header("Water Usage Analytics", "Daily and weekly pump activity with estimated water volume when flow calibration is available.")
@@ -1667,21 +1738,29 @@ class BalconyGreenApp:
             return
 
         df = pd.DataFrame(rows)
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        df["timestamp"] = self._frame_timestamps(df)
         df = df.dropna(subset=["timestamp"]).sort_values("timestamp")
         df["value"] = pd.to_numeric(df["value"], errors="coerce")
 
         with col_dl:
-            st.markdown("<div style='padding-top:0.65rem'>", unsafe_allow_html=True)
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "Download CSV",
-                data=csv,
-                file_name="balcony_green_sensor_log.csv",
-                mime="text/csv",
-                use_container_width=True,
-            )
-            st.markdown("</div>", unsafe_allow_html=True)
+            export_windows = {"Last 24 hours": 24, "Last 7 days": 24 * 7, "Last 30 days": 24 * 30, "All history": None}
+            export_window = st.selectbox("Export range", list(export_windows), key="reports_export_window")
+            export_key = (active_device, export_window)
+            # The export is streamed from the backend only on click; reruns reuse the prepared file.
+            if st.button("Prepare CSV export", use_container_width=True, key="reports_export_prepare"):
+                data = self._download_readings_export(active_device or None, export_windows[export_window])
+                st.session_state["reports_export"] = (export_key, data) if data else None
+                if not data:
+                    st.warning("Export failed. Check that the backend is reachable.")
+            prepared = st.session_state.get("reports_export")
+            if prepared and prepared[0] == export_key:
+                st.download_button(
+                    "Download CSV",
+                    data=prepared[1],
+                    file_name="balcony_green_sensor_log.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                )
 
         sensor_meta = {
             "soil_moisture":     {"label": "Soil Moisture (%)",      "unit": "%"},
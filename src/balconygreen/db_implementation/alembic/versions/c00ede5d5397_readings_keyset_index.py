@@ -0,0 +1,27 @@
+"""Readings keyset index
+
+Revision ID: c00ede5d5397
+Revises: 7ccc73c2300e
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c00ede5d5397'
+down_revision: Union[str, Sequence[str], None] = '7ccc73c2300e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_readings_device_timestamp_id', 'readings', ['device_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_readings_device_timestamp_id', table_name='readings')
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.dataset as ds  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    _PYARROW_AVAILABLE = True
+except ImportError:
+    _PYARROW_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+ARCHIVE_COLUMNS = ["id", "user_id", "device_id", "sensor_name", "value", "unit", "source", "timestamp_ms"]
+# Columns handed back to readers, matching the readings queries in auth_api.
+READ_COLUMNS = ["id", "sensor_name", "value", "timestamp_ms", "source", "device_id"]
+
+UPSERT_WATERMARK_SQL = """
+INSERT INTO reading_archive_state (sensor_name, archived_before_ms)
+VALUES (?, ?)
+ON CONFLICT (sensor_name) DO UPDATE SET
+    archived_before_ms = MAX(archived_before_ms, excluded.archived_before_ms)
+"""
+
+
+def _archive_schema():
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.string()),
+            ("device_id", pa.string()),
+            ("sensor_name", pa.string()),
+            ("value", pa.float64()),
+            ("unit", pa.string()),
+            ("source", pa.string()),
+            ("timestamp_ms", pa.int64()),
+        ]
+    )
+
+
+class ReadingArchive:
+    """Moves readings past their hot retention into date-partitioned Parquet files.
+
+    Files live under ``<archive_dir>/date=YYYY-MM-DD/``. For every sensor the
+    ``reading_archive_state`` table records the cutoff below which rows have
+    been archived, so readers only open Parquet files when a requested range
+    starts before that watermark. Rows older than the watermark that arrive
+    late stay in SQLite; hot and archived rows never overlap. The watermark
+    advances in the same transaction that deletes each archived batch, so
+    rows are never missing from both stores.
+
+    With ``incremental_vacuum`` the database is switched to incremental
+    auto-vacuum so archived pages are returned to the filesystem after each
+    run. On an existing database that switch needs a one-off full ``VACUUM``,
+    which blocks writers while it rewrites the file.
+    """
+
+    def __init__(
+        self,
+        database,
+        archive_dir: str | Path,
+        default_hot_days: int = 30,
+        hot_days_by_sensor: dict[str, int] | None = None,
+        batch_size: int = 20000,
+        incremental_vacuum: bool = True,
+    ):
+        self.database = database
+        self.archive_dir = Path(archive_dir)
+        self.default_hot_days = max(1, int(default_hot_days))
+        self.hot_days_by_sensor = {name: max(1, int(days)) for name, days in (hot_days_by_sensor or {}).items()}
+        self.batch_size = max(1, int(batch_size))
+        self.incremental_vacuum = incremental_vacuum
+        self._watermarks: dict[str, int] | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def available(self) -> bool:
+        return _PYARROW_AVAILABLE
+
+    def hot_days(self, sensor_name: str) -> int:
+        return self.hot_days_by_sensor.get(sensor_name, self.default_hot_days)
+
+    def watermarks(self) -> dict[str, int]:
+        if self._watermarks is None:
+            rows = self.database.fetch_all("SELECT sensor_name, archived_before_ms FROM reading_archive_state")
+            self._watermarks = {row["sensor_name"]: int(row["archived_before_ms"]) for row in rows}
+        return self._watermarks
+
+    def archived_before_ms(self, sensor_name: str | None = None) -> int | None:
+        """Upper bound of archived data for ``sensor_name``, or across all sensors when omitted."""
+        watermarks = self.watermarks()
+        if sensor_name is not None:
+            return watermarks.get(sensor_name)
+        return max(watermarks.values()) if watermarks else None
+
+    def needs_archive(self, start_ms: int | None, sensor_name: str | None = None) -> bool:
+        watermark = self.archived_before_ms(sensor_name)
+        return watermark is not None and (start_ms is None or start_ms < watermark)
+
+    def ensure_incremental_vacuum(self) -> None:
+        conn = self.database.connections.connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        # auto_vacuum only changes on an existing file after a full VACUUM, which cannot run inside a transaction.
+        logger.info("Switching %s to incremental auto_vacuum; running a one-off VACUUM", self.database.db_path)
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    def _write_partition(self, day: str, rows: list[Any]) -> Path:
+        partition = self.archive_dir / f"date={day}"
+        partition.mkdir(parents=True, exist_ok=True)
+        columns = {name: [row[index] for row in rows] for index, name in enumerate(ARCHIVE_COLUMNS)}
+        table = pa.Table.from_pydict(columns, schema=_archive_schema())
+        path = partition / f"part-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table, path, compression="zstd")
+        return path
+
+    def _archive_sensor(self, sensor_name: str, cutoff_ms: int) -> int:
+        archived = 0
+        while True:
+            written: list[Path] = []
+            # The files are only kept once the DELETE and watermark have committed;
+            # otherwise the rows stay hot and the next run would archive them again.
+            try:
+                with self.database.get_conn() as conn:
+                    rows = conn.execute(
+                        f"""
+                        SELECT {', '.join(ARCHIVE_COLUMNS)}
+                        FROM readings
+                        WHERE sensor_name = ? AND timestamp_ms < ?
+                        ORDER BY timestamp_ms
+                        LIMIT ?
+                        """,
+                        (sensor_name, cutoff_ms, self.batch_size),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    by_day: dict[str, list[Any]] = {}
+                    for row in rows:
+                        day = datetime.fromtimestamp(row["timestamp_ms"] / 1000.0, tz=timezone.utc).date().isoformat()
+                        by_day.setdefault(day, []).append(tuple(row))
+                    for day, day_rows in by_day.items():
+                        written.append(self._write_partition(day, day_rows))
+                    conn.executemany("DELETE FROM readings WHERE id = ?", [(row["id"],) for row in rows])
+                    conn.execute(UPSERT_WATERMARK_SQL, (sensor_name, rows[-1]["timestamp_ms"] + 1))
+            except Exception:
+                for path in written:
+                    path.unlink(missing_ok=True)
+                raise
+            finally:
+                self._watermarks = None
+            archived += len(rows)
+        return archived
+
+    def run_once(self, now: datetime | None = None) -> int:
+        """Archive every reading older than its sensor's hot window. Returns the number of rows moved."""
+        if not self.available:
+            logger.warning("Reading retention skipped: install balconygreen[archive] to enable the Parquet archive")
+            return 0
+        now_ms = int((now or datetime.now(tz=timezone.utc)).timestamp() * 1000)
+        if self.incremental_vacuum:
+            self.ensure_incremental_vacuum()
+        sensor_names = [row["sensor_name"] for row in self.database.fetch_all("SELECT DISTINCT sensor_name FROM readings")]
+        archived = 0
+        for sensor_name in sensor_names:
+            cutoff_ms = now_ms - self.hot_days(sensor_name) * DAY_MS
+            archived += self._archive_sensor(sensor_name, cutoff_ms)
+            self.database.execute(UPSERT_WATERMARK_SQL, (sensor_name, cutoff_ms))
+        self._watermarks = None
+        if archived:
+            if self.incremental_vacuum:
+                # Cursor.execute steps the pragma once, freeing a single page;
+                # executescript runs it to completion.
+                self.database.connections.connection().executescript("PRAGMA incremental_vacuum")
+            logger.info("Archived %d readings to %s", archived, self.archive_dir)
+        return archived
+
+    def purge_user(self, user_id: str) -> int:
+        """Rewrite every archive file holding ``user_id``'s readings without them. Returns the rows removed.
+
+        Call it after the user's hot rows are deleted, so a retention run cannot
+        archive them again afterwards.
+        """
+        if not self.available or not self.archive_dir.exists():
+            return 0
+        removed = 0
+        for path in sorted(self.archive_dir.glob("date=*/*.parquet")):
+            table = pq.read_table(path, schema=_archive_schema())
+            kept = table.filter(ds.field("user_id") != user_id)
+            if kept.num_rows == table.num_rows:
+                continue
+            removed += table.num_rows - kept.num_rows
+            if kept.num_rows:
+                # Written under a name readers do not glob, then swapped in atomically.
+                staging = path.with_name(f".{path.name}.tmp")
+                pq.write_table(kept, staging, compression="zstd")
+                os.replace(staging, path)
+            else:
+                path.unlink(missing_ok=True)
+        if removed:
+            logger.info("Purged %d archived readings of user %s", removed, user_id)
+        return removed
+
+    def start(self, interval_seconds: int) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("Reading retention run failed")
+                self._stop.wait(max(1.0, interval_seconds - (time.monotonic() - started)))
+
+        self._thread = threading.Thread(target=loop, name="reading-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _partitions(self, start_ms: int | None, end_ms: int) -> list[tuple[date, list[str]]]:
+        """Day partitions that can hold rows in ``[start_ms, end_ms)`` with their files, oldest first."""
+        if not self.archive_dir.exists() or (start_ms is not None and start_ms >= end_ms):
+            return []
+        first_day = None if start_ms is None else datetime.fromtimestamp(start_ms / 1000.0, tz=timezone.utc).date()
+        # Rows are partitioned by the UTC day of their own timestamp and end_ms is exclusive.
+        last_day = datetime.fromtimestamp((end_ms - 1) / 1000.0, tz=timezone.utc).date()
+        partitions: list[tuple[date, list[str]]] = []
+        for partition in sorted(self.archive_dir.glob("date=*")):
+            try:
+                day = datetime.strptime(partition.name[len("date="):], "%Y-%m-%d").date()
+            except ValueError:
+                continue
+            if (first_day is None or day >= first_day) and day <= last_day:
+                paths = [str(path) for path in sorted(partition.glob("*.parquet"))]
+                if paths:
+                    partitions.append((day, paths))
+        return partitions
+
+    def _plan(
+        self,
+        user_id: str,
+        start_ms: int | None,
+        end_ms: int | None,
+        device_id: str | None,
+        sensor_name: str | None,
+        descending: bool,
+        cursor: tuple[int, int] | None,
+    ) -> tuple[Any, list[tuple[date, list[str]]]]:
+        """The row filter for a read and the day partitions it has to open."""
+        watermark = self.archived_before_ms(sensor_name)
+        if watermark is None:
+            return None, []
+        upper_ms = watermark if end_ms is None else min(end_ms, watermark)
+        expression = (ds.field("user_id") == user_id) & (ds.field("timestamp_ms") < upper_ms)
+        if start_ms is not None:
+            expression = expression & (ds.field("timestamp_ms") >= start_ms)
+        if device_id:
+            expression = expression & (ds.field("device_id") == device_id)
+        if sensor_name:
+            expression = expression & (ds.field("sensor_name") == sensor_name)
+        lower_ms = start_ms
+        if cursor is not None:
+            cursor_ms, cursor_id = cursor
+            # Partitions on the far side of the cursor's day cannot hold rows past it.
+            if descending:
+                upper_ms = min(upper_ms, cursor_ms + 1)
+                expression = expression & (
+                    (ds.field("timestamp_ms") < cursor_ms)
+                    | ((ds.field("timestamp_ms") == cursor_ms) & (ds.field("id") < cursor_id))
+                )
+            else:
+                lower_ms = cursor_ms if lower_ms is None else max(lower_ms, cursor_ms)
+                expression = expression & (
+                    (ds.field("timestamp_ms") > cursor_ms)
+                    | ((ds.field("timestamp_ms") == cursor_ms) & (ds.field("id") > cursor_id))
+                )
+        return expression, self._partitions(lower_ms, upper_ms)
+
+    @staticmethod
+    def _read(paths: list[str], expression, descending: bool):
+        table = ds.dataset(paths, format="parquet", schema=_archive_schema()).to_table(
+            columns=READ_COLUMNS,
+            filter=expression,
+        )
+        order = "descending" if descending else "ascending"
+        return table.sort_by([("timestamp_ms", order), ("id", order)])
+
+    def read_range(
+        self,
+        user_id: str,
+        start_ms: int | None,
+        end_ms: int | None = None,
+        device_id: str | None = None,
+        sensor_name: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        cursor: tuple[int, int] | None = None,
+    ) -> list[dict]:
+        """Archived readings for one user in ``[start_ms, end_ms)``, as dicts shaped like ``readings`` rows.
+
+        ``cursor`` is a ``(timestamp_ms, id)`` keyset position; only rows that sort
+        strictly after it in the requested direction are returned.
+        """
+        if not self.available:
+            return []
+        expression, partitions = self._plan(user_id, start_ms, end_ms, device_id, sensor_name, descending, cursor)
+        if not partitions:
+            return []
+        table = self._read([path for _, paths in partitions for path in paths], expression, descending)
+        if limit is not None:
+            table = table.slice(0, max(0, int(limit)))
+        return table.to_pylist()
+
+    def iter_range(
+        self,
+        user_id: str,
+        start_ms: int | None,
+        end_ms: int | None = None,
+        device_id: str | None = None,
+        sensor_name: str | None = None,
+        descending: bool = False,
+        cursor: tuple[int, int] | None = None,
+    ) -> Iterator[dict]:
+        """Like ``read_range`` without a limit, but lazily, opening one day partition at a time.
+
+        Memory stays bounded by one day of the user's readings however long
+        the range is, and each partition is read once per iteration.
+        """
+        if not self.available:
+            return
+        expression, partitions = self._plan(user_id, start_ms, end_ms, device_id, sensor_name, descending, cursor)
+        for _, paths in reversed(partitions) if descending else partitions:
+            yield from self._read(paths, expression, descending).to_pylist()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class AsyncDatabase:
+    """Awaitable facade over ``Database`` that runs blocking SQLite work on a bounded thread pool.
+
+    Each worker thread keeps its own pooled connection, so the pool size also
+    caps the number of concurrent SQLite connections used by this facade.
+    """
+
+    def __init__(self, database, max_workers: int = 8, thread_name_prefix: str = "db"):
+        self.database = database
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=thread_name_prefix)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def execute(self, query, params=()):
+        return await self.run(self.database.execute, query, params)
+
+    async def fetch_one(self, query, params=()):
+        return await self.run(self.database.fetch_one, query, params)
+
+    async def fetch_all(self, query, params=()):
+        return await self.run(self.database.fetch_all, query, params)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
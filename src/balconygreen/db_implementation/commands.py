@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+
+from balconygreen.db_implementation.scheduling import DeadlineWorker
+from balconygreen.db_implementation.timestamps import from_epoch_ms
+
+
+logger = logging.getLogger(__name__)
+
+COMMAND_COLUMNS = (
+    "id, device_id, command_type, payload_json, status, device_message, "
+    "created_at_ms, delivered_at_ms, acknowledged_at_ms, attempts, deadline_ms"
+)
+
+# One statement picks the oldest queued commands and flips them to delivered,
+# so two pollers can never claim the same row: the second one's subquery runs
+# after the first has committed and no longer sees those rows as queued.
+# SQLite's UPDATE has no ORDER BY/LIMIT in default builds, hence the IN (...).
+CLAIM_COMMANDS_SQL = f"""
+UPDATE device_commands
+SET status = 'delivered', delivered_at = ?, delivered_at_ms = ?, attempts = attempts + 1, deadline_ms = ?
+WHERE id IN (
+    SELECT id
+    FROM device_commands
+    WHERE device_id = ? AND status = 'queued' AND user_id = ?
+    ORDER BY created_at_ms ASC
+    LIMIT ?
+)
+RETURNING {COMMAND_COLUMNS}
+"""
+
+# Both transitions only apply while the command still carries the deadline the
+# scheduler armed, so an ack or a newer claim that landed first wins.
+REQUEUE_COMMAND_SQL = """
+UPDATE device_commands
+SET status = 'queued', deadline_ms = NULL
+WHERE id = ? AND status = 'delivered' AND deadline_ms IS ?
+"""
+
+EXPIRE_COMMAND_SQL = """
+UPDATE device_commands
+SET status = 'expired', deadline_ms = NULL, device_message = ?
+WHERE id = ? AND status = 'delivered' AND deadline_ms IS ?
+"""
+
+PENDING_DEADLINES_SQL = """
+SELECT id, user_id, device_id, attempts, deadline_ms, delivered_at_ms
+FROM device_commands
+WHERE status = 'delivered'
+ORDER BY deadline_ms
+"""
+
+
+def claim_commands(
+    conn: sqlite3.Connection,
+    user_id: str,
+    device_id: str,
+    limit: int,
+    now_ms: int,
+    ack_timeout_ms: int | None = None,
+) -> list[dict]:
+    """Atomically mark up to ``limit`` queued commands delivered and return them oldest first.
+
+    With ``ack_timeout_ms`` each claimed command gets ``deadline_ms`` set for
+    the ``CommandDeadlineScheduler``; ``attempts`` counts every delivery.
+    """
+    deadline_ms = None if ack_timeout_ms is None else now_ms + int(ack_timeout_ms)
+    rows = conn.execute(
+        CLAIM_COMMANDS_SQL,
+        (from_epoch_ms(now_ms), now_ms, deadline_ms, device_id, user_id, max(1, int(limit))),
+    ).fetchall()
+    # RETURNING yields rows in update order, which SQLite does not tie to the subquery's ORDER BY.
+    return sorted((dict(row) for row in rows), key=lambda row: (row["created_at_ms"] or 0, row["id"]))
+
+
+class CommandDeadlineScheduler(DeadlineWorker):
+    """Requeues or expires delivered commands whose ack deadline has passed.
+
+    Deadlines live in an in-memory min-heap fed by ``track`` as commands are
+    claimed, so the worker thread sleeps until exactly the next deadline and
+    then touches only that row. Acks are not removed from the heap; the
+    guarded UPDATE simply matches nothing when the entry fires. The heap is
+    rebuilt from the partial ``status = 'delivered'`` index once on start.
+
+    A command is requeued until it has been delivered ``max_attempts`` times,
+    then marked ``expired``. ``on_requeue(user_id, device_id)`` is called from
+    the worker thread after a requeue so a connected device can be woken, and
+    ``on_expire(user_id, device_id)`` after a command expires.
+    """
+
+    thread_name = "command-deadlines"
+
+    def __init__(
+        self,
+        database,
+        ack_timeout_seconds: float = 120.0,
+        max_attempts: int = 3,
+        on_requeue: Callable[[str, str], None] | None = None,
+        on_expire: Callable[[str, str], None] | None = None,
+    ):
+        super().__init__()
+        self.database = database
+        self.ack_timeout_ms = int(ack_timeout_seconds * 1000)
+        self.max_attempts = max(1, int(max_attempts))
+        self.on_requeue = on_requeue
+        self.on_expire = on_expire
+        # Heap entries: (due_ms, command_id, user_id, device_id, attempts, stored deadline_ms)
+        self.requeued = 0
+        self.expired = 0
+
+    def track(self, user_id: str, rows: Iterable[dict]) -> None:
+        """Arm deadlines for rows returned by ``claim_commands``."""
+        self.push(
+            (row["deadline_ms"], row["id"], user_id, row["device_id"], row["attempts"], row["deadline_ms"])
+            for row in rows
+            if row.get("deadline_ms") is not None
+        )
+
+    def load(self) -> int:
+        """Rebuild the heap from commands still awaiting an ack."""
+        now_ms = int(time.time() * 1000)
+        rows = self.database.fetch_all(PENDING_DEADLINES_SQL)
+        entries = []
+        for row in rows:
+            # Commands delivered before deadlines existed get one timeout from their delivery.
+            due_ms = row["deadline_ms"]
+            if due_ms is None:
+                due_ms = (row["delivered_at_ms"] or now_ms) + self.ack_timeout_ms
+            entries.append((due_ms, row["id"], row["user_id"], row["device_id"], row["attempts"], row["deadline_ms"]))
+        self.push(entries)
+        return len(entries)
+
+    def _fire(self, entry: tuple[int, str, str, str, int, int | None]) -> None:
+        _, command_id, user_id, device_id, attempts, stored_deadline_ms = entry
+        if attempts < self.max_attempts:
+            with self.database.get_conn() as conn:
+                changed = conn.execute(REQUEUE_COMMAND_SQL, (command_id, stored_deadline_ms)).rowcount
+            if changed:
+                self.requeued += 1
+                if self.on_requeue is not None:
+                    self.on_requeue(user_id, device_id)
+            return
+        message = f"No ack after {attempts} deliveries"
+        with self.database.get_conn() as conn:
+            changed = conn.execute(EXPIRE_COMMAND_SQL, (message, command_id, stored_deadline_ms)).rowcount
+        if changed:
+            self.expired += 1
+            logger.info("Command %s for device %s expired: %s", command_id, device_id, message)
+            if self.on_expire is not None:
+                self.on_expire(user_id, device_id)
+
+    def process(self, due: list[tuple]) -> None:
+        for entry in due:
+            try:
+                self._fire(entry)
+            except Exception:
+                logger.exception("Command deadline handling failed for %s", entry[1])
+
+    def stats(self) -> dict:
+        pending, next_deadline_ms = self.pending()
+        return {
+            "tracked": pending,
+            "next_deadline_ms": next_deadline_ms,
+            "requeued": self.requeued,
+            "expired": self.expired,
+        }
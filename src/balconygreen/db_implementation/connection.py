@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from balconygreen.settings import DB_CACHE_SIZE_KB, DB_MMAP_SIZE_BYTES, DB_STATEMENT_CACHE_SIZE
+
+
+class ConnectionManager:
+    """Hands out one long-lived, tuned SQLite connection per thread.
+
+    Opening a connection and re-running the pragmas on every query costs more
+    than most of our queries, so connections are kept for the lifetime of the
+    thread and only closed by ``close_all``.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_size_kb: int = DB_CACHE_SIZE_KB,
+        mmap_size_bytes: int = DB_MMAP_SIZE_BYTES,
+        statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+    ):
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_bytes = mmap_size_bytes
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Negative cache_size is interpreted by SQLite as KiB rather than pages.
+        conn.execute(f"PRAGMA cache_size = {-abs(int(self.cache_size_kb))}")
+        conn.execute(f"PRAGMA mmap_size = {max(0, int(self.mmap_size_bytes))}")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield this thread's connection and commit when the outermost block exits."""
+        conn = self.connection()
+        self._local.depth += 1
+        try:
+            yield conn
+            if self._local.depth == 1:
+                conn.commit()
+        except Exception:
+            if self._local.depth == 1:
+                conn.rollback()
+            raise
+        finally:
+            self._local.depth -= 1
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+
+
+_managers: dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """Return the process-wide manager for ``db_path`` so every DAO shares its connections."""
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = ConnectionManager(db_path)
+            _managers[db_path] = manager
+        return manager
@@ -3,45 +3,113 @@ from __future__ import annotations
 import sqlite3
 from contextlib import contextmanager
 
-from balconygreen.db_implementation.schema import SCHEMA_SQL
+from balconygreen.db_implementation.connection import get_connection_manager
+from balconygreen.db_implementation.latest import rebuild_latest
+from balconygreen.db_implementation.rollups import rebuild_rollups
+from balconygreen.db_implementation.schema import DROPPED_INDEXES, INDEX_SQL, SCHEMA_SQL
+from balconygreen.db_implementation.timestamps import to_epoch_ms
+from balconygreen.db_implementation.water_usage import rebuild_water_usage
 
 
 
 class Database:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.connections = get_connection_manager(db_path)
         self._init_db()
 
     def _init_db(self):
-        with sqlite3.connect(self.db_path, check_same_thread=False) as conn:
-            conn.execute("PRAGMA foreign_keys = ON")
+        with self.connections.transaction() as conn:
             for stmt in SCHEMA_SQL:
                 conn.execute(stmt)
             self._run_migrations(conn)
-            conn.commit()
 
     def _table_columns(self, conn: sqlite3.Connection, table_name: str) -> set[str]:
         rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
         return {row[1] for row in rows}
 
+    def _backfill_epoch_ms(self, conn: sqlite3.Connection, table_name: str, columns: list[str], batch_size: int = 5000) -> None:
+        """Fill ``<column>_ms`` from the DATETIME text in ``<column>`` for every row, in rowid pages."""
+        select_columns = ", ".join(columns)
+        assignments = ", ".join(f"{column}_ms = ?" for column in columns)
+        last_rowid = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {select_columns} FROM {table_name} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            conn.executemany(
+                f"UPDATE {table_name} SET {assignments} WHERE rowid = ?",
+                [(*(to_epoch_ms(row[column]) for column in columns), row[0]) for row in rows],
+            )
+            last_rowid = rows[-1][0]
+
     def _run_migrations(self, conn: sqlite3.Connection) -> None:
         readings_columns = self._table_columns(conn, "readings")
         if "device_id" not in readings_columns:
             conn.execute("ALTER TABLE readings ADD COLUMN device_id TEXT")
+        if "timestamp_ms" not in readings_columns:
+            conn.execute("ALTER TABLE readings ADD COLUMN timestamp_ms INTEGER")
+            self._backfill_epoch_ms(conn, "readings", ["timestamp"])
+        command_columns = self._table_columns(conn, "device_commands")
+        missing_command_ms = [
+            column for column in ("created_at", "delivered_at", "acknowledged_at") if f"{column}_ms" not in command_columns
+        ]
+        for column in missing_command_ms:
+            conn.execute(f"ALTER TABLE device_commands ADD COLUMN {column}_ms INTEGER")
+        if missing_command_ms:
+            self._backfill_epoch_ms(conn, "device_commands", missing_command_ms)
+        if "attempts" not in command_columns:
+            conn.execute("ALTER TABLE device_commands ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "deadline_ms" not in command_columns:
+            conn.execute("ALTER TABLE device_commands ADD COLUMN deadline_ms INTEGER")
+        for index_name in DROPPED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        for stmt in INDEX_SQL:
+            conn.execute(stmt)
+        has_readings = conn.execute("SELECT 1 FROM readings LIMIT 1").fetchone() is not None
+        has_rollups = conn.execute("SELECT 1 FROM reading_rollups LIMIT 1").fetchone() is not None
+        if has_readings and not has_rollups:
+            rebuild_rollups(conn)
+        has_latest = conn.execute("SELECT 1 FROM readings_latest LIMIT 1").fetchone() is not None
+        if has_readings and not has_latest:
+            rebuild_latest(conn)
+        has_executed = conn.execute("SELECT 1 FROM device_commands WHERE status = 'executed' LIMIT 1").fetchone() is not None
+        has_usage = conn.execute("SELECT 1 FROM water_usage_daily LIMIT 1").fetchone() is not None
+        if has_executed and not has_usage:
+            rebuild_water_usage(conn)
 
     @contextmanager
     def get_conn(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        try:
+        with self.connections.transaction() as conn:
+            yield conn
+
+    @contextmanager
+    def read_snapshot(self):
+        """Like ``get_conn``, but every read inside sees one WAL snapshot.
+
+        sqlite3 only opens a transaction implicitly before writes, so plain
+        SELECTs each see the latest commit; an explicit BEGIN pins them.
+        """
+        with self.get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            yield conn
+
+    @contextmanager
+    def write_transaction(self):
+        """Like ``get_conn``, but takes the write lock before the first read.
+
+        For read-then-write sequences that must not interleave with another
+        writer doing the same: a second caller waits until this one commits
+        and then reads what it wrote.
+        """
+        with self.get_conn() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
             yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
 
     def execute(self, query, params=()):
         with self.get_conn() as conn:
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from collections.abc import Iterable, Iterator
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    _PYARROW_AVAILABLE = True
+except ImportError:
+    _PYARROW_AVAILABLE = False
+
+from balconygreen.db_implementation.timestamps import iso_from_epoch_ms
+
+
+EXPORT_COLUMNS = ["id", "timestamp", "timestamp_ms", "device_id", "sensor_name", "value", "source"]
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def parquet_available() -> bool:
+    return _PYARROW_AVAILABLE
+
+
+def _export_record(row: dict) -> list:
+    return [
+        row["id"],
+        iso_from_epoch_ms(row["timestamp_ms"]),
+        row["timestamp_ms"],
+        row.get("device_id"),
+        row["sensor_name"],
+        row["value"],
+        row.get("source"),
+    ]
+
+
+def iter_csv(pages: Iterable[list[dict]], include_header: bool = True) -> Iterator[bytes]:
+    """Encode pages of reading rows as CSV, one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_COLUMNS)
+    for page in pages:
+        writer.writerows(_export_record(row) for row in page)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator driving it."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_parquet(pages: Iterable[list[dict]]) -> Iterator[bytes]:
+    """Encode pages of reading rows as a Parquet file, one row group per page."""
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("timestamp", pa.string()),
+            ("timestamp_ms", pa.int64()),
+            ("device_id", pa.string()),
+            ("sensor_name", pa.string()),
+            ("value", pa.float64()),
+            ("source", pa.string()),
+        ]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for page in pages:
+            records = [_export_record(row) for row in page]
+            columns = {name: [record[index] for record in records] for index, name in enumerate(EXPORT_COLUMNS)}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
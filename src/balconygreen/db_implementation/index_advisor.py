@@ -0,0 +1,241 @@
+"""Report full table scans in the SQL issued by ``auth_api.py``.
+
+Queries are pulled out of the module source with ``ast`` (so FastAPI does not
+need to be importable) and run through ``EXPLAIN QUERY PLAN``. Queries whose
+WHERE clause is assembled from a clause list are expanded twice: once with
+only the mandatory filters and once with every optional filter applied.
+Other f-string fields are filled with placeholders (``?`` lists, the first
+branch of a conditional); a query that still cannot be rendered is reported
+as unchecked and fails the run like a table scan does.
+
+    python -m balconygreen.db_implementation.index_advisor
+    python -m balconygreen.db_implementation.index_advisor --db balcony.db
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import re
+import sqlite3
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from balconygreen.db_implementation.db_general import Database
+
+
+AUTH_API_PATH = Path(__file__).resolve().parents[1] / "auth_api.py"
+SQL_PREFIXES = ("SELECT", "UPDATE", "DELETE", "WITH")
+CTE_NAME_RE = re.compile(r"(?:\bWITH|,)\s*(\w+)\s*(?:\([^)]*\))?\s*AS\s*\(", re.IGNORECASE)
+TABLE_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+AS)?\s+(\w+)", re.IGNORECASE)
+
+
+@dataclass
+class QueryPlan:
+    label: str
+    sql: str
+    plan: list[str]
+
+    @property
+    def derived(self) -> set[str]:
+        """CTE names and their aliases; scanning rows the query built itself is not a table scan."""
+        names = set(CTE_NAME_RE.findall(self.sql))
+        return names | {alias for table, alias in TABLE_ALIAS_RE.findall(self.sql) if table in names}
+
+    @property
+    def scans(self) -> list[str]:
+        derived = self.derived
+        return [
+            step for step in self.plan
+            if step.startswith("SCAN ") and "CONSTANT ROW" not in step and step.split()[1] not in derived
+        ]
+
+    @property
+    def errors(self) -> list[str]:
+        return [step for step in self.plan if step.startswith("ERROR ")]
+
+    @property
+    def temp_sorts(self) -> list[str]:
+        return [step for step in self.plan if "TEMP B-TREE" in step]
+
+
+def _is_sql(text: str) -> bool:
+    words = text.split(None, 1)
+    return bool(words) and words[0].upper() in SQL_PREFIXES
+
+
+def _assignments(func: ast.AST) -> dict[str, ast.expr]:
+    """First value bound to each plain local name, e.g. ``order = "DESC" if ... else "ASC"``."""
+    values: dict[str, ast.expr] = {}
+    for node in ast.walk(func):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            values.setdefault(node.targets[0].id, node.value)
+    return values
+
+
+def _clause_variants(func: ast.AST, assignments: dict[str, ast.expr]) -> list[dict[str, list[str]]]:
+    """Clause lists with only their mandatory filters, then with every optional filter appended."""
+    base: dict[str, list[str]] = {}
+    optional: dict[str, list[str]] = {}
+    copies: dict[str, str] = {}
+    for name, value in assignments.items():
+        if isinstance(value, ast.List) and value.elts and all(
+            isinstance(elt, ast.Constant) and isinstance(elt.value, str) for elt in value.elts
+        ):
+            base[name] = [elt.value for elt in value.elts]
+        elif (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Name)
+            and value.func.id == "list"
+            and len(value.args) == 1
+            and isinstance(value.args[0], ast.Name)
+        ):
+            copies[name] = value.args[0].id
+    for node in ast.walk(func):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "append"
+            and isinstance(node.func.value, ast.Name)
+            and len(node.args) == 1
+        ):
+            clause = _render(node.args[0], assignments, {})
+            if clause is not None:
+                optional.setdefault(node.func.value.id, []).append(clause)
+    # ``page_clauses = list(clauses)`` starts from everything the original holds.
+    for name, source in copies.items():
+        if source in base:
+            base[name] = base[source]
+            optional[name] = optional.get(source, []) + optional.get(name, [])
+    required = {name: clauses for name, clauses in base.items()}
+    every = {name: clauses + optional.get(name, []) for name, clauses in base.items()}
+    return [required, every] if every != required else [required]
+
+
+def _render(node: ast.AST, assignments: dict[str, ast.expr], clauses: dict[str, list[str]], depth: int = 0) -> str | None:
+    """Render an f-string field with placeholder values, or None if it cannot be resolved.
+
+    Conditionals take their first branch, ``sep.join(x for ...)`` becomes two
+    copies of the element and ``sep.join(clauses)`` the current clause variant.
+    """
+    if depth > 8:
+        return None
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.FormattedValue):
+        return _render(node.value, assignments, clauses, depth + 1)
+    if isinstance(node, ast.JoinedStr):
+        parts = [_render(value, assignments, clauses, depth + 1) for value in node.values]
+        return None if None in parts else "".join(parts)
+    if isinstance(node, ast.IfExp):
+        return _render(node.body, assignments, clauses, depth + 1)
+    if isinstance(node, ast.Name) and node.id in assignments:
+        return _render(assignments[node.id], assignments, clauses, depth + 1)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "join"
+        and isinstance(node.func.value, ast.Constant)
+        and len(node.args) == 1
+    ):
+        separator = str(node.func.value.value)
+        arg = node.args[0]
+        if isinstance(arg, ast.Name) and arg.id in clauses:
+            return separator.join(clauses[arg.id])
+        if isinstance(arg, (ast.GeneratorExp, ast.ListComp)):
+            element = _render(arg.elt, assignments, clauses, depth + 1)
+            return None if element is None else separator.join([element, element])
+    return None
+
+
+def extract_queries(source_path: Path = AUTH_API_PATH) -> tuple[list[tuple[str, str]], list[str]]:
+    """Return the ``(label, sql)`` pairs to EXPLAIN and the labels of SQL f-strings that could not be rendered."""
+    tree = ast.parse(source_path.read_text(encoding="utf-8"))
+    queries: list[tuple[str, str]] = []
+    unchecked: list[str] = []
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        skipped = {
+            id(part) for node in ast.walk(func) if isinstance(node, ast.JoinedStr) for part in ast.walk(node) if part is not node
+        }
+        # "Delete the account ..." reads like SQL to _is_sql.
+        if func.body and isinstance(func.body[0], ast.Expr) and isinstance(func.body[0].value, ast.Constant):
+            skipped.add(id(func.body[0].value))
+        assignments = _assignments(func)
+        variants = _clause_variants(func, assignments)
+        for node in ast.walk(func):
+            label = f"{func.name}:{getattr(node, 'lineno', '?')}"
+            if id(node) in skipped:
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                if _is_sql(node.value):
+                    queries.append((label, node.value))
+            elif isinstance(node, ast.JoinedStr):
+                literal = "".join(str(value.value) for value in node.values if isinstance(value, ast.Constant))
+                if not _is_sql(literal):
+                    continue
+                rendered = [_render(node, assignments, clauses) for clauses in variants]
+                if None in rendered:
+                    unchecked.append(label)
+                elif len(set(rendered)) == 1:
+                    queries.append((label, rendered[0]))
+                else:
+                    for suffix, sql in zip(("required-filters", "all-filters"), rendered, strict=True):
+                        queries.append((f"{label} [{suffix}]", sql))
+    return queries, unchecked
+
+
+def explain(conn: sqlite3.Connection, queries: list[tuple[str, str]]) -> list[QueryPlan]:
+    plans: list[QueryPlan] = []
+    for label, sql in queries:
+        params = (None,) * sql.count("?")
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error as exc:
+            plans.append(QueryPlan(label, sql, [f"ERROR {exc}"]))
+            continue
+        plans.append(QueryPlan(label, sql, [str(row[3]) for row in rows]))
+    return plans
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report full table scans in auth_api.py queries.")
+    parser.add_argument("--db", help="Existing database to inspect read-only. Defaults to a fresh schema.")
+    parser.add_argument("--verbose", action="store_true", help="Print the plan of every query, not only scans.")
+    args = parser.parse_args(argv)
+
+    queries, unchecked = extract_queries()
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        else:
+            database = Database(str(Path(tmp) / "advisor.db"))
+            conn = database.connections.connection()
+        try:
+            plans = explain(conn, queries)
+        finally:
+            if args.db:
+                conn.close()
+            else:
+                database.connections.close_all()
+
+    flagged = [plan for plan in plans if plan.scans]
+    # A query SQLite cannot plan was not checked either.
+    unchecked += [plan.label for plan in plans if plan.errors]
+    for plan in plans:
+        if not plan.scans and not args.verbose:
+            continue
+        marker = "SCAN" if plan.scans else "ok"
+        print(f"[{marker}] {plan.label}")
+        for step in plan.plan:
+            print(f"    {step}")
+    for label in unchecked:
+        print(f"[UNCHECKED] {label}")
+    print(f"{len(plans)} queries checked, {len(flagged)} with full table scans, {len(unchecked)} unchecked.")
+    return 1 if flagged or unchecked else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any
+
+from balconygreen.db_implementation.latest import update_latest
+from balconygreen.db_implementation.rollups import update_rollups
+
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = {"enqueue", "commit"}
+
+INSERT_READING_SQL = """
+INSERT INTO readings (user_id, device_id, sensor_name, value, timestamp, timestamp_ms, source)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# (user_id, device_id, sensor_name, value, timestamp, timestamp_ms, source)
+ReadingRow = tuple[str, Any, str, float, Any, int, Any]
+
+
+class IngestQueueFull(Exception):
+    """Raised when accepting a batch would exceed the queue's row capacity."""
+
+
+def write_readings(conn, rows: list[ReadingRow]) -> None:
+    """Insert raw readings and fold them into the rollups and latest snapshot inside the caller's transaction."""
+    conn.executemany(INSERT_READING_SQL, rows)
+    update_rollups(conn, ((row[0], row[1], row[2], row[3], row[5]) for row in rows))
+    update_latest(conn, ((row[0], row[1], row[2], row[3], row[6], row[5]) for row in rows))
+
+
+class ReadingIngestQueue:
+    """Coalesces readings from concurrent requests into group-committed batches.
+
+    A single writer thread drains the queue and commits up to ``batch_size``
+    rows per transaction. ``submit`` returns a future that resolves once the
+    rows are committed. If a group commit fails, each request in it is
+    retried in its own transaction, so a bad row only fails its own future.
+
+    With ``durability="commit"`` callers wait on that future, so the writer
+    commits as soon as it is idle and batches form from whatever arrived
+    during the previous commit. With ``durability="enqueue"`` callers are
+    acknowledged immediately and the writer lingers up to
+    ``flush_interval_ms`` for a batch to fill before committing.
+    """
+
+    def __init__(
+        self,
+        database,
+        batch_size: int = 500,
+        flush_interval_ms: int = 50,
+        max_pending_rows: int = 50000,
+        durability: str = "commit",
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {sorted(DURABILITY_MODES)}")
+        self.database = database
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0, int(flush_interval_ms)) / 1000.0
+        self.max_pending_rows = max(1, int(max_pending_rows))
+        self.durability = durability
+        self._pending: deque[tuple[list[ReadingRow], Future]] = deque()
+        self._pending_rows = 0
+        self._condition = threading.Condition()
+        self._writer: threading.Thread | None = None
+        self._stopping = False
+        self.committed_rows = 0
+        self.committed_batches = 0
+
+    @property
+    def pending_rows(self) -> int:
+        return self._pending_rows
+
+    def start(self) -> None:
+        with self._condition:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._stopping = False
+            self._writer = threading.Thread(target=self._run, name="reading-ingest-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            writer = self._writer
+        if writer is not None:
+            writer.join(timeout)
+        self._writer = None
+
+    def submit(self, rows: list[ReadingRow], timeout: float | None = 0.0) -> Future:
+        """Queue ``rows`` for the next group commit.
+
+        Blocks for up to ``timeout`` seconds while the queue is at capacity
+        (``None`` waits indefinitely) and raises ``IngestQueueFull`` if space
+        does not free up in time.
+        """
+        future: Future = Future()
+        if not rows:
+            future.set_result(0)
+            return future
+        if self._writer is None or not self._writer.is_alive():
+            self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending_rows > 0 and self._pending_rows + len(rows) > self.max_pending_rows:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise IngestQueueFull(f"ingest queue is full ({self._pending_rows} rows pending)")
+                self._condition.wait(remaining)
+            self._pending.append((rows, future))
+            self._pending_rows += len(rows)
+            self._condition.notify_all()
+        return future
+
+    def _take_batch(self) -> list[tuple[list[ReadingRow], Future]]:
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            if not self._pending:
+                return []
+            linger = self.flush_interval if self.durability == "enqueue" else 0.0
+            deadline = time.monotonic() + linger
+            while not self._stopping and self._pending_rows < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch: list[tuple[list[ReadingRow], Future]] = []
+            taken_rows = 0
+            while self._pending and (not batch or taken_rows + len(self._pending[0][0]) <= self.batch_size):
+                rows, future = self._pending.popleft()
+                batch.append((rows, future))
+                taken_rows += len(rows)
+            return batch
+
+    def _release(self, row_count: int) -> None:
+        with self._condition:
+            self._pending_rows -= row_count
+            self._condition.notify_all()
+
+    def _commit(self, rows: list[ReadingRow]) -> None:
+        with self.database.get_conn() as conn:
+            write_readings(conn, rows)
+        self.committed_rows += len(rows)
+        self.committed_batches += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            rows = [row for submitted, _ in batch for row in submitted]
+            try:
+                self._commit(rows)
+            except Exception as exc:
+                if len(batch) == 1:
+                    logger.exception("Failed to commit %d queued readings", len(rows))
+                    batch[0][1].set_exception(exc)
+                else:
+                    # One bad row rolls back the whole group commit; retry each
+                    # request on its own so only the offending one fails.
+                    logger.warning("Group commit of %d readings failed (%s); retrying %d requests one by one", len(rows), exc, len(batch))
+                    for submitted, future in batch:
+                        try:
+                            self._commit(submitted)
+                        except Exception as group_exc:
+                            logger.exception("Failed to commit %d queued readings", len(submitted))
+                            future.set_exception(group_exc)
+                        else:
+                            future.set_result(len(submitted))
+            else:
+                for submitted, future in batch:
+                    future.set_result(len(submitted))
+            finally:
+                self._release(len(rows))
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterable
+
+from balconygreen.db_implementation.timestamps import iso_from_epoch_ms
+
+
+UPSERT_LATEST_SQL = """
+INSERT INTO readings_latest (user_id, device_id, sensor_name, value, source, timestamp_ms)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, device_id, sensor_name) DO UPDATE SET
+    value = excluded.value,
+    source = excluded.source,
+    timestamp_ms = excluded.timestamp_ms
+WHERE excluded.timestamp_ms >= readings_latest.timestamp_ms
+"""
+
+# SQLite takes bare columns from the row that produced MAX(), so this is one
+# pass over readings rather than a correlated subquery per sensor.
+REBUILD_LATEST_SQL = """
+INSERT INTO readings_latest (user_id, device_id, sensor_name, value, source, timestamp_ms)
+SELECT user_id, COALESCE(device_id, ''), sensor_name, value, source, MAX(timestamp_ms)
+FROM readings
+WHERE timestamp_ms IS NOT NULL
+GROUP BY user_id, COALESCE(device_id, ''), sensor_name
+"""
+
+
+def update_latest(
+    conn: sqlite3.Connection,
+    rows: Iterable[tuple[str, str | None, str, float, str | None, int | None]],
+) -> None:
+    """Upsert (user_id, device_id, sensor_name, value, source, timestamp_ms) rows into the snapshot table."""
+    newest: dict[tuple, tuple] = {}
+    for user_id, device_id, sensor_name, value, source, timestamp_ms in rows:
+        if timestamp_ms is None or value is None:
+            continue
+        key = (user_id, device_id or "", sensor_name)
+        current = newest.get(key)
+        if current is None or timestamp_ms >= current[5]:
+            newest[key] = (*key, float(value), source, timestamp_ms)
+    if newest:
+        conn.executemany(UPSERT_LATEST_SQL, list(newest.values()))
+
+
+def rebuild_latest(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM readings_latest")
+    conn.execute(REBUILD_LATEST_SQL)
+
+
+def serialize_latest(row: dict) -> dict:
+    return {
+        "sensor_name": row["sensor_name"],
+        "value": row["value"],
+        "timestamp": iso_from_epoch_ms(row["timestamp_ms"]),
+        "timestamp_ms": row["timestamp_ms"],
+        "source": row["source"],
+        "device_id": row["device_id"] or None,
+    }
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any
+
+
+def encode_cursor(*parts: Any) -> str:
+    """Opaque, URL-safe token for the sort key of the last row a client has seen."""
+    raw = json.dumps(list(parts), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list[Any]:
+    """Inverse of ``encode_cursor``. Raises ``ValueError`` for malformed or foreign tokens."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(parts, list) or len(parts) != size:
+        raise ValueError("Invalid cursor")
+    return parts
+
+
+def ndjson_line(row: dict) -> bytes:
+    return (json.dumps(row, separators=(",", ":"), default=str) + "\n").encode("utf-8")
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+
+from balconygreen.db_implementation.scheduling import DeadlineWorker
+from balconygreen.db_implementation.timestamps import iso_from_epoch_ms
+
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTIC_COLUMNS = (
+    "command_id", "user_id", "device_id", "event_ms", "created_at_ms", "status", "message",
+    "moisture_before", "moisture_after", "moisture_delta", "min_expected_rise_pct", "window_minutes", "evaluated_at_ms",
+)
+
+UPSERT_DIAGNOSTIC_SQL = f"""
+INSERT INTO pump_diagnostics ({', '.join(DIAGNOSTIC_COLUMNS)})
+VALUES ({', '.join('?' for _ in DIAGNOSTIC_COLUMNS)})
+ON CONFLICT (command_id) DO UPDATE SET
+    {', '.join(f'{column} = excluded.{column}' for column in DIAGNOSTIC_COLUMNS[1:])}
+"""
+
+# Executed commands from the backfill horizon on that have no verdict yet,
+# with the failure window of the calibration the verdict will use.
+PENDING_DIAGNOSTICS_SQL = """
+SELECT
+    c.id,
+    c.user_id,
+    COALESCE(c.acknowledged_at_ms, c.created_at_ms) AS event_ms,
+    COALESCE(
+        (
+            SELECT s.failure_window_minutes
+            FROM soil_sensor_calibrations AS s
+            WHERE s.user_id = c.user_id
+              AND s.device_id = c.device_id
+              AND (NULLIF(json_extract(c.payload_json, '$.plant_type'), '') IS NULL
+                   OR s.plant_type = json_extract(c.payload_json, '$.plant_type'))
+            ORDER BY s.created_at DESC
+            LIMIT 1
+        ),
+        ?
+    ) AS window_minutes
+FROM device_commands AS c
+LEFT JOIN pump_diagnostics AS d ON d.command_id = c.id
+WHERE c.status = 'executed'
+  AND d.command_id IS NULL
+  AND COALESCE(c.acknowledged_at_ms, c.created_at_ms) >= ?
+"""
+
+
+def serialize_diagnostic(row: dict) -> dict:
+    return {
+        "command_id": row["command_id"],
+        "device_id": row["device_id"],
+        "status": row["status"],
+        "message": row["message"],
+        "created_at": iso_from_epoch_ms(row["created_at_ms"]),
+        "moisture_before": row["moisture_before"],
+        "moisture_after": row["moisture_after"],
+        "moisture_delta": row["moisture_delta"],
+        "min_expected_rise_pct": row["min_expected_rise_pct"],
+        "window_minutes": row["window_minutes"],
+        "evaluated_at": iso_from_epoch_ms(row["evaluated_at_ms"]),
+    }
+
+
+class PumpDiagnosticsScheduler(DeadlineWorker):
+    """Computes each executed command's pump-response verdict once, when its failure window has closed.
+
+    ``schedule`` is called on ack with the time the window closes. Due
+    commands are grouped per user and handed to ``evaluate(user_id,
+    command_ids)`` in batches of ``batch_size``; it returns one diagnostic
+    dict per command that is still executed, carrying the
+    ``DIAGNOSTIC_COLUMNS`` plus ``window_end_ms``. Verdicts whose window has
+    not closed yet (the calibration's window grew since scheduling) are
+    pushed back instead of stored.
+
+    A batch whose evaluation or write fails is pushed back after
+    ``retry_seconds``, doubling per failed attempt up to
+    ``max_retry_seconds``.
+
+    On start, executed commands from the last ``backfill_days`` without a
+    verdict are queued, so restarts and older databases catch up.
+    """
+
+    thread_name = "pump-diagnostics"
+
+    def __init__(
+        self,
+        database,
+        evaluate: Callable[[str, list[str]], list[dict]] | None = None,
+        backfill_days: float = 30.0,
+        default_window_minutes: int = 45,
+        batch_size: int = 200,
+        retry_seconds: float = 30.0,
+        max_retry_seconds: float = 3600.0,
+    ):
+        super().__init__()
+        self.database = database
+        self.evaluate = evaluate
+        self.backfill_ms = int(backfill_days * 24 * 60 * 60 * 1000)
+        self.default_window_minutes = int(default_window_minutes)
+        self.batch_size = max(1, int(batch_size))
+        self.retry_ms = int(retry_seconds * 1000)
+        self.max_retry_ms = int(max_retry_seconds * 1000)
+        # Heap entries: (due_ms, command_id, user_id, failed attempts)
+        self.evaluated = 0
+        self.retried = 0
+
+    def schedule(self, user_id: str, command_id: str, due_ms: int) -> None:
+        self.push([(int(due_ms), command_id, user_id, 0)])
+
+    def load(self) -> int:
+        since_ms = int(time.time() * 1000) - self.backfill_ms
+        rows = self.database.fetch_all(PENDING_DIAGNOSTICS_SQL, (self.default_window_minutes, since_ms))
+        entries = [
+            (row["event_ms"] + int(row["window_minutes"]) * 60 * 1000, row["id"], row["user_id"], 0)
+            for row in rows
+            if row["event_ms"] is not None
+        ]
+        self.push(entries)
+        return len(entries)
+
+    def process(self, due: list[tuple]) -> None:
+        if self.evaluate is None:
+            return
+        # Per user, the failed attempts of each due command (the highest when queued twice).
+        by_user: dict[str, dict[str, int]] = {}
+        for _, command_id, user_id, attempts in due:
+            commands = by_user.setdefault(user_id, {})
+            commands[command_id] = max(attempts, commands.get(command_id, 0))
+        for user_id, commands in by_user.items():
+            command_ids = list(commands)
+            for start in range(0, len(command_ids), self.batch_size):
+                batch = command_ids[start:start + self.batch_size]
+                try:
+                    self._evaluate_batch(user_id, batch)
+                except Exception:
+                    logger.exception("Pump diagnostics failed for %d commands of user %s; retrying", len(batch), user_id)
+                    self._retry(user_id, {command_id: commands[command_id] for command_id in batch})
+
+    def _retry(self, user_id: str, commands: dict[str, int]) -> None:
+        now_ms = int(time.time() * 1000)
+        self.push(
+            (now_ms + min(self.max_retry_ms, self.retry_ms * 2 ** min(attempts, 20)), command_id, user_id, attempts + 1)
+            for command_id, attempts in commands.items()
+        )
+        self.retried += len(commands)
+
+    def _evaluate_batch(self, user_id: str, command_ids: list[str]) -> None:
+        now_ms = int(time.time() * 1000)
+        ready = []
+        deferred = []
+        for diagnostic in self.evaluate(user_id, command_ids):
+            if diagnostic["window_end_ms"] > now_ms:
+                deferred.append((diagnostic["window_end_ms"], diagnostic["command_id"], user_id, 0))
+            else:
+                ready.append(tuple(now_ms if column == "evaluated_at_ms" else diagnostic[column] for column in DIAGNOSTIC_COLUMNS))
+        if ready:
+            with self.database.get_conn() as conn:
+                conn.executemany(UPSERT_DIAGNOSTIC_SQL, ready)
+            self.evaluated += len(ready)
+        self.push(deferred)
+
+    def stats(self) -> dict:
+        pending, next_due_ms = self.pending()
+        return {"scheduled": pending, "next_due_ms": next_due_ms, "evaluated": self.evaluated, "retried": self.retried}
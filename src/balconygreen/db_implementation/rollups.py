@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterable
+
+from balconygreen.db_implementation.timestamps import iso_from_epoch_ms
+
+
+# Bucket widths in milliseconds, keyed by the ``resolution`` accepted by /readings.
+ROLLUP_RESOLUTIONS: dict[str, int] = {
+    "1m": 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+}
+
+UPSERT_ROLLUP_SQL = """
+INSERT INTO reading_rollups
+(
+    user_id, device_id, sensor_name, resolution, bucket_start_ms,
+    min_value, max_value, sum_value, sample_count, last_value, last_timestamp_ms
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, resolution, device_id, sensor_name, bucket_start_ms) DO UPDATE SET
+    min_value = MIN(min_value, excluded.min_value),
+    max_value = MAX(max_value, excluded.max_value),
+    sum_value = sum_value + excluded.sum_value,
+    sample_count = sample_count + excluded.sample_count,
+    last_value = CASE WHEN excluded.last_timestamp_ms >= last_timestamp_ms THEN excluded.last_value ELSE last_value END,
+    last_timestamp_ms = MAX(last_timestamp_ms, excluded.last_timestamp_ms)
+"""
+
+
+def _bucket_key(user_id: str, device_id: str | None, sensor_name: str, resolution: str, timestamp_ms: int) -> tuple:
+    width = ROLLUP_RESOLUTIONS[resolution]
+    return (user_id, device_id or "", sensor_name, resolution, timestamp_ms - (timestamp_ms % width))
+
+
+def _aggregate(rows: Iterable[tuple[str, str | None, str, float, int | None]]) -> list[tuple]:
+    """Fold (user_id, device_id, sensor_name, value, timestamp_ms) rows into one upsert row per bucket."""
+    buckets: dict[tuple, list[float]] = {}
+    for user_id, device_id, sensor_name, value, timestamp_ms in rows:
+        if timestamp_ms is None or value is None:
+            continue
+        value = float(value)
+        for resolution in ROLLUP_RESOLUTIONS:
+            key = _bucket_key(user_id, device_id, sensor_name, resolution, timestamp_ms)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [value, value, value, 1, value, timestamp_ms]
+                continue
+            bucket[0] = min(bucket[0], value)
+            bucket[1] = max(bucket[1], value)
+            bucket[2] += value
+            bucket[3] += 1
+            if timestamp_ms >= bucket[5]:
+                bucket[4] = value
+                bucket[5] = timestamp_ms
+    return [(*key, *bucket) for key, bucket in buckets.items()]
+
+
+def update_rollups(conn: sqlite3.Connection, rows: Iterable[tuple[str, str | None, str, float, int | None]]) -> None:
+    """Merge freshly inserted readings into every rollup resolution inside the caller's transaction."""
+    aggregated = _aggregate(rows)
+    if aggregated:
+        conn.executemany(UPSERT_ROLLUP_SQL, aggregated)
+
+
+def rebuild_rollups(conn: sqlite3.Connection, batch_size: int = 5000) -> None:
+    """Recompute all rollups from the raw readings table, streaming it in batches."""
+    conn.execute("DELETE FROM reading_rollups")
+    cursor = conn.execute("SELECT user_id, device_id, sensor_name, value, timestamp_ms FROM readings ORDER BY id")
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        update_rollups(conn, (tuple(row) for row in batch))
+
+
+def serialize_rollup(row: dict) -> dict:
+    sample_count = int(row["sample_count"])
+    return {
+        "sensor_name": row["sensor_name"],
+        "value": round(float(row["sum_value"]) / sample_count, 4) if sample_count else None,
+        "min": row["min_value"],
+        "max": row["max_value"],
+        "last": row["last_value"],
+        "count": sample_count,
+        "timestamp": iso_from_epoch_ms(row["bucket_start_ms"]),
+        "timestamp_ms": row["bucket_start_ms"],
+        "resolution": row["resolution"],
+        "source": "rollup",
+        "device_id": row["device_id"] or None,
+    }
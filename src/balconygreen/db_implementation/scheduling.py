@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+import time
+from collections.abc import Iterable
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineWorker:
+    """A thread that sleeps until the earliest deadline in a min-heap, then hands every due entry to ``process``.
+
+    Entries are tuples whose first item is the due time in epoch ms. ``push``
+    only wakes the thread when the head of the heap moves earlier, so feeding
+    entries is cheap. Subclasses implement ``process`` and may override
+    ``load`` to rebuild the heap from the database when the thread starts.
+    """
+
+    thread_name = "deadlines"
+
+    def __init__(self) -> None:
+        self._heap: list[tuple] = []
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: threading.Thread | None = None
+
+    def push(self, entries: Iterable[tuple]) -> None:
+        with self._cond:
+            head = self._heap[0][0] if self._heap else None
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+            if self._heap and (head is None or self._heap[0][0] < head):
+                self._cond.notify()
+
+    def load(self) -> int:
+        return 0
+
+    def process(self, due: list[tuple]) -> None:
+        raise NotImplementedError
+
+    def run_due(self, now_ms: int | None = None) -> int:
+        """Process every entry due at ``now_ms``; returns how many were popped."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._cond:
+            due = []
+            while self._heap and self._heap[0][0] <= now_ms:
+                due.append(heapq.heappop(self._heap))
+        if due:
+            try:
+                self.process(due)
+            except Exception:
+                logger.exception("%s failed to process %d due entries", self.thread_name, len(due))
+        return len(due)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = False
+        self.load()
+
+        def loop() -> None:
+            while True:
+                with self._cond:
+                    if self._stop:
+                        return
+                    timeout = None
+                    if self._heap:
+                        timeout = max(0.0, (self._heap[0][0] - time.time() * 1000) / 1000.0)
+                    if timeout is None or timeout > 0:
+                        self._cond.wait(timeout)
+                        continue
+                self.run_due()
+
+        self._thread = threading.Thread(target=loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def pending(self) -> tuple[int, int | None]:
+        """(entries in the heap, earliest due time in epoch ms)."""
+        with self._cond:
+            return len(self._heap), self._heap[0][0] if self._heap else None
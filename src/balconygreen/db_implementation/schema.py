@@ -32,6 +32,7 @@ SCHEMA_SQL = [
     unit TEXT,
     source TEXT,
     timestamp DATETIME NOT NULL,
+    timestamp_ms INTEGER,
     FOREIGN KEY (user_id) REFERENCES users(id)
     )
 
@@ -69,6 +70,11 @@ SCHEMA_SQL = [
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     delivered_at DATETIME,
     acknowledged_at DATETIME,
+    created_at_ms INTEGER,
+    delivered_at_ms INTEGER,
+    acknowledged_at_ms INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    deadline_ms INTEGER,
     FOREIGN KEY (user_id) REFERENCES users(id)
     )
     """,
@@ -102,4 +108,156 @@ SCHEMA_SQL = [
     FOREIGN KEY (user_id) REFERENCES users(id)
     )
     """,
+    """
+    CREATE TABLE IF NOT EXISTS reading_rollups (
+    user_id TEXT NOT NULL,
+    device_id TEXT NOT NULL DEFAULT '',
+    sensor_name TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    bucket_start_ms INTEGER NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    sum_value REAL NOT NULL,
+    sample_count INTEGER NOT NULL,
+    last_value REAL NOT NULL,
+    last_timestamp_ms INTEGER NOT NULL,
+    PRIMARY KEY (user_id, resolution, device_id, sensor_name, bucket_start_ms)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS readings_latest (
+    user_id TEXT NOT NULL,
+    device_id TEXT NOT NULL DEFAULT '',
+    sensor_name TEXT NOT NULL,
+    value REAL NOT NULL,
+    source TEXT,
+    timestamp_ms INTEGER NOT NULL,
+    PRIMARY KEY (user_id, device_id, sensor_name)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS water_usage_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    commands INTEGER NOT NULL DEFAULT 0,
+    pump_ms INTEGER NOT NULL DEFAULT 0,
+    estimated_ml REAL NOT NULL DEFAULT 0,
+    estimated_commands INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, device_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pump_diagnostics (
+    command_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    event_ms INTEGER NOT NULL,
+    created_at_ms INTEGER,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL,
+    moisture_before REAL,
+    moisture_after REAL,
+    moisture_delta REAL,
+    min_expected_rise_pct REAL NOT NULL,
+    window_minutes INTEGER NOT NULL,
+    evaluated_at_ms INTEGER NOT NULL,
+    FOREIGN KEY (command_id) REFERENCES device_commands(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS reading_archive_state (
+    sensor_name TEXT PRIMARY KEY,
+    archived_before_ms INTEGER NOT NULL
+    )
+    """,
+]
+
+# Secondary indexes are applied from Database._run_migrations so that
+# databases created before a column existed still pick them up.
+INDEX_SQL = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_readings_user_device_sensor_tsms
+    ON readings (user_id, device_id, sensor_name, timestamp_ms, value, source)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_readings_user_device_tsms
+    ON readings (user_id, device_id, timestamp_ms, sensor_name, value, source)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_readings_user_sensor_tsms
+    ON readings (user_id, sensor_name, timestamp_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_readings_user_tsms
+    ON readings (user_id, timestamp_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_readings_sensor_tsms
+    ON readings (sensor_name, timestamp_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_reading_rollups_user_device_bucket
+    ON reading_rollups (user_id, resolution, device_id, bucket_start_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_device_commands_device_status_created
+    ON device_commands (device_id, status, created_at_ms)
+    """,
+    # Newest-first listings per user, optionally narrowed to one device.
+    """
+    CREATE INDEX IF NOT EXISTS idx_device_commands_user_device_created
+    ON device_commands (user_id, device_id, created_at_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_device_commands_user_created
+    ON device_commands (user_id, created_at_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_sensors_user_created
+    ON sensors (user_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_calibrations_user_device_created
+    ON soil_sensor_calibrations (user_id, device_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_calibrations_user_created
+    ON soil_sensor_calibrations (user_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_watering_feedback_user_device_created
+    ON watering_feedback (user_id, device_id, created_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_watering_feedback_user_created
+    ON watering_feedback (user_id, created_at)
+    """,
+    # Only commands awaiting an ack; lets the deadline scheduler reload its heap
+    # on startup without scanning command history.
+    """
+    CREATE INDEX IF NOT EXISTS idx_device_commands_pending_deadline
+    ON device_commands (deadline_ms) WHERE status = 'delivered'
+    """,
+    # Executed commands by event time, for rebuilding days of the water-usage ledger.
+    """
+    CREATE INDEX IF NOT EXISTS idx_device_commands_user_executed_event
+    ON device_commands (user_id, COALESCE(acknowledged_at_ms, created_at_ms)) WHERE status = 'executed'
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_pump_diagnostics_user_event
+    ON pump_diagnostics (user_id, event_ms)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_pump_diagnostics_user_device_event
+    ON pump_diagnostics (user_id, device_id, event_ms)
+    """,
+]
+
+# Indexes superseded by the ones above; dropped so they stop costing writes.
+DROPPED_INDEXES = [
+    "idx_readings_user_device_sensor_ts",
+    "idx_readings_user_device_ts",
+    "idx_readings_user_sensor_ts",
+    "idx_readings_user_ts",
 ]
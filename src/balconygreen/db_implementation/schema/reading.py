@@ -21,3 +21,5 @@ class Reading(Base):
 Index("idx_readings_device", Reading.device_id)
 Index("idx_readings_sensor", Reading.sensor_id)
 Index("idx_readings_timestamp", Reading.timestamp)
+# Keyset pagination of /readings walks (timestamp, id) per device.
+Index("idx_readings_device_timestamp_id", Reading.device_id, Reading.timestamp, Reading.id)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any
+
+
+def parse_db_datetime(value: Any) -> datetime | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def to_epoch_ms(value: Any) -> int | None:
+    if isinstance(value, int):
+        return value
+    parsed = parse_db_datetime(value)
+    if parsed is None:
+        return None
+    return int(parsed.timestamp() * 1000)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    return datetime.fromtimestamp(int(value) / 1000.0, tz=timezone.utc)
+
+
+def iso_from_epoch_ms(value: int | None) -> str | None:
+    return None if value is None else from_epoch_ms(value).isoformat()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import bisect
+import json
+import sqlite3
+from collections.abc import Iterable
+from datetime import date, datetime, timezone
+
+from balconygreen.db_implementation.timestamps import from_epoch_ms, to_epoch_ms
+
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# ``estimated_commands`` counts the commands whose water volume is known: the
+# ones that did not run the pump plus those with a flow rate calibrated. A day
+# only reports ``estimated_ml`` when at least one command was estimated.
+UPSERT_USAGE_SQL = """
+INSERT INTO water_usage_daily (user_id, day, device_id, commands, pump_ms, estimated_ml, estimated_commands)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, day, device_id) DO UPDATE SET
+    commands = commands + excluded.commands,
+    pump_ms = pump_ms + excluded.pump_ms,
+    estimated_ml = estimated_ml + excluded.estimated_ml,
+    estimated_commands = estimated_commands + excluded.estimated_commands
+"""
+
+EXECUTED_COMMANDS_SQL = """
+SELECT user_id, device_id, payload_json, COALESCE(acknowledged_at_ms, created_at_ms) AS event_ms
+FROM device_commands
+WHERE {where}
+"""
+
+CALIBRATION_HISTORY_SQL = """
+SELECT plant_type, pump_flow_ml_per_sec, created_at
+FROM soil_sensor_calibrations
+WHERE user_id = ? AND device_id = ?
+"""
+
+
+def usage_day(event_ms: int) -> str:
+    return from_epoch_ms(event_ms).date().isoformat()
+
+
+def _day_start_ms(day: str) -> int:
+    return to_epoch_ms(datetime.combine(date.fromisoformat(day), datetime.min.time(), tzinfo=timezone.utc))
+
+
+class CalibrationHistory:
+    """Pump flow rates of one device over time, to price a command with the calibration in effect when it ran.
+
+    Lookups mirror the latest-calibration query: a command with a plant type
+    only matches that plant's calibrations, one without matches any. Commands
+    older than every matching calibration use the first one saved.
+    """
+
+    def __init__(self, rows: Iterable[tuple[str, float | None, object]]):
+        timelines: dict[str | None, list[tuple[int, float | None]]] = {}
+        for plant_type, flow_rate, created_at in rows:
+            created_ms = to_epoch_ms(created_at) or 0
+            timelines.setdefault(plant_type, []).append((created_ms, flow_rate))
+            timelines.setdefault(None, []).append((created_ms, flow_rate))
+        self._timelines = {}
+        for plant_type, entries in timelines.items():
+            entries.sort(key=lambda entry: entry[0])
+            self._timelines[plant_type] = ([entry[0] for entry in entries], [entry[1] for entry in entries])
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, user_id: str, device_id: str) -> CalibrationHistory:
+        return cls(tuple(row) for row in conn.execute(CALIBRATION_HISTORY_SQL, (user_id, device_id)))
+
+    def flow_rate_at(self, plant_type: str | None, at_ms: int) -> float | None:
+        timeline = self._timelines.get(plant_type or None)
+        if timeline is None:
+            return None
+        created_ms, flow_rates = timeline
+        index = max(0, bisect.bisect_right(created_ms, at_ms) - 1)
+        flow_rate = flow_rates[index]
+        return None if flow_rate is None else float(flow_rate)
+
+
+def command_usage(payload_json: str | None, event_ms: int, calibrations: CalibrationHistory) -> tuple[int, float, int]:
+    """(pump_ms, estimated_ml, estimated_commands) contributed by one executed command."""
+    try:
+        payload = json.loads(payload_json or "{}")
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    pump_ms = int(payload.get("pump_ms", 0) or 0)
+    if pump_ms <= 0:
+        return pump_ms, 0.0, 1
+    flow_rate = calibrations.flow_rate_at(payload.get("plant_type"), event_ms)
+    if flow_rate is None:
+        return pump_ms, 0.0, 0
+    return pump_ms, pump_ms / 1000.0 * flow_rate, 1
+
+
+def record_command_usage(conn: sqlite3.Connection, user_id: str, device_id: str, payload_json: str | None, event_ms: int) -> None:
+    """Add one newly executed command to its day in the ledger."""
+    pump_ms, estimated_ml, estimated_commands = command_usage(payload_json, event_ms, CalibrationHistory.load(conn, user_id, device_id))
+    conn.execute(UPSERT_USAGE_SQL, (user_id, usage_day(event_ms), device_id, 1, pump_ms, estimated_ml, estimated_commands))
+
+
+def rebuild_water_usage(
+    conn: sqlite3.Connection,
+    user_id: str | None = None,
+    device_id: str | None = None,
+    days: Iterable[str] | None = None,
+) -> int:
+    """Recompute ledger rows from executed commands; everything when no scope is given.
+
+    ``user_id``, ``device_id`` and ``days`` each narrow the rebuild to that
+    user, device and set of UTC days; ``device_id`` only applies together with
+    ``user_id``. Returns the number of ledger rows written.
+    """
+    clauses = ["status = 'executed'"]
+    params: list = []
+    delete_clauses: list[str] = []
+    delete_params: list = []
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+        delete_clauses.append("user_id = ?")
+        delete_params.append(user_id)
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+            delete_clauses.append("device_id = ?")
+            delete_params.append(device_id)
+    scans = [(clauses, params)]
+    if days is not None:
+        day_list = sorted(set(days))
+        if not day_list:
+            return 0
+        # One event-time range query per day; an OR of ranges would not use
+        # idx_device_commands_user_executed_event past its user_id prefix.
+        day_clauses = [*clauses, "COALESCE(acknowledged_at_ms, created_at_ms) >= ?", "COALESCE(acknowledged_at_ms, created_at_ms) < ?"]
+        scans = [(day_clauses, [*params, _day_start_ms(day), _day_start_ms(day) + DAY_MS]) for day in day_list]
+        delete_clauses.append(f"day IN ({', '.join('?' for _ in day_list)})")
+        delete_params.extend(day_list)
+
+    totals: dict[tuple[str, str, str], list] = {}
+    calibrations: dict[tuple[str, str], CalibrationHistory] = {}
+    rows = (
+        row
+        for scan_clauses, scan_params in scans
+        for row in conn.execute(EXECUTED_COMMANDS_SQL.format(where=" AND ".join(scan_clauses)), scan_params).fetchall()
+    )
+    for row_user_id, row_device_id, payload_json, event_ms in rows:
+        if event_ms is None:
+            continue
+        device_key = (row_user_id, row_device_id)
+        if device_key not in calibrations:
+            calibrations[device_key] = CalibrationHistory.load(conn, row_user_id, row_device_id)
+        pump_ms, estimated_ml, estimated_commands = command_usage(payload_json, event_ms, calibrations[device_key])
+        bucket = totals.setdefault((row_user_id, usage_day(event_ms), row_device_id), [0, 0, 0.0, 0])
+        bucket[0] += 1
+        bucket[1] += pump_ms
+        bucket[2] += estimated_ml
+        bucket[3] += estimated_commands
+
+    delete_sql = "DELETE FROM water_usage_daily"
+    if delete_clauses:
+        delete_sql += f" WHERE {' AND '.join(delete_clauses)}"
+    conn.execute(delete_sql, delete_params)
+    conn.executemany(
+        UPSERT_USAGE_SQL,
+        [(*key, commands, pump_ms, estimated_ml, estimated) for key, (commands, pump_ms, estimated_ml, estimated) in totals.items()],
+    )
+    return len(totals)
+
+
+def rebuild_after_calibration(conn: sqlite3.Connection, user_id: str, device_id: str, calibrated_at_ms: int) -> int:
+    """Rebuild the days a calibration saved at ``calibrated_at_ms`` can change.
+
+    Days before it keep their calibration in effect, so only days from the
+    calibration on and days with commands that had no flow rate to price them
+    with (the first calibration of a plant backfills those) are recomputed.
+    """
+    days = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT day
+            FROM water_usage_daily
+            WHERE user_id = ? AND device_id = ? AND (day >= ? OR estimated_commands < commands)
+            """,
+            (user_id, device_id, usage_day(calibrated_at_ms)),
+        )
+    ]
+    return rebuild_water_usage(conn, user_id, device_id, days)
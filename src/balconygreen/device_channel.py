@@ -0,0 +1,52 @@
+"""Registry of open device WebSocket channels.
+
+A device holds one WebSocket at ``/devices/{device_id}/channel`` and speaks
+JSON messages over it:
+
+device -> server
+    ``{"type": "readings", "seq": 7, "readings": [{"sensor_name": ..., "value": ...}, ...]}``
+    ``{"type": "ack", "command_id": ..., "status": "executed" | "failed", "message": ...}``
+    ``{"type": "ping"}``
+
+server -> device
+    ``{"type": "command", "command": {...}}``  (the command is now ``delivered``)
+    ``{"type": "readings_ack", "seq": 7, "count": 3}``
+    ``{"type": "ack_result", "command_id": ..., "status": ...}``
+    ``{"type": "pong"}`` / ``{"type": "error", "detail": ..., "seq": ...}``
+
+Queuing a command wakes the device's channel through ``notify`` so it is
+pushed immediately; channels also re-check on a slow timer so commands
+queued by another worker process are still delivered.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+
+class DeviceChannelHub:
+    def __init__(self):
+        self._channels: dict[tuple[str, str], set[asyncio.Event]] = {}
+
+    def register(self, user_id: str, device_id: str) -> asyncio.Event:
+        wake = asyncio.Event()
+        self._channels.setdefault((user_id, device_id), set()).add(wake)
+        return wake
+
+    def unregister(self, user_id: str, device_id: str, wake: asyncio.Event) -> None:
+        channels = self._channels.get((user_id, device_id))
+        if not channels:
+            return
+        channels.discard(wake)
+        if not channels:
+            del self._channels[(user_id, device_id)]
+
+    def notify(self, user_id: str, device_id: str) -> bool:
+        """Wake every channel open for the device. Must be called on the event loop."""
+        channels = self._channels.get((user_id, device_id), ())
+        for wake in channels:
+            wake.set()
+        return bool(channels)
+
+    def is_connected(self, user_id: str, device_id: str) -> bool:
+        return bool(self._channels.get((user_id, device_id)))
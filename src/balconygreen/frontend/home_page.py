@@ -313,9 +313,16 @@ class BalconyGreenApp:
                 all_devices.append(st.session_state.guest_weather_config)
         else:
             try:
-                resp = requests.get(f"{FASTAPI_URL}/devices", headers=self.headers, timeout=3)
-                if resp.status_code == 200:
+                cached_etag, cached_devices = st.session_state.get("devices_cache", (None, []))
+                headers = dict(self.headers or {})
+                if cached_etag:
+                    headers["If-None-Match"] = cached_etag
+                resp = requests.get(f"{FASTAPI_URL}/devices", headers=headers, timeout=3)
+                if resp.status_code == 304:
+                    all_devices = cached_devices
+                elif resp.status_code == 200:
                     all_devices = resp.json()
+                    st.session_state.devices_cache = (resp.headers.get("ETag"), all_devices)
             except Exception as e:
                 st.error(f"Failed to load devices: {e}")
 
@@ -189,6 +189,8 @@ class Pages:
                 cookies.save()
                 st.session_state["authenticated"] = False
                 st.session_state["guest"] = False
+                # Cached per user; the next account must not revalidate it.
+                st.session_state.pop("devices_cache", None)
                 st.session_state["page"] = "landing"
                 st.rerun()
 
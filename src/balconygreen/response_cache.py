@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+
+class CachedResponse(NamedTuple):
+    versions: tuple[int, ...]
+    body: bytes
+    etag: str
+    stored_at: float
+
+
+class ResponseCache:
+    """LRU cache of encoded JSON read responses, invalidated by per-user table write versions.
+
+    Write handlers call ``bump(user_id, table)``; a cached body is only served
+    while every table it was read from still has the version captured before
+    the read, so a write that races a read simply makes that entry unusable.
+    The ETag is a digest of the body, so a rebuild that yields the same data
+    still answers ``If-None-Match`` with 304.
+
+    Versions live in this process only. ``ttl_seconds`` bounds how long a
+    worker can keep serving a body after another worker process wrote.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 60.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        # Versions come from one process-wide counter, so a table never returns
+        # to a version an older entry was stored with. The "*" version of a
+        # user is part of every lookup and is bumped by invalidate_user.
+        self._versions: dict[tuple[str, str], int] = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bumps = 0
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    @staticmethod
+    def _key(user_id: str, endpoint: str, params: dict[str, Any]) -> tuple:
+        return (user_id, endpoint, tuple(sorted(params.items())))
+
+    def _current(self, user_id: str, tables: tuple[str, ...]) -> tuple[int, ...]:
+        return tuple(self._versions.get((user_id, table), 0) for table in ("*", *tables))
+
+    def versions(self, user_id: str, tables: tuple[str, ...]) -> tuple[int, ...]:
+        with self._lock:
+            return self._current(user_id, tables)
+
+    def bump(self, user_id: str, *tables: str) -> None:
+        with self._lock:
+            for table in tables:
+                self._versions[(user_id, table)] = next(self._counter)
+            self.bumps += len(tables)
+
+    def get(self, user_id: str, endpoint: str, params: dict[str, Any], tables: tuple[str, ...]) -> CachedResponse | None:
+        key = self._key(user_id, endpoint, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.versions != self._current(user_id, tables) or time.monotonic() - entry.stored_at > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        user_id: str,
+        endpoint: str,
+        params: dict[str, Any],
+        versions: tuple[int, ...],
+        body: bytes,
+    ) -> CachedResponse:
+        """Store ``body`` as read at ``versions`` (captured with ``versions()`` before the read)."""
+        entry = CachedResponse(versions, body, self.etag_for(body), time.monotonic())
+        key = self._key(user_id, endpoint, params)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+            self._versions[(user_id, "*")] = next(self._counter)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "bumps": self.bumps,
+            }
@@ -55,6 +55,8 @@ class SensorReader:
     def _parse_timestamp(value: Any) -> datetime.datetime | None:
         if value in (None, ""):
             return None
+        if isinstance(value, (int, float)):
+            return datetime.datetime.fromtimestamp(value / 1000.0, tz=datetime.timezone.utc)
         if isinstance(value, datetime.datetime):
             parsed = value
         else:
@@ -107,7 +109,9 @@ class SensorReader:
 
         try:
             params = {"device_id": self.device_id} if self.device_id else None
-            readings_response = requests.get(f"{API_BASE_URL}/readings", params=params, headers=self.headers, timeout=3)
+            readings_response = requests.get(
+                f"{API_BASE_URL}/readings/latest", params=params, headers=self.headers, timeout=3
+            )
             readings_response.raise_for_status()
             stored_readings = readings_response.json()
         except Exception:
@@ -121,7 +125,7 @@ class SensorReader:
                 continue
             if use_registration_filter and sensor_name not in registered_sensor_names:
                 continue
-            if not self._is_fresh_reading(reading.get("timestamp")):
+            if not self._is_fresh_reading(reading.get("timestamp_ms", reading.get("timestamp"))):
                 continue
             value = self._safe_float(reading.get("value"))
             if value is None:
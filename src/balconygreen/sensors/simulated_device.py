@@ -0,0 +1,135 @@
+"""Simulated device that talks to the auth API over the persistent device channel.
+
+It keeps one WebSocket open, sends buffered readings in batches and acks each
+pushed command after "running" the pump, reconnecting with backoff when the
+connection drops.
+
+    python -m balconygreen.sensors.simulated_device --token <jwt> --device-id balcony-1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import websockets  # type: ignore
+
+from balconygreen.settings import API_BASE_URL
+
+
+logger = logging.getLogger(__name__)
+
+
+def channel_url(base_url: str, device_id: str, token: str) -> str:
+    ws_base = base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1).rstrip("/")
+    return f"{ws_base}/devices/{quote(device_id, safe='')}/channel?token={quote(token, safe='')}"
+
+
+class SimulatedDevice:
+    def __init__(
+        self,
+        token: str,
+        device_id: str,
+        base_url: str = API_BASE_URL,
+        reading_interval: float = 5.0,
+        batch_size: int = 6,
+        pump_time_scale: float = 0.0,
+        on_command: Callable[[dict], Awaitable[None] | None] | None = None,
+    ):
+        self.url = channel_url(base_url, device_id, token)
+        self.device_id = device_id
+        self.reading_interval = reading_interval
+        self.batch_size = max(1, batch_size)
+        # 0 acks immediately; 1.0 waits the command's full pump_ms before acking.
+        self.pump_time_scale = pump_time_scale
+        self.on_command = on_command
+        self._seq = 0
+        self._buffer: list[dict] = []
+        self._soil_moisture = 45.0
+
+    def _sample(self) -> list[dict]:
+        timestamp = datetime.now(tz=timezone.utc).isoformat()
+        self._soil_moisture = max(5.0, self._soil_moisture - random.uniform(0.0, 0.3))
+        return [
+            {"sensor_name": "soil_moisture", "value": round(self._soil_moisture, 2), "timestamp": timestamp, "source": "Simulated"},
+            {"sensor_name": "temperature", "value": round(random.uniform(18.0, 26.0), 2), "timestamp": timestamp, "source": "Simulated"},
+            {"sensor_name": "humidity", "value": round(random.uniform(40.0, 70.0), 2), "timestamp": timestamp, "source": "Simulated"},
+        ]
+
+    async def _send_readings(self, ws) -> None:
+        while True:
+            await asyncio.sleep(self.reading_interval)
+            self._buffer.extend(self._sample())
+            if len(self._buffer) < self.batch_size * 3:
+                continue
+            self._seq += 1
+            batch, self._buffer = self._buffer, []
+            await ws.send(json.dumps({"type": "readings", "seq": self._seq, "readings": batch}))
+
+    async def _execute(self, ws, command: dict) -> None:
+        pump_ms = int((command.get("payload") or {}).get("pump_ms", 0))
+        if self.on_command is not None:
+            result = self.on_command(command)
+            if asyncio.iscoroutine(result):
+                await result
+        if self.pump_time_scale > 0:
+            await asyncio.sleep(pump_ms / 1000.0 * self.pump_time_scale)
+        if pump_ms > 0:
+            self._soil_moisture = min(90.0, self._soil_moisture + pump_ms / 200.0)
+        await ws.send(json.dumps({"type": "ack", "command_id": command["id"], "status": "executed", "message": f"pumped {pump_ms} ms"}))
+
+    async def _receive(self, ws) -> None:
+        async for raw in ws:
+            message = json.loads(raw)
+            kind = message.get("type")
+            if kind == "command":
+                asyncio.create_task(self._execute(ws, message["command"]))
+            elif kind == "error":
+                logger.warning("Channel error: %s", message.get("detail"))
+
+    async def run_once(self) -> None:
+        async with websockets.connect(self.url) as ws:
+            logger.info("Device channel open for %s", self.device_id)
+            tasks = [asyncio.create_task(self._receive(ws)), asyncio.create_task(self._send_readings(ws))]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def run_forever(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                await self.run_once()
+                backoff = 1.0
+            except (OSError, websockets.WebSocketException) as exc:
+                logger.warning("Device channel dropped (%s), reconnecting in %.0fs", exc, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a simulated device over the WebSocket channel.")
+    parser.add_argument("--token", required=True, help="User JWT from /auth/login.")
+    parser.add_argument("--device-id", required=True)
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between sensor samples.")
+    parser.add_argument("--batch", type=int, default=6, help="Samples buffered per readings message.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    device = SimulatedDevice(args.token, args.device_id, args.base_url, args.interval, args.batch)
+    asyncio.run(device.run_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -13,3 +13,37 @@ DEFAULT_CAMERA_URL = os.getenv("BALCONYGREEN_CAMERA_URL", "http://192.168.1.100/
 JWT_SECRET_KEY = os.getenv("BALCONYGREEN_JWT_SECRET", "balconygreen-demo-secret")
 COOKIE_PASSWORD = os.getenv("BALCONYGREEN_COOKIE_PASSWORD", JWT_SECRET_KEY)
 DB_PATH = os.getenv("BALCONYGREEN_DB_PATH", str(PROJECT_ROOT / "balcony.db"))
+DB_CACHE_SIZE_KB = int(os.getenv("BALCONYGREEN_DB_CACHE_SIZE_KB", "65536"))
+DB_MMAP_SIZE_BYTES = int(os.getenv("BALCONYGREEN_DB_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("BALCONYGREEN_DB_STATEMENT_CACHE_SIZE", "256"))
+INGEST_BATCH_SIZE = int(os.getenv("BALCONYGREEN_INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("BALCONYGREEN_INGEST_FLUSH_INTERVAL_MS", "50"))
+INGEST_MAX_PENDING_ROWS = int(os.getenv("BALCONYGREEN_INGEST_MAX_PENDING_ROWS", "50000"))
+# "commit" acknowledges a reading only once it is committed; "enqueue" acknowledges as soon as it is queued.
+INGEST_DURABILITY = os.getenv("BALCONYGREEN_INGEST_DURABILITY", "commit")
+DB_THREADPOOL_SIZE = int(os.getenv("BALCONYGREEN_DB_THREADPOOL_SIZE", "8"))
+ANALYTICS_THREADPOOL_SIZE = int(os.getenv("BALCONYGREEN_ANALYTICS_THREADPOOL_SIZE", "2"))
+RETENTION_ENABLED = os.getenv("BALCONYGREEN_RETENTION_ENABLED", "0") == "1"
+ARCHIVE_DIR = os.getenv("BALCONYGREEN_ARCHIVE_DIR", str(PROJECT_ROOT / "reading_archive"))
+RETENTION_HOT_DAYS = int(os.getenv("BALCONYGREEN_RETENTION_HOT_DAYS", "30"))
+# Per-sensor overrides, e.g. "soil_raw=7,temperature=14".
+RETENTION_HOT_DAYS_BY_SENSOR = {
+    name.strip(): int(days)
+    for name, _, days in (
+        item.partition("=") for item in os.getenv("BALCONYGREEN_RETENTION_HOT_DAYS_BY_SENSOR", "").split(",") if "=" in item
+    )
+}
+RETENTION_INTERVAL_SECONDS = int(os.getenv("BALCONYGREEN_RETENTION_INTERVAL_SECONDS", str(6 * 60 * 60)))
+# Return archived pages to the filesystem. The first run on an existing database does a one-off blocking VACUUM.
+RETENTION_INCREMENTAL_VACUUM = os.getenv("BALCONYGREEN_RETENTION_INCREMENTAL_VACUUM", "1") == "1"
+AUTH_CACHE_SIZE = int(os.getenv("BALCONYGREEN_AUTH_CACHE_SIZE", "4096"))
+# Upper bound on how long a connected device waits for a command queued by another worker process.
+DEVICE_CHANNEL_POLL_SECONDS = float(os.getenv("BALCONYGREEN_DEVICE_CHANNEL_POLL_SECONDS", "15"))
+# A delivered command without an ack by this deadline is requeued, up to COMMAND_MAX_ATTEMPTS deliveries, then expired.
+COMMAND_ACK_TIMEOUT_SECONDS = float(os.getenv("BALCONYGREEN_COMMAND_ACK_TIMEOUT_SECONDS", "120"))
+COMMAND_MAX_ATTEMPTS = int(os.getenv("BALCONYGREEN_COMMAND_MAX_ATTEMPTS", "3"))
+# Executed commands this far back without a pump-response verdict are evaluated when the API starts.
+PUMP_DIAGNOSTICS_BACKFILL_DAYS = float(os.getenv("BALCONYGREEN_PUMP_DIAGNOSTICS_BACKFILL_DAYS", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("BALCONYGREEN_RESPONSE_CACHE_SIZE", "2048"))
+# Writes only bump the versions of the process that handled them; this bounds staleness across worker processes.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("BALCONYGREEN_RESPONSE_CACHE_TTL_SECONDS", "60"))
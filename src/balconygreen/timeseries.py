@@ -0,0 +1,210 @@
+"""Compact per-sensor time series backed by numpy arrays.
+
+Analytics, the watering model and the dashboard all work on short sensor
+histories. ``TimeSeries`` holds one sensor as a sorted ``int64`` epoch-ms
+array plus a parallel ``float64`` value array, so as-of lookups are a binary
+search and range slices are views rather than copies. ``TimeSeriesWindow``
+groups the series of several sensors and is built once from either row
+shape used in the code base: long rows (``sensor_name``/``value``/
+``timestamp_ms``) as the API returns them, or wide snapshots with one key
+per sensor as the dashboard keeps them.
+
+This module only depends on numpy so the dashboard can import it directly.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np  # type: ignore
+
+
+def timestamp_ms(value: Any) -> int | None:
+    """Epoch milliseconds for an epoch-ms number, datetime or ISO string; naive values are taken as UTC."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _numeric(value: Any) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)):
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+class TimeSeries:
+    __slots__ = ("timestamps_ms", "values")
+
+    def __init__(self, timestamps_ms: Any, values: Any, presorted: bool = False):
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if timestamps_ms.shape != values.shape:
+            raise ValueError("timestamps_ms and values must have the same length")
+        if not presorted and timestamps_ms.size > 1 and np.any(timestamps_ms[1:] < timestamps_ms[:-1]):
+            order = np.argsort(timestamps_ms, kind="stable")
+            timestamps_ms, values = timestamps_ms[order], values[order]
+        self.timestamps_ms = timestamps_ms
+        self.values = values
+
+    @classmethod
+    def from_points(cls, points: Iterable[tuple[int, float]]) -> TimeSeries:
+        pairs = list(points)
+        return cls([pair[0] for pair in pairs], [pair[1] for pair in pairs])
+
+    def __len__(self) -> int:
+        return int(self.timestamps_ms.size)
+
+    def __repr__(self) -> str:
+        return f"TimeSeries(points={len(self)}, start_ms={self.start_ms}, end_ms={self.end_ms})"
+
+    @property
+    def start_ms(self) -> int | None:
+        return int(self.timestamps_ms[0]) if len(self) else None
+
+    @property
+    def end_ms(self) -> int | None:
+        return int(self.timestamps_ms[-1]) if len(self) else None
+
+    def first(self) -> float | None:
+        return float(self.values[0]) if len(self) else None
+
+    def last(self) -> float | None:
+        return float(self.values[-1]) if len(self) else None
+
+    def max(self) -> float | None:
+        return float(self.values.max()) if len(self) else None
+
+    def as_of(self, at_ms: int, clamp: bool = False) -> float | None:
+        """The last value at or before ``at_ms``.
+
+        Before the first point this is ``None``, or the first value with ``clamp``.
+        """
+        index = int(np.searchsorted(self.timestamps_ms, at_ms, side="right")) - 1
+        if index < 0:
+            return self.first() if clamp else None
+        return float(self.values[index])
+
+    def between(self, start_ms: int | None = None, end_ms: int | None = None) -> TimeSeries:
+        """Points with ``start_ms <= t <= end_ms``, sharing this series' arrays."""
+        lower = 0 if start_ms is None else int(np.searchsorted(self.timestamps_ms, start_ms, side="left"))
+        upper = len(self) if end_ms is None else int(np.searchsorted(self.timestamps_ms, end_ms, side="right"))
+        return TimeSeries(self.timestamps_ms[lower:upper], self.values[lower:upper], presorted=True)
+
+    def change(self, window_ms: int | None = None) -> float | None:
+        """Last value minus the point before it, or minus the value ``window_ms`` before the last point.
+
+        When the series is shorter than ``window_ms`` the first value is used.
+        """
+        if len(self) < 2:
+            return None
+        if window_ms is None:
+            return float(self.values[-1] - self.values[-2])
+        return float(self.values[-1]) - float(self.as_of(int(self.timestamps_ms[-1]) - window_ms, clamp=True))
+
+    def resample(self, step_ms: int, how: str = "last") -> TimeSeries:
+        """One point per ``step_ms`` bucket (stamped at the bucket start), aggregated by ``how``."""
+        if not len(self):
+            return self
+        buckets = (self.timestamps_ms // step_ms) * step_ms
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        if how == "last":
+            values = self.values[np.r_[starts[1:] - 1, len(self) - 1]]
+        elif how == "first":
+            values = self.values[starts]
+        elif how == "mean":
+            values = np.add.reduceat(self.values, starts) / np.diff(np.r_[starts, len(self)])
+        elif how == "min":
+            values = np.minimum.reduceat(self.values, starts)
+        elif how == "max":
+            values = np.maximum.reduceat(self.values, starts)
+        else:
+            raise ValueError(f"Unsupported resample aggregation: {how}")
+        return TimeSeries(buckets[starts], values, presorted=True)
+
+
+class TimeSeriesWindow:
+    """The series of several sensors, keyed by sensor name."""
+
+    def __init__(self, series: Mapping[str, TimeSeries] | None = None):
+        self.series: dict[str, TimeSeries] = dict(series or {})
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Mapping[str, Any]],
+        value_key: str = "value",
+        sensor_key: str = "sensor_name",
+    ) -> TimeSeriesWindow:
+        """Build from long rows; ``timestamp_ms`` is used when present, else ``timestamp`` is parsed."""
+        points: dict[str, tuple[list[int], list[float]]] = {}
+        for row in rows:
+            value = _numeric(row.get(value_key))
+            at_ms = row.get("timestamp_ms")
+            if at_ms is None:
+                at_ms = timestamp_ms(row.get("timestamp"))
+            if value is None or at_ms is None:
+                continue
+            stamps, values = points.setdefault(str(row.get(sensor_key)), ([], []))
+            stamps.append(int(at_ms))
+            values.append(value)
+        return cls({name: TimeSeries(stamps, values) for name, (stamps, values) in points.items()})
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Mapping[str, Any]], time_key: str = "timestamp") -> TimeSeriesWindow:
+        """Build from wide snapshots, one series per numeric key; each timestamp is parsed once."""
+        points: dict[str, tuple[list[int], list[float]]] = {}
+        for snapshot in snapshots:
+            at_ms = timestamp_ms(snapshot.get(time_key))
+            if at_ms is None:
+                continue
+            for key, raw_value in snapshot.items():
+                value = _numeric(raw_value) if key != time_key else None
+                if value is None:
+                    continue
+                stamps, values = points.setdefault(key, ([], []))
+                stamps.append(at_ms)
+                values.append(value)
+        return cls({name: TimeSeries(stamps, values) for name, (stamps, values) in points.items()})
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.series
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __repr__(self) -> str:
+        return f"TimeSeriesWindow(sensors={sorted(self.series)})"
+
+    @property
+    def end_ms(self) -> int | None:
+        ends = [series.end_ms for series in self.series.values() if len(series)]
+        return max(ends) if ends else None
+
+    def get(self, *names: str) -> TimeSeries | None:
+        """The first non-empty series among ``names``, which lets callers pass sensor aliases."""
+        for name in names:
+            series = self.series.get(name)
+            if series is not None and len(series):
+                return series
+        return None
+
+    def latest(self, *names: str) -> float | None:
+        series = self.get(*names)
+        return None if series is None else series.last()
+
+    def between(self, start_ms: int | None = None, end_ms: int | None = None) -> TimeSeriesWindow:
+        return TimeSeriesWindow({name: series.between(start_ms, end_ms) for name, series in self.series.items()})
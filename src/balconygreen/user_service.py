@@ -2,20 +2,47 @@ from __future__ import annotations
 
 import sqlite3
 import uuid
+from typing import Callable
 
 from fastapi import HTTPException  # type: ignore
 from passlib.context import CryptContext  # type: ignore
 
+from balconygreen.db_implementation.connection import get_connection_manager
+
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
 
+# Tables holding per-user rows, in delete order (children before parents).
+USER_OWNED_TABLES = [
+    "readings",
+    "readings_latest",
+    "reading_rollups",
+    "uploads",
+    "pump_diagnostics",
+    "device_commands",
+    "water_usage_daily",
+    "soil_sensor_calibrations",
+    "watering_feedback",
+    "sensors",
+]
+
 
 class UserService:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.connections = get_connection_manager(db_path)
+        self._change_listeners: list[Callable[[str], None]] = []
 
     def _connect(self):
-        return sqlite3.connect(self.db_path, check_same_thread=False)
+        return self.connections.transaction()
+
+    def add_change_listener(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener(user_id)`` after a user is updated or deleted."""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self, user_id: str) -> None:
+        for listener in self._change_listeners:
+            listener(user_id)
 
     def hash_password(self, password: str):
         return pwd_context.hash(password)
@@ -70,3 +97,35 @@ class UserService:
                 raise HTTPException(400, "Username already exists") from exc
 
         return user_id
+
+    def update_user(self, user_id: str, name: str | None = None, password: str | None = None) -> bool:
+        assignments = []
+        params: list = []
+        if name is not None:
+            assignments.append("name = ?")
+            params.append(name)
+        if password is not None:
+            assignments.append("password_hash = ?")
+            params.append(self.hash_password(password))
+        if not assignments:
+            return False
+
+        with self._connect() as conn:
+            cur = conn.execute(f"UPDATE users SET {', '.join(assignments)} WHERE id = ?", (*params, user_id))
+            updated = cur.rowcount > 0
+        if updated:
+            self._notify_changed(user_id)
+        return updated
+
+    def delete_user(self, user_id: str) -> bool:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM images WHERE sensor_id IN (SELECT id FROM sensors WHERE user_id = ?)",
+                (user_id,),
+            )
+            for table in USER_OWNED_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+            deleted = conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount > 0
+        if deleted:
+            self._notify_changed(user_id)
+        return deleted
@@ -10,8 +10,14 @@ from typing import Any
 import joblib
 import pandas as pd
 
+try:
+    from balconygreen.timeseries import TimeSeriesWindow, timestamp_ms
+except ModuleNotFoundError:
+    from timeseries import TimeSeriesWindow, timestamp_ms  # type: ignore
+
 
 MODEL_DIR = Path(__file__).resolve().parent / "models" / "watering_ai"
+HOUR_MS = 60 * 60 * 1000
 
 
 @dataclass
@@ -46,11 +52,12 @@ class WateringAIService:
         plant_type: str,
         disease_label: str = "healthy",
         disease_confidence: float = 0.0,
-        history: list[dict[str, Any]] | None = None,
+        history: TimeSeriesWindow | list[dict[str, Any]] | None = None,
         feedback_rows: list[dict[str, Any]] | None = None,
         calibration: dict[str, Any] | None = None,
     ) -> WateringPrediction | None:
-        history = history or []
+        if not isinstance(history, TimeSeriesWindow):
+            history = TimeSeriesWindow.from_snapshots(history or [])
         feedback_rows = feedback_rows or []
         payload, missing_inputs = self._build_feature_payload(
             sensor_readings,
@@ -135,7 +142,7 @@ class WateringAIService:
         plant_type: str,
         disease_label: str,
         disease_confidence: float,
-        history: list[dict[str, Any]],
+        history: TimeSeriesWindow,
         calibration: dict[str, Any] | None,
     ) -> tuple[dict[str, float], list[str]]:
         missing_inputs: list[str] = []
@@ -173,23 +180,21 @@ class WateringAIService:
         if humidity_pct == 0:
             missing_inputs.append("humidity_pct")
 
-        previous = history[-1] if history else {}
-        previous_moisture = float(previous.get("soil_moisture_pct", previous.get("soil_moisture", soil_moisture_pct)) or soil_moisture_pct)
-        previous_raw = int(previous.get("soil_raw", soil_raw) or soil_raw)
+        moisture_history = history.get("soil_moisture_pct", "soil_moisture")
+        raw_history = history.get("soil_raw")
+        previous_moisture = moisture_history.last() if moisture_history is not None else soil_moisture_pct
+        previous_raw = int(raw_history.last()) if raw_history is not None else soil_raw
 
         timestamp_now = self._safe_timestamp(sensor_readings.get("timestamp")) or datetime.utcnow()
-        timestamp_prev = self._safe_timestamp(previous.get("timestamp"))
-        minutes_since_prev = (
-            max(1.0, (timestamp_now - timestamp_prev).total_seconds() / 60.0)
-            if timestamp_prev is not None
-            else 15.0
-        )
+        now_ms = timestamp_ms(timestamp_now)
+        previous_ms = history.end_ms
+        minutes_since_prev = max(1.0, (now_ms - previous_ms) / 60000.0) if previous_ms is not None else 15.0
 
-        last_four = history[-4:] if len(history) >= 4 else history
-        last_eight = history[-8:] if len(history) >= 8 else history
-        moisture_1h_delta = soil_moisture_pct - float(last_four[0].get("soil_moisture_pct", last_four[0].get("soil_moisture", soil_moisture_pct))) if last_four else 0.0
-        raw_1h_delta = soil_raw - int(last_four[0].get("soil_raw", soil_raw)) if last_four else 0.0
-        moisture_2h_delta = soil_moisture_pct - float(last_eight[0].get("soil_moisture_pct", last_eight[0].get("soil_moisture", soil_moisture_pct))) if last_eight else 0.0
+        # Deltas against the value as of 1 h / 2 h ago (or the oldest sample in a
+        # shorter history), independent of how densely the history is sampled.
+        moisture_1h_delta = soil_moisture_pct - moisture_history.as_of(now_ms - HOUR_MS, clamp=True) if moisture_history is not None else 0.0
+        raw_1h_delta = soil_raw - int(raw_history.as_of(now_ms - HOUR_MS, clamp=True)) if raw_history is not None else 0.0
+        moisture_2h_delta = soil_moisture_pct - moisture_history.as_of(now_ms - 2 * HOUR_MS, clamp=True) if moisture_history is not None else 0.0
 
         hour = timestamp_now.hour + timestamp_now.minute / 60.0
         hour_sin = math.sin(2 * math.pi * hour / 24.0)
@@ -226,7 +231,7 @@ class WateringAIService:
         self,
         payload: dict[str, float],
         plant_type: str,
-        history: list[dict[str, Any]],
+        history: TimeSeriesWindow,
         calibration: dict[str, Any] | None = None,
     ) -> float:
         profile = self.profiles[self._normalize_plant_type(plant_type)]
@@ -235,16 +240,10 @@ class WateringAIService:
         if current_moisture <= threshold:
             return 0.0
 
-        if history:
-            oldest = history[0]
-            oldest_moisture = float(oldest.get("soil_moisture_pct", oldest.get("soil_moisture", current_moisture)) or current_moisture)
-            oldest_ts = self._safe_timestamp(oldest.get("timestamp"))
-            newest_ts = self._safe_timestamp(history[-1].get("timestamp"))
-            if oldest_ts and newest_ts and newest_ts > oldest_ts:
-                hours = max(0.1, (newest_ts - oldest_ts).total_seconds() / 3600.0)
-                dry_rate = max(0.4, (oldest_moisture - current_moisture) / hours)
-            else:
-                dry_rate = max(0.5, abs(payload["moisture_1h_delta"]))
+        moisture_history = history.get("soil_moisture_pct", "soil_moisture")
+        if moisture_history is not None and moisture_history.end_ms > moisture_history.start_ms:
+            hours = max(0.1, (moisture_history.end_ms - moisture_history.start_ms) / HOUR_MS)
+            dry_rate = max(0.4, (moisture_history.first() - current_moisture) / hours)
         else:
             dry_rate = max(0.5, abs(payload["moisture_1h_delta"]))
 